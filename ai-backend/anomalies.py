@@ -0,0 +1,409 @@
+import os
+import math
+import bisect
+import logging
+import warnings
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# |z| above which a bar is reported, and above which it is reported as high severity
+ZSCORE_THRESHOLD = 2.0
+HIGH_SEVERITY_THRESHOLD = 3.0
+
+# Scoring methods: one global mean/std, or statistics of the bars just before each bar
+GLOBAL = "global"
+EWMA = "ewma"  # exponentially weighted mean/variance with span ``window``
+MAD = "mad"    # median and median absolute deviation of the trailing ``window`` bars
+METHODS = (GLOBAL, EWMA, MAD)
+
+DEFAULT_WINDOW = 60
+
+# Scales the MAD to the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+
+# Rows per chunk when the batch MAD materializes its trailing windows
+MAD_CHUNK_ROWS = 4096
+
+NAN = float("nan")
+
+
+def zscore(values: np.ndarray) -> np.ndarray:
+    """Population z-scores of a column, or of each row of a (symbols, bars) matrix.
+
+    NaN inputs stay NaN and a constant column scores 0.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] == 0:
+        return np.empty(values.shape)
+    with warnings.catch_warnings():
+        # Rows without any observation have no mean; they simply score NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(values, axis=-1, keepdims=True)
+        std = np.nanstd(values, axis=-1, keepdims=True)
+    flat = ~np.isfinite(std) | (std == 0.0)
+    scores = (values - mean) / np.where(flat, 1.0, std)
+    return np.where(flat & ~np.isnan(values), 0.0, scores)
+
+
+def iso_timestamps(timestamp: np.ndarray) -> List[str]:
+    """Format epoch-nanosecond timestamps (bar store ``timestamp`` column) as ISO strings"""
+    return np.datetime_as_string(np.asarray(timestamp, dtype=np.int64).astype("datetime64[ns]")
+                                 .astype("datetime64[us]")).tolist()
+
+
+def find_anomalies(timestamp: np.ndarray, price_zscore: np.ndarray, volume_zscore: np.ndarray,
+                   threshold: float = ZSCORE_THRESHOLD,
+                   high_threshold: float = HIGH_SEVERITY_THRESHOLD) -> List[Dict[str, Any]]:
+    """Bars whose price or volume |z| exceeds ``threshold``, oldest first.
+
+    Masks and severities are computed for all bars at once; Python objects are
+    only built for the flagged bars.
+    """
+    price_abs = np.abs(price_zscore)
+    volume_abs = np.abs(volume_zscore)
+    # NaN compares False, so bars without a score are never flagged
+    index = np.flatnonzero((price_abs > threshold) | (volume_abs > threshold))
+    if len(index) == 0:
+        return []
+
+    high = (price_abs[index] > high_threshold) | (volume_abs[index] > high_threshold)
+    severity = np.where(high, "high", "medium").tolist()
+    return [
+        {"timestamp": ts, "price_zscore": pz, "volume_zscore": vz, "severity": sev}
+        for ts, pz, vz, sev in zip(iso_timestamps(timestamp[index]), price_zscore[index].tolist(),
+                                   volume_zscore[index].tolist(), severity)
+    ]
+
+
+def _ewma_zscore(values: np.ndarray, window: int) -> np.ndarray:
+    """Each value's deviation from the EWMA of the values before it, in EW standard deviations.
+
+    Same recursion as ``_EWMAStats``: m += a * d and v = (1 - a) * (v + a * d^2)
+    with d = x - m, started from the first value; the first ``window`` values
+    are not scored.
+    """
+    from scipy.signal import lfilter
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n <= window:
+        return out
+    alpha = 2.0 / (window + 1.0)
+    decay = 1.0 - alpha
+    mean, _ = lfilter([alpha], [1.0, -decay], values, zi=[decay * values[0]])
+    deviation = np.empty(n)
+    deviation[0] = 0.0
+    np.subtract(values[1:], mean[:-1], out=deviation[1:])
+    var = lfilter([decay * alpha], [1.0, -decay], deviation * deviation)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[window:] = deviation[window:] / np.sqrt(var[window - 1:-1])
+    return out
+
+
+def _mad_zscore(values: np.ndarray, window: int, first: int) -> np.ndarray:
+    """Each value's robust z-score against the median / MAD of the ``window`` values before it,
+    from position ``first`` (>= ``window``) on"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n <= first:
+        return out
+    # trailing[i] holds the window before position first + i
+    trailing = sliding_window_view(values, window)[first - window:-1]
+    for start in range(0, len(trailing), MAD_CHUNK_ROWS):
+        block = trailing[start:start + MAD_CHUNK_ROWS]
+        median = np.median(block, axis=1)
+        mad = np.median(np.abs(block - median[:, None]), axis=1)
+        rows = slice(first + start, first + start + len(block))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[rows] = (values[rows] - median) / (MAD_SCALE * mad)
+    return out
+
+
+def rolling_zscore(values: np.ndarray, method: str = EWMA, window: int = DEFAULT_WINDOW,
+                   tail: Optional[int] = None) -> np.ndarray:
+    """Batch z-scores of a column against its own recent history.
+
+    Matches feeding the column bar by bar through ``StreamingAnomalyDetector``:
+    NaN values score NaN and are skipped by the statistics, a value equal to a
+    zero-spread center scores 0 and any other value scores +-inf. With ``tail``,
+    only the last ``tail`` observed values need a score (others may be NaN).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == GLOBAL:
+        return zscore(values)
+    if method not in (EWMA, MAD):
+        raise ValueError(f"Unknown anomaly method '{method}', expected one of {', '.join(METHODS)}")
+    if window < 1:
+        raise ValueError(f"Window length must be positive, got {window}")
+    if values.ndim == 2:
+        # Each symbol's history is compacted separately, so rows need not share gaps
+        return np.array([rolling_zscore(row, method, window, tail) for row in values]).reshape(values.shape)
+
+    observed = ~np.isnan(values)
+    compact = values[observed] if not observed.all() else values
+    if method == EWMA:
+        # The recursion has to run from the start anyway
+        first = window
+        scores = _ewma_zscore(compact, window)
+    else:
+        first = window if tail is None else max(window, len(compact) - tail)
+        scores = _mad_zscore(compact, window, first)
+    # 0/0: the value sits exactly on a zero-spread center
+    scores[np.isnan(scores) & (np.arange(len(compact)) >= first)] = 0.0
+    if compact is values:
+        return scores
+    out = np.full(len(values), np.nan)
+    out[observed] = scores
+    return out
+
+
+def detect_rolling(timestamp: np.ndarray, close: np.ndarray, volume: np.ndarray, method: str = EWMA,
+                   window: int = DEFAULT_WINDOW, threshold: float = ZSCORE_THRESHOLD) -> List[Dict[str, Any]]:
+    """Anomalies of every bar relative to the bars before it, as ``StreamingAnomalyDetector`` would flag them"""
+    anomalies = find_anomalies(np.asarray(timestamp), rolling_zscore(close, method, window),
+                               rolling_zscore(volume, method, window), threshold)
+    for anomaly in anomalies:
+        # A zero-spread window scores +-inf and an unscored column NaN, neither of which JSON can carry
+        for name in ("price_zscore", "volume_zscore"):
+            if not math.isfinite(anomaly[name]):
+                anomaly[name] = None
+    return anomalies
+
+
+def severity_key(anomaly: Dict[str, Any]) -> float:
+    """Sort key of a ``top_anomalies`` result; a zero-spread (infinite) score ranks first"""
+    score = anomaly["score"]
+    return math.inf if score is None else score
+
+
+def top_anomalies(symbols: List[str], timestamp: np.ndarray, price_zscore: np.ndarray, volume_zscore: np.ndarray,
+                  recent_bars: int = 1, top_k: int = 50,
+                  threshold: float = ZSCORE_THRESHOLD) -> List[Dict[str, Any]]:
+    """The ``top_k`` symbols with the most severe anomaly among the last ``recent_bars`` bars, most severe first.
+
+    ``price_zscore`` and ``volume_zscore`` are (symbols, bars) matrices on the
+    shared ``timestamp`` index; a symbol's severity is the largest |z| of either
+    column in that window.
+    """
+    start = max(0, len(timestamp) - max(1, recent_bars))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        severity = np.fmax(np.abs(price_zscore[:, start:]), np.abs(volume_zscore[:, start:]))
+    severity = np.where(np.isnan(severity), -np.inf, severity)
+    if severity.shape[1] == 0:
+        return []
+
+    rows = np.arange(len(symbols))
+    column = severity.argmax(axis=1)
+    score = severity[rows, column]
+    candidates = np.flatnonzero(score > threshold)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-score[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.argsort(-score[candidates], kind="stable")]
+
+    position = start + column[candidates]
+    price = price_zscore[candidates, position].tolist()
+    volume = volume_zscore[candidates, position].tolist()
+    results = []
+    for i, row in enumerate(candidates.tolist()):
+        value = float(score[row])
+        results.append({
+            "symbol": symbols[row],
+            "timestamp": iso_timestamps(timestamp[position[i:i + 1]])[0],
+            "price_zscore": price[i] if math.isfinite(price[i]) else None,
+            "volume_zscore": volume[i] if math.isfinite(volume[i]) else None,
+            "score": value if math.isfinite(value) else None,
+            "severity": "high" if value > HIGH_SEVERITY_THRESHOLD else "medium",
+        })
+    return results
+
+
+def _score(x: float, center: float, scale: float) -> float:
+    deviation = x - center
+    if scale > 0.0:
+        return deviation / scale
+    if deviation == 0.0:
+        return 0.0
+    return math.copysign(math.inf, deviation)
+
+
+class _EWMAStats:
+    """Exponentially weighted mean and variance of one column, O(1) per value"""
+
+    __slots__ = ("window", "alpha", "count", "mean", "var")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.alpha = 2.0 / (window + 1.0)
+        self.count = 0
+        self.mean = NAN
+        self.var = 0.0
+
+    def score(self, x: float) -> float:
+        if self.count < self.window:
+            return NAN
+        return _score(x, self.mean, math.sqrt(self.var))
+
+    def update(self, x: float):
+        if self.count == 0:
+            self.mean = x
+        else:
+            deviation = x - self.mean
+            increment = self.alpha * deviation
+            self.mean += increment
+            self.var = (1.0 - self.alpha) * (self.var + deviation * increment)
+        self.count += 1
+
+
+class _RollingMAD:
+    """Median and median absolute deviation of the last ``window`` values.
+
+    The window is kept sorted, so the median is an index lookup and the MAD is
+    the k-th smallest distance from it, selected from the two sorted runs on
+    either side of the median by binary search: O(log w) per value besides the
+    sorted insert / remove.
+    """
+
+    __slots__ = ("window", "values", "sorted")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque = deque()
+        self.sorted: List[float] = []
+
+    def _median(self) -> float:
+        a, n = self.sorted, len(self.sorted)
+        return a[n // 2] if n % 2 else 0.5 * (a[n // 2 - 1] + a[n // 2])
+
+    def _kth_distance(self, median: float, split: int, k: int) -> float:
+        """k-th (0-based) smallest |a[i] - median|; left distances grow leftwards from ``split``"""
+        a = self.sorted
+        n_left, n_right = split, len(a) - split
+
+        def left(i):
+            return median - a[split - 1 - i]
+
+        def right(j):
+            return a[split + j] - median
+
+        lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+        while lo < hi:
+            i = (lo + hi) // 2
+            # With i left distances taken, take more while the next one is below the last right one
+            if left(i) < right(k - i):
+                lo = i + 1
+            else:
+                hi = i
+        i = lo
+        distance = left(i - 1) if i > 0 else -math.inf
+        if i <= k:
+            distance = max(distance, right(k - i))
+        return distance
+
+    def mad(self, median: float) -> float:
+        a, n = self.sorted, len(self.sorted)
+        split = bisect.bisect_left(a, median)
+        if n % 2:
+            return self._kth_distance(median, split, n // 2)
+        return 0.5 * (self._kth_distance(median, split, n // 2 - 1) + self._kth_distance(median, split, n // 2))
+
+    def score(self, x: float) -> float:
+        if len(self.values) < self.window:
+            return NAN
+        median = self._median()
+        return _score(x, median, MAD_SCALE * self.mad(median))
+
+    def update(self, x: float):
+        if len(self.values) == self.window:
+            oldest = self.values.popleft()
+            del self.sorted[bisect.bisect_left(self.sorted, oldest)]
+        self.values.append(x)
+        bisect.insort(self.sorted, x)
+
+
+_STATS_TYPES = {EWMA: _EWMAStats, MAD: _RollingMAD}
+
+
+class StreamingAnomalyDetector:
+    """Live anomaly scoring for one symbol: each bar is scored against the bars
+    before it and then folded into the statistics"""
+
+    def __init__(self, method: str = EWMA, window: int = DEFAULT_WINDOW, threshold: float = ZSCORE_THRESHOLD):
+        if method not in _STATS_TYPES:
+            raise ValueError(f"Unknown streaming anomaly method '{method}', expected one of {', '.join(_STATS_TYPES)}")
+        self.method = method
+        self.window = window
+        self.threshold = threshold
+        self.last_timestamp: Optional[int] = None
+        self._price = _STATS_TYPES[method](window)
+        self._volume = _STATS_TYPES[method](window)
+
+    def update(self, close: float, volume: float = 0.0, timestamp: Optional[int] = None) -> Dict[str, Any]:
+        price_z = NAN
+        if close == close:
+            price_z = self._price.score(close)
+            self._price.update(close)
+        volume_z = NAN
+        if volume == volume:
+            volume_z = self._volume.score(volume)
+            self._volume.update(volume)
+        if timestamp is not None:
+            self.last_timestamp = int(timestamp)
+
+        # NaN compares False, so an unscored column never flags the bar
+        price_abs, volume_abs = abs(price_z), abs(volume_z)
+        anomaly = price_abs > self.threshold or volume_abs > self.threshold
+        severity = None
+        if anomaly:
+            severity = "high" if price_abs > HIGH_SEVERITY_THRESHOLD or volume_abs > HIGH_SEVERITY_THRESHOLD else "medium"
+        return {
+            "price_zscore": price_z if math.isfinite(price_z) else None,
+            "volume_zscore": volume_z if math.isfinite(volume_z) else None,
+            "anomaly": anomaly,
+            "severity": severity,
+        }
+
+
+class StreamingAnomalyRegistry:
+    """Per-symbol streaming anomaly detectors for live per-tick scoring"""
+
+    def __init__(self, method: Optional[str] = None, window: Optional[int] = None,
+                 threshold: Optional[float] = None):
+        self.method = (method or os.getenv("ANOMALY_STREAM_METHOD", EWMA)).lower()
+        self.window = window if window is not None else int(os.getenv("ANOMALY_WINDOW", DEFAULT_WINDOW))
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("ANOMALY_THRESHOLD", ZSCORE_THRESHOLD))
+        if self.method not in _STATS_TYPES:
+            raise ValueError(f"Unknown streaming anomaly method '{self.method}'")
+
+        self._symbols: Dict[str, StreamingAnomalyDetector] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _entry(self, symbol: str):
+        key = symbol.upper()
+        with self._guard:
+            if key not in self._symbols:
+                self._symbols[key] = StreamingAnomalyDetector(self.method, self.window, self.threshold)
+                self._locks[key] = threading.Lock()
+            return self._symbols[key], self._locks[key]
+
+    def update(self, symbol: str, close: float, volume: float = 0.0,
+               timestamp: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Score one bar and fold it in; bars not newer than the last scored one return None"""
+        detector, lock = self._entry(symbol)
+        with lock:
+            if timestamp is not None and detector.last_timestamp is not None and timestamp <= detector.last_timestamp:
+                return None
+            return detector.update(close, volume, timestamp)
+
+    def symbols(self) -> List[str]:
+        with self._guard:
+            return list(self._symbols)
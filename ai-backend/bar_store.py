@@ -0,0 +1,515 @@
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from collections import OrderedDict, defaultdict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# On-disk dtype of every column file (little-endian, fixed width)
+COLUMN_DTYPES = {
+    "timestamp": np.dtype("<i8"),  # nanoseconds since the epoch, UTC
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Most provider requests in flight at once when several symbols need fetching
+FETCH_CONCURRENCY = int(os.getenv("BAR_FETCH_CONCURRENCY", 8))
+
+
+class Bars:
+    """Column-oriented OHLCV bars for a single symbol"""
+
+    def __init__(self, timestamp: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def empty(cls) -> "Bars":
+        return cls(*(np.empty(0, dtype=COLUMN_DTYPES[name]) for name in COLUMN_DTYPES))
+
+    @classmethod
+    def from_frame(cls, frame: "pd.DataFrame") -> "Bars":
+        """Build bars from a DataFrame with a DatetimeIndex and OHLCV columns (any case)"""
+        import pandas as pd
+        if frame is None or len(frame) == 0:
+            return cls.empty()
+
+        columns = {}
+        for name in PRICE_COLUMNS:
+            matches = [c for c in frame.columns if str(c[0] if isinstance(c, tuple) else c).lower() == name]
+            if not matches:
+                raise ValueError(f"Missing '{name}' column in provider data")
+            column = frame[matches[0]]
+            # yfinance returns one sub-column per ticker for some versions
+            if isinstance(column, pd.DataFrame):
+                column = column.iloc[:, 0]
+            columns[name] = column.to_numpy(dtype=np.float64)
+
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        timestamp = index.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+        order = np.argsort(timestamp, kind="stable")
+        return cls(timestamp[order], *(columns[name][order] for name in PRICE_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def since(self, timestamp_ns: int) -> "Bars":
+        """Return the bars strictly newer than the given timestamp"""
+        start = int(np.searchsorted(self.timestamp, timestamp_ns, side="right"))
+        return self.slice(start)
+
+    def until(self, timestamp_ns: int) -> "Bars":
+        """Return the bars at or before the given timestamp"""
+        return self.slice(0, int(np.searchsorted(self.timestamp, timestamp_ns, side="right")))
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "Bars":
+        return Bars(*(getattr(self, name)[start:stop] for name in COLUMN_DTYPES))
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Return the bars in the same shape as ``yf.Ticker.history``"""
+        import pandas as pd
+        index = pd.DatetimeIndex(self.timestamp.astype("datetime64[ns]"), name="Date")
+        return pd.DataFrame({name.capitalize(): np.asarray(getattr(self, name)) for name in PRICE_COLUMNS},
+                            index=index)
+
+
+class BarMatrix:
+    """OHLCV columns of several symbols aligned on the union of their bar timestamps.
+
+    Each column is a (symbols, bars) float array with NaN where a symbol has no
+    bar; ``errors`` maps symbols that could not be loaded to the reason.
+    """
+
+    def __init__(self, symbols: List[str], timestamp: np.ndarray, columns: Dict[str, np.ndarray],
+                 errors: Optional[Dict[str, str]] = None):
+        self.symbols = symbols
+        self.timestamp = timestamp
+        self.columns = columns
+        self.errors = errors or {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+class BarProvider:
+    """Source of OHLCV bars used to fill the bar store"""
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> Bars:
+        raise NotImplementedError
+
+    def fetch_many(self, symbols: Sequence[str], start: datetime,
+                   end: datetime) -> Tuple[Dict[str, Bars], Dict[str, str]]:
+        """Fetch several symbols over the same range; returns (bars, errors) keyed by symbol.
+
+        The default issues one ``fetch`` per symbol, at most ``FETCH_CONCURRENCY``
+        at a time. Providers with a multi-symbol request override this.
+        """
+        fetched: Dict[str, Bars] = {}
+        errors: Dict[str, str] = {}
+        if not symbols:
+            return fetched, errors
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_CONCURRENCY, len(symbols))),
+                                thread_name_prefix="bar-fetch") as pool:
+            futures = {symbol: pool.submit(self.fetch, symbol, start, end) for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    fetched[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = str(e)
+        return fetched, errors
+
+
+class YFinanceProvider(BarProvider):
+    """Daily bars from Yahoo Finance"""
+
+    def __init__(self, interval: str = "1d"):
+        self.interval = interval
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> Bars:
+        import yfinance as yf
+        data = yf.download(symbol, start=start, end=end, interval=self.interval, progress=False)
+        return Bars.from_frame(data)
+
+    def fetch_many(self, symbols: Sequence[str], start: datetime,
+                   end: datetime) -> Tuple[Dict[str, Bars], Dict[str, str]]:
+        """One multi-ticker download; yfinance spreads it over its own threads and shared session"""
+        import pandas as pd
+        import yfinance as yf
+        fetched: Dict[str, Bars] = {}
+        errors: Dict[str, str] = {}
+        if not symbols:
+            return fetched, errors
+        data = yf.download(list(symbols), start=start, end=end, interval=self.interval, progress=False,
+                           group_by="ticker", threads=max(1, min(FETCH_CONCURRENCY, len(symbols))))
+        for symbol in symbols:
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        raise ValueError(f"No data returned for {symbol}")
+                    frame = data[symbol]
+                else:
+                    frame = data
+                # Tickers share the union of dates; drop the ones this ticker has no bar for
+                fetched[symbol] = Bars.from_frame(frame.dropna(how="all"))
+            except Exception as e:
+                errors[symbol] = str(e)
+        return fetched, errors
+
+
+class CSVProvider(BarProvider):
+    """Offline provider reading ``<SYMBOL>.csv`` fixture files from a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> Bars:
+        import pandas as pd
+        path = os.path.join(self.directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No fixture data for {symbol} at {path}")
+
+        frame = pd.read_csv(path)
+        date_column = next((c for c in frame.columns if c.lower() in ("date", "datetime", "timestamp")),
+                           frame.columns[0])
+        frame.index = pd.to_datetime(frame.pop(date_column), utc=True)
+        bars = Bars.from_frame(frame)
+
+        start_ns = pd.Timestamp(start).value
+        end_ns = pd.Timestamp(end).value
+        mask = (bars.timestamp >= start_ns) & (bars.timestamp < end_ns)
+        return Bars(*(getattr(bars, name)[mask] for name in COLUMN_DTYPES))
+
+
+class MockProvider(BarProvider):
+    """Offline provider of synthetic daily bars for any symbol.
+
+    Prices are a random walk seeded by the symbol over a fixed business-day
+    calendar, so repeated and overlapping fetches agree bar for bar. ``latency``
+    seconds are slept per request to stand in for network time, and
+    ``requests`` counts the requests made.
+    """
+
+    EPOCH = "2000-01-03"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> Bars:
+        import pandas as pd
+        with self._lock:
+            self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        days = pd.bdate_range(self.EPOCH, pd.Timestamp(end).tz_localize(None).normalize())
+        rng = np.random.default_rng(zlib.crc32(symbol.upper().encode()))
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(days))))
+        spread = np.abs(rng.normal(0.0, 0.005, len(days)))
+        volume = np.round(rng.lognormal(13.0, 0.5, len(days)))
+        timestamp = days.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+        mask = (timestamp >= pd.Timestamp(start).tz_localize(None).value) & (
+            timestamp < pd.Timestamp(end).tz_localize(None).value)
+        previous = np.concatenate([[close[0]], close[:-1]])
+        return Bars(timestamp[mask], previous[mask], (close * (1 + spread))[mask],
+                    (np.minimum(previous, close) * (1 - spread))[mask], close[mask], volume[mask])
+
+
+def create_provider() -> BarProvider:
+    """Create the bar provider configured through BAR_PROVIDER"""
+    name = os.getenv("BAR_PROVIDER", "yfinance").lower()
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "csv":
+        return CSVProvider(os.getenv("BAR_FIXTURE_PATH", "./data/fixtures"))
+    if name == "mock":
+        return MockProvider(float(os.getenv("BAR_MOCK_LATENCY", 0)))
+    raise ValueError(f"Unknown bar provider: {name}")
+
+
+class BarStore:
+    """Append-only, per-symbol columnar OHLCV store backed by memory-mapped files.
+
+    Each symbol lives in its own directory holding one raw little-endian file per
+    column plus a ``meta.json`` with the committed row count. Readers only ever see
+    committed rows, so a torn append is invisible and truncated on the next write.
+    """
+
+    def __init__(self, root: Optional[str] = None, provider: Optional[BarProvider] = None,
+                 history_days: Optional[int] = None, max_age: Optional[float] = None):
+        self.root = root or os.getenv("BAR_STORE_PATH", "./data/bars")
+        self.provider = provider or create_provider()
+        self.history_days = history_days if history_days is not None else int(
+            os.getenv("BAR_STORE_HISTORY_DAYS", 365))
+        # Seconds between top-up checks of the same symbol
+        self.max_age = max_age if max_age is not None else float(os.getenv("BAR_STORE_MAX_AGE", 3600))
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # Each open column map holds a file descriptor, so keep only the most recent symbols mapped
+        self.max_open_symbols = int(os.getenv("BAR_STORE_OPEN_SYMBOLS", 512))
+        self._maps: "OrderedDict[str, tuple]" = OrderedDict()
+        self._maps_lock = threading.Lock()
+
+    def _symbol_dir(self, symbol: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_.^=" else "_" for c in symbol.upper())
+        return os.path.join(self.root, safe)
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol.upper(), threading.Lock())
+
+    @contextmanager
+    def _write_lock(self, symbol: str):
+        """Serialize writers across threads and, where supported, processes"""
+        directory = self._symbol_dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock(symbol):
+            with open(os.path.join(directory, ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield directory
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def metadata(self, symbol: str) -> Dict[str, Any]:
+        """Return the committed metadata for a symbol (rows, version, ...)"""
+        path = os.path.join(self._symbol_dir(symbol), "meta.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, "version": 0, "last_timestamp": None, "checked_at": None}
+
+    def version(self, symbol: str) -> int:
+        return self.metadata(symbol)["version"]
+
+    def _write_metadata(self, directory: str, meta: Dict[str, Any]):
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    def append(self, symbol: str, bars: Bars) -> int:
+        """Append completed bars newer than the last stored bar; returns the number of rows written.
+
+        A daily bar is only stored once its 24 hours have passed. Stored rows are
+        never rewritten, so a bar fetched mid-session would otherwise keep its
+        partial values; it is fetched again on the next top-up instead.
+        """
+        bars = bars.until(time.time_ns() - NS_PER_DAY)
+        with self._write_lock(symbol) as directory:
+            meta = self.metadata(symbol)
+            if meta["last_timestamp"] is not None:
+                bars = bars.since(meta["last_timestamp"])
+
+            meta["checked_at"] = datetime.utcnow().isoformat()
+            if len(bars) > 0:
+                rows = meta["rows"]
+                for name, dtype in COLUMN_DTYPES.items():
+                    path = os.path.join(directory, f"{name}.col")
+                    with open(path, "ab") as f:
+                        # Drop bytes from an append that never got committed
+                        f.truncate(rows * dtype.itemsize)
+                        f.write(np.ascontiguousarray(getattr(bars, name), dtype=dtype).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                meta["rows"] = rows + len(bars)
+                meta["last_timestamp"] = int(bars.timestamp[-1])
+                meta["version"] += 1
+
+            self._write_metadata(directory, meta)
+            return len(bars)
+
+    def _missing_range(self, symbol: str, force: bool = False) -> Optional[Tuple[datetime, datetime]]:
+        """The range to fetch to bring a symbol up to date, or None while its last check is fresh"""
+        meta = self.metadata(symbol)
+        if not force and meta["checked_at"] is not None:
+            age = datetime.utcnow() - datetime.fromisoformat(meta["checked_at"])
+            if age.total_seconds() < self.max_age:
+                return None
+
+        end = (datetime.utcnow() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        if meta["last_timestamp"] is None:
+            start = end - timedelta(days=self.history_days + 1)
+        else:
+            # Re-request the last stored day; append() discards what we already have and
+            # the current day's bar until it is complete
+            last = datetime(1970, 1, 1) + timedelta(microseconds=meta["last_timestamp"] // 1000)
+            start = last.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, end
+
+    def top_up(self, symbol: str, force: bool = False) -> int:
+        """Fetch only the bars missing after the last stored one"""
+        missing = self._missing_range(symbol, force)
+        if missing is None:
+            return 0
+
+        bars = self.provider.fetch(symbol, *missing)
+        written = self.append(symbol, bars)
+        if written:
+            logger.info(f"Bar store: appended {written} bars for {symbol}")
+        return written
+
+    def top_up_many(self, symbols: Sequence[str], force: bool = False) -> Dict[str, str]:
+        """Top up several symbols at once; returns the errors of the symbols that failed.
+
+        Stale symbols needing the same range (e.g. every new symbol's backfill,
+        or every symbol last updated the same day) go to the provider together
+        through ``fetch_many``, so they are fetched concurrently or in one
+        multi-symbol request.
+        """
+        groups: Dict[Tuple[datetime, datetime], List[str]] = defaultdict(list)
+        for symbol in dict.fromkeys(symbols):
+            missing = self._missing_range(symbol, force)
+            if missing is not None:
+                groups[missing].append(symbol)
+
+        errors: Dict[str, str] = {}
+        for (start, end), group in groups.items():
+            try:
+                fetched, failed = self.provider.fetch_many(group, start, end)
+            except Exception as e:
+                # Keep going: callers fall back to the bars already stored for these symbols
+                logger.warning(f"Bar store: fetching {len(group)} symbols failed: {str(e)}")
+                errors.update((symbol, str(e)) for symbol in group)
+                continue
+            errors.update(failed)
+            for symbol, bars in fetched.items():
+                try:
+                    written = self.append(symbol, bars)
+                except Exception as e:
+                    errors[symbol] = str(e)
+                    continue
+                if written:
+                    logger.info(f"Bar store: appended {written} bars for {symbol}")
+        return errors
+
+    def read(self, symbol: str) -> Bars:
+        """Memory-map every committed bar of a symbol"""
+        meta = self.metadata(symbol)
+        rows = meta["rows"]
+        if rows == 0:
+            return Bars.empty()
+
+        key = symbol.upper()
+        with self._maps_lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == meta["version"]:
+                self._maps.move_to_end(key)
+                return cached[1]
+
+        directory = self._symbol_dir(symbol)
+        columns = [np.memmap(os.path.join(directory, f"{name}.col"), dtype=dtype, mode="r", shape=(rows,))
+                   for name, dtype in COLUMN_DTYPES.items()]
+        bars = Bars(*columns)
+        with self._maps_lock:
+            self._maps[key] = (meta["version"], bars)
+            self._maps.move_to_end(key)
+            while len(self._maps) > self.max_open_symbols:
+                self._maps.popitem(last=False)
+        return bars
+
+    def symbols(self) -> List[str]:
+        """Every symbol with committed bars in the store (as stored, i.e. upper case)"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, "meta.json")))
+
+    def get_bars(self, symbol: str, lookback_days: Optional[int] = None, top_up: bool = True) -> Bars:
+        """Top the symbol up if stale (unless ``top_up`` is False) and return its bars for the lookback window"""
+        if top_up:
+            try:
+                self.top_up(symbol)
+            except Exception as e:
+                # Serve whatever is already on disk when the provider is unavailable
+                if self.metadata(symbol)["rows"] == 0:
+                    raise
+                logger.warning(f"Bar store: top-up failed for {symbol}, serving stored data: {str(e)}")
+
+        bars = self.read(symbol)
+        if lookback_days is None or len(bars) == 0:
+            return bars
+        cutoff = int(bars.timestamp[-1]) - lookback_days * NS_PER_DAY
+        return bars.since(cutoff)
+
+    def load_matrix(self, symbols: List[str], lookback_days: Optional[int] = None,
+                    columns: Sequence[str] = ("close", "volume"), dtype=np.float64,
+                    top_up: bool = True) -> BarMatrix:
+        """Load several symbols into (symbols, bars) matrices aligned on a shared timestamp index.
+
+        Stale symbols are topped up together (see ``top_up_many``) rather than
+        one after another. Every symbol's bars are then scattered into the
+        matrices by position on the sorted union of timestamps, with no per-symbol reindexing.
+        """
+        loaded: Dict[str, Bars] = {}
+        errors: Dict[str, str] = {}
+        failed = self.top_up_many(symbols) if top_up else {}
+        for symbol in symbols:
+            if symbol in failed:
+                # Serve whatever is already on disk when the provider is unavailable
+                if self.metadata(symbol)["rows"] == 0:
+                    errors[symbol] = failed[symbol]
+                    continue
+                logger.warning(f"Bar store: top-up failed for {symbol}, serving stored data: {failed[symbol]}")
+            try:
+                loaded[symbol] = self.get_bars(symbol, lookback_days, top_up=False)
+            except Exception as e:
+                errors[symbol] = str(e)
+
+        stamps = [np.asarray(bars.timestamp) for bars in loaded.values()]
+        timestamp = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=COLUMN_DTYPES["timestamp"])
+        if lookback_days is not None and len(timestamp):
+            # Symbols end on different days; keep one window ending at the newest bar
+            timestamp = timestamp[timestamp > timestamp[-1] - lookback_days * NS_PER_DAY]
+
+        matrix = {name: np.full((len(symbols), len(timestamp)), np.nan, dtype=dtype) for name in columns}
+        for row, symbol in enumerate(symbols):
+            bars = loaded.get(symbol)
+            if bars is None or len(bars) == 0:
+                continue
+            positions = np.searchsorted(timestamp, bars.timestamp)
+            keep = (positions < len(timestamp)) & (timestamp[np.minimum(positions, len(timestamp) - 1)] == bars.timestamp)
+            for name in columns:
+                matrix[name][row, positions[keep]] = np.asarray(getattr(bars, name))[keep]
+        return BarMatrix(list(symbols), timestamp, matrix, errors)
@@ -0,0 +1,84 @@
+"""Compare vectorized anomaly detection with the original z-score comprehension and bar loop,
+and time the rolling (EWMA / MAD) detectors in batch and per tick.
+
+Usage (from ai-backend/): python benchmarks/bench_anomalies.py [--years 3] [--repeat 3] [--window 60]
+
+The default is three years of regular-session minute bars (~295k rows).
+"""
+import os
+import sys
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from anomalies import EWMA, MAD, StreamingAnomalyDetector, detect_rolling, find_anomalies, zscore  # noqa: E402
+
+
+def loop_anomalies(close, volume):
+    """The z-scores and per-bar loop MLService.detect_anomalies used to run"""
+    def calculate_zscore(data):
+        mean = np.mean(data)
+        std = np.std(data)
+        return [(x - mean) / std for x in data]
+
+    price_zscore = calculate_zscore(close)
+    volume_zscore = calculate_zscore(volume)
+    anomalies = []
+    threshold = 2.0
+    for i in range(len(price_zscore)):
+        if abs(price_zscore[i]) > threshold or abs(volume_zscore[i]) > threshold:
+            anomalies.append({
+                'timestamp': (datetime.now() - timedelta(days=len(price_zscore) - i)).isoformat(),
+                'price_zscore': price_zscore[i],
+                'volume_zscore': volume_zscore[i],
+                'severity': 'high' if abs(price_zscore[i]) > 3.0 or abs(volume_zscore[i]) > 3.0 else 'medium'
+            })
+    return anomalies
+
+
+def vectorized_anomalies(timestamp, close, volume):
+    return find_anomalies(timestamp, zscore(close), zscore(volume))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--window", type=int, default=60)
+    args = parser.parse_args()
+
+    rows = int(args.years * 252 * 390)
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, rows)))
+    volume = rng.lognormal(8, 1, rows)
+    timestamp = np.datetime64("2021-01-04T14:30", "ns").astype(np.int64) + np.arange(rows, dtype=np.int64) * 60 * 10**9
+
+    expected = loop_anomalies(close, volume)
+    actual = vectorized_anomalies(timestamp, close, volume)
+    if len(expected) != len(actual) or any(
+            e["severity"] != a["severity"] or not np.isclose(e["price_zscore"], a["price_zscore"])
+            or not np.isclose(e["volume_zscore"], a["volume_zscore"]) for e, a in zip(expected, actual)):
+        raise SystemExit("Anomaly mismatch")
+
+    baseline = min(timeit.repeat(lambda: loop_anomalies(close, volume), number=1, repeat=args.repeat))
+    vectorized = min(timeit.repeat(lambda: vectorized_anomalies(timestamp, close, volume),
+                                   number=1, repeat=args.repeat))
+    print(f"rows={rows} anomalies={len(actual)}")
+    print(f"loop:       {baseline * 1e3:8.2f} ms")
+    print(f"vectorized: {vectorized * 1e3:8.2f} ms")
+    print(f"speedup:    {baseline / vectorized:8.1f}x")
+
+    closes, volumes = close.tolist(), volume.tolist()
+    for method in (EWMA, MAD):
+        batch = min(timeit.repeat(lambda: detect_rolling(timestamp, close, volume, method, args.window),
+                                  number=1, repeat=args.repeat))
+        detector = StreamingAnomalyDetector(method, args.window)
+        live = timeit.timeit(lambda: [detector.update(c, v) for c, v in zip(closes, volumes)], number=1)
+        print(f"{method}: batch {batch * 1e3:8.2f} ms, live {rows / live:10.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    main()
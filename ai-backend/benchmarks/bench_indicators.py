@@ -0,0 +1,117 @@
+"""Compare the indicator engine with the original pandas implementation.
+
+Usage (from ai-backend/): python benchmarks/bench_indicators.py [--bars 10000] [--float32]
+                          python benchmarks/bench_indicators.py --symbols 500 --bars 252 [--float32]
+
+With ``--symbols`` the engine computes one (symbols, bars) matrix in a single
+pass (in float32 end to end with ``--float32``) against a per-symbol pandas loop.
+"""
+import os
+import sys
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicators import INDICATORS, compute_indicators  # noqa: E402
+
+
+def pandas_indicators(data: pd.DataFrame) -> pd.DataFrame:
+    """The pandas implementation MLService._calculate_technical_indicators used to have"""
+    df = pd.DataFrame()
+    df['sma_20'] = data['close'].rolling(window=20).mean()
+    df['sma_50'] = data['close'].rolling(window=50).mean()
+    delta = data['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+    exp1 = data['close'].ewm(span=12, adjust=False).mean()
+    exp2 = data['close'].ewm(span=26, adjust=False).mean()
+    df['macd'] = exp1 - exp2
+    df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+    df['bb_middle'] = data['close'].rolling(window=20).mean()
+    df['bb_std'] = data['close'].rolling(window=20).std()
+    df['bb_upper'] = df['bb_middle'] + (df['bb_std'] * 2)
+    df['bb_lower'] = df['bb_middle'] - (df['bb_std'] * 2)
+    df['volume_sma'] = data['volume'].rolling(window=20).mean()
+    df['volume_ratio'] = data['volume'] / df['volume_sma']
+    df['momentum'] = data['close'].pct_change(periods=10)
+    df['volatility'] = data['close'].rolling(window=20).std()
+    return df
+
+
+def bench_matrix(args):
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (args.symbols, args.bars)), axis=1))
+    volume = rng.integers(100_000, 1_000_000, (args.symbols, args.bars)).astype(np.float64)
+    # Give a quarter of the universe shorter histories, padded with NaN
+    starts = rng.integers(0, args.bars // 2, args.symbols)
+    starts[: args.symbols * 3 // 4] = 0
+    for row, start in enumerate(starts):
+        close[row, :start] = volume[row, :start] = np.nan
+    frames = [pd.DataFrame({"close": close[row, start:], "volume": volume[row, start:]})
+              for row, start in enumerate(starts)]
+    dtype = np.float32 if args.float32 else None
+    columns = {"close": close, "volume": volume}
+
+    actual = compute_indicators(columns, dtype=dtype)
+    for row in rng.choice(args.symbols, min(args.symbols, 20), replace=False):
+        expected = pandas_indicators(frames[row])
+        for name in INDICATORS:
+            scale = max(1.0, float(np.nanmax(np.abs(expected[name].to_numpy()))))
+            rtol, atol = (1e-3, 1e-3 * scale) if args.float32 else (1e-9, 1e-7 * scale)
+            if not np.allclose(expected[name].to_numpy(), actual[name][row, starts[row]:],
+                               rtol=rtol, atol=atol, equal_nan=True):
+                raise SystemExit(f"Mismatch in {name} for row {row}")
+
+    baseline = min(timeit.repeat(lambda: [pandas_indicators(frame) for frame in frames],
+                                 number=1, repeat=max(1, args.repeat // 3)))
+    engine = min(timeit.repeat(lambda: compute_indicators(columns, dtype=dtype), number=3, repeat=args.repeat)) / 3
+    print(f"symbols={args.symbols} bars={args.bars} dtype={'float32' if args.float32 else 'float64'}")
+    print(f"pandas loop:   {baseline * 1e3:8.1f} ms")
+    print(f"engine matrix: {engine * 1e3:8.1f} ms")
+    print(f"speedup:       {baseline / engine:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=10_000)
+    parser.add_argument("--symbols", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--float32", action="store_true")
+    args = parser.parse_args()
+
+    if args.symbols:
+        return bench_matrix(args)
+
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, args.bars)))
+    volume = rng.integers(100_000, 1_000_000, args.bars).astype(np.float64)
+    frame = pd.DataFrame({"close": close, "volume": volume})
+    dtype = np.float32 if args.float32 else np.float64
+    columns = {"close": close.astype(dtype), "volume": volume.astype(dtype)}
+
+    expected = pandas_indicators(frame)
+    actual = compute_indicators(columns)
+    for name in INDICATORS:
+        # pandas' online rolling variance drifts by ~1e-8 of the price level, so
+        # compare with a tolerance relative to the series' scale
+        scale = max(1.0, float(np.nanmax(np.abs(expected[name].to_numpy()))))
+        rtol, atol = (1e-5, 1e-5 * scale) if args.float32 else (1e-9, 1e-7 * scale)
+        if not np.allclose(expected[name].to_numpy(), actual[name], rtol=rtol, atol=atol, equal_nan=True):
+            raise SystemExit(f"Mismatch in {name}")
+
+    number = 20
+    baseline = min(timeit.repeat(lambda: pandas_indicators(frame), number=number, repeat=args.repeat)) / number
+    engine = min(timeit.repeat(lambda: compute_indicators(columns), number=number, repeat=args.repeat)) / number
+    print(f"bars={args.bars} dtype={np.dtype(dtype).name}")
+    print(f"pandas:  {baseline * 1e3:8.3f} ms")
+    print(f"engine:  {engine * 1e3:8.3f} ms")
+    print(f"speedup: {baseline / engine:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare decoding a /predict history sent as JSON (Pydantic validation + row parsing)
+with the binary columnar body (columnar.py).
+
+Usage (from ai-backend/): python benchmarks/bench_ingestion.py [--bars 5000] [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import timeit
+from typing import Any, Dict, List
+
+import numpy as np
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar import decode_columns, encode_columns, stack_columns  # noqa: E402
+from sequences import OHLCV_FIELDS, parse_ohlcv  # noqa: E402
+
+
+class PredictionRequest(BaseModel):
+    """Same shape as main.PredictionRequest"""
+    symbol: str
+    historical_data: List[Dict[str, Any]]
+
+
+def from_json(body: bytes) -> np.ndarray:
+    request = PredictionRequest.model_validate_json(body)
+    return parse_ohlcv(request.historical_data)
+
+
+def from_columns(body: bytes) -> np.ndarray:
+    _, columns = decode_columns(body)
+    return stack_columns(columns, OHLCV_FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    columns = {name: rng.random(args.bars) * 100 for name in OHLCV_FIELDS}
+    json_body = json.dumps({"symbol": "AAPL", "historical_data": [
+        {name: float(columns[name][i]) for name in OHLCV_FIELDS} for i in range(args.bars)]}).encode()
+    columnar_body = encode_columns(columns, symbol="AAPL")
+    if not np.array_equal(from_json(json_body), from_columns(columnar_body)):
+        raise SystemExit("Decoded data mismatch")
+
+    number = 10
+    baseline = min(timeit.repeat(lambda: from_json(json_body), number=number, repeat=args.repeat)) / number
+    columnar = min(timeit.repeat(lambda: from_columns(columnar_body), number=number, repeat=args.repeat)) / number
+    print(f"bars={args.bars}")
+    print(f"json:     {baseline * 1e3:8.3f} ms  {len(json_body) / 1e3:8.1f} kB")
+    print(f"columnar: {columnar * 1e3:8.3f} ms  {len(columnar_body) / 1e3:8.1f} kB")
+    print(f"speedup:  {baseline / columnar:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
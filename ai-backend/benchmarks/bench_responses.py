@@ -0,0 +1,64 @@
+"""Compare FastAPI's default response path (jsonable_encoder + JSONResponse) with
+``responses.dumps`` on large correlation and anomaly payloads.
+
+Usage (from ai-backend/): python benchmarks/bench_responses.py [--symbols 1000] [--anomalies 50000] [--repeat 3]
+"""
+import os
+import sys
+import argparse
+import timeit
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from correlation import DICT, MATRIX, correlation_matrix, format_correlation  # noqa: E402
+from responses import dumps, orjson  # noqa: E402
+
+
+def default_path(payload):
+    """What FastAPI does with a dict returned from an endpoint"""
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--anomalies", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    symbols = [f"S{i:05d}" for i in range(args.symbols)]
+    matrix = correlation_matrix(rng.normal(size=(args.symbols, 252)))
+    anomalies = {"anomalies": [{
+        "timestamp": f"2024-01-01T14:{i % 60:02d}:00.000000",
+        "price_zscore": float(p),
+        "volume_zscore": float(v),
+        "severity": "high" if abs(p) > 3.0 else "medium",
+    } for i, (p, v) in enumerate(rng.normal(0, 3, (args.anomalies, 2)))]}
+    payloads = {
+        "correlation dict": format_correlation(symbols, matrix, DICT),
+        "correlation matrix": format_correlation(symbols, matrix, MATRIX),
+        "anomalies": anomalies,
+        "signal (numpy scalars)": {"symbol": "AAPL", "current_price": np.float64(187.3),
+                                   "sma_5": np.float64(185.1), "volume": np.int64(51234000)},
+    }
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'json (orjson not installed)'}")
+    for name, payload in payloads.items():
+        number = 1000 if "signal" in name else 1
+        fast = min(timeit.repeat(lambda: dumps(payload), number=number, repeat=args.repeat)) / number
+        try:
+            default_path(payload)
+        except ValueError as e:
+            print(f"{name:24s} default fails ({str(e)[:60]}...)  dumps {fast * 1e3:9.3f} ms")
+            continue
+        baseline = min(timeit.repeat(lambda: default_path(payload), number=number, repeat=args.repeat)) / number
+        print(f"{name:24s} default {baseline * 1e3:9.3f} ms  dumps {fast * 1e3:9.3f} ms  "
+              f"speedup {baseline / fast:6.1f}x  ({len(dumps(payload)) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare scoring headlines one by one with VADER's ``polarity_scores`` with the
+batch scorer (vader_batch.py), after checking that both give identical scores.
+
+Usage (from ai-backend/): python benchmarks/bench_sentiment.py [--texts 5000] [--repeat 3]
+"""
+import os
+import sys
+import random
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vader_batch import BatchSentimentScorer  # noqa: E402
+from vader_lexicon import load_analyzer  # noqa: E402
+
+FILLER = ["stock", "market", "shares", "Inc.", "reports", "quarter", "earnings", "guidance", "the", "a", "of"]
+RULE_WORDS = ["not", "never", "so", "but", "very", "least", "at", "kind", "of", "hardly", "extremely", "BIG"]
+
+
+def headlines(analyzer, count: int, seed: int = 42):
+    """Synthetic headlines mixing lexicon words, VADER rule words, caps and punctuation"""
+    rng = random.Random(seed)
+    lexicon = sorted(analyzer.lexicon)
+    texts = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(6, 16)):
+            pool = rng.choice((lexicon, FILLER, FILLER, RULE_WORDS))
+            word = rng.choice(pool)
+            if rng.random() < 0.05:
+                word = word.upper()
+            if rng.random() < 0.1:
+                word += rng.choice(".,!?")
+            words.append(word)
+        texts.append(" ".join(words))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = load_analyzer()
+    scorer = BatchSentimentScorer(analyzer)
+    texts = headlines(analyzer, args.texts)
+
+    batch = scorer.polarity_scores(texts)
+    for i, text in enumerate(texts):
+        expected = analyzer.polarity_scores(text)
+        if any(float(batch[name][i]) != value for name, value in expected.items()):
+            raise SystemExit(f"Score mismatch for {text!r}: {expected}")
+
+    baseline = min(timeit.repeat(lambda: [analyzer.polarity_scores(text) for text in texts],
+                                 number=1, repeat=args.repeat))
+    batched = min(timeit.repeat(lambda: scorer.polarity_scores(texts), number=1, repeat=args.repeat))
+    print(f"texts={args.texts}")
+    print(f"per text: {baseline * 1e3:8.1f} ms")
+    print(f"batch:    {batched * 1e3:8.1f} ms")
+    print(f"speedup:  {baseline / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the strided sequence builder with the original _prepare_price_data loop.
+
+Usage (from ai-backend/): python benchmarks/bench_sequences.py [--rows 5000] [--window 60] [--float32]
+"""
+import os
+import sys
+import argparse
+import timeit
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scalers import ScalerParams  # noqa: E402
+from sequences import build_sequences  # noqa: E402
+
+
+def loop_sequences(historical_data, window: int) -> np.ndarray:
+    """The parsing and windowing MLService._prepare_price_data used to do"""
+    data = []
+    for d in historical_data:
+        if isinstance(d, dict):
+            data.append([float(d['open']), float(d['high']), float(d['low']), float(d['close']),
+                         float(d['volume'])])
+        elif isinstance(d, tuple):
+            data.append([float(d[0]), float(d[1]), float(d[2]), float(d[3]), float(d[4])])
+    data = np.array(data)
+    scaled_data = MinMaxScaler().fit_transform(data)
+    X = []
+    for i in range(window, len(scaled_data)):
+        X.append(scaled_data[i - window:i])
+    return np.array(X)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--float32", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, args.rows)))
+    rows = [{"open": c * 0.99, "high": c * 1.01, "low": c * 0.98, "close": c, "volume": float(v)}
+            for c, v in zip(close.tolist(), rng.integers(100_000, 1_000_000, args.rows).tolist())]
+    dtype = np.float32 if args.float32 else np.float64
+
+    expected = loop_sequences(rows, args.window)
+    actual = build_sequences(rows, ScalerParams.fit, args.window, dtype)
+    tolerance = 1e-6 if args.float32 else 1e-12
+    if expected.shape != actual.shape or not np.allclose(expected, actual, rtol=0, atol=tolerance):
+        raise SystemExit("Sequence mismatch")
+
+    number = 5
+    baseline = min(timeit.repeat(lambda: loop_sequences(rows, args.window), number=number, repeat=args.repeat)) / number
+    strided = min(timeit.repeat(lambda: build_sequences(rows, ScalerParams.fit, args.window, dtype),
+                                number=number, repeat=args.repeat)) / number
+    backing = actual
+    while backing.base is not None:
+        backing = backing.base
+    print(f"rows={args.rows} window={args.window} dtype={np.dtype(dtype).name} -> X{actual.shape}")
+    print(f"loop:    {baseline * 1e3:8.2f} ms, {expected.nbytes / 2**20:8.2f} MiB of windows")
+    print(f"strided: {strided * 1e3:8.2f} ms, {backing.nbytes / 2**20:8.2f} MiB backing array")
+    print(f"speedup: {baseline / strided:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure streaming indicator updates across many symbols and check them against the batch engine.
+
+Usage (from ai-backend/): python benchmarks/bench_streaming.py [--symbols 2000] [--ticks 20] [--rsi wilder]
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicators import INDICATORS, compute_indicators, indicator_exprs  # noqa: E402
+from streaming import StreamingIndicators, StreamingIndicatorRegistry  # noqa: E402
+
+
+def check_parity(bars: int, rsi_method: str):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, bars))
+    volume = rng.uniform(1e5, 1e6, bars)
+    expected = compute_indicators({"close": close, "volume": volume}, rsi_method=rsi_method)
+
+    stream = StreamingIndicators(indicator_exprs(INDICATORS, rsi_method))
+    rows = [stream.update(c, v) for c, v in zip(close.tolist(), volume.tolist())]
+    for name in INDICATORS:
+        actual = np.array([row[name] for row in rows])
+        scale = np.nanmax(np.abs(expected[name])) if np.isfinite(expected[name]).any() else 1.0
+        if not np.allclose(actual, expected[name], rtol=1e-9, atol=1e-7 * scale, equal_nan=True):
+            raise AssertionError(f"{name}: streaming output differs from the batch engine")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=60, help="bars fed per symbol before timing")
+    parser.add_argument("--rsi", choices=("sma", "wilder"), default="sma")
+    args = parser.parse_args()
+
+    check_parity(5000, args.rsi)
+
+    rng = np.random.default_rng(1)
+    registry = StreamingIndicatorRegistry(path=os.devnull, rsi_method=args.rsi)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    for symbol in symbols:
+        for t, price in enumerate((100 + np.cumsum(rng.normal(0, 1, args.warmup))).tolist()):
+            registry.update(symbol, price, 1e6, t)
+
+    prices = (100 + rng.normal(0, 1, (args.ticks, args.symbols))).tolist()
+    start = time.perf_counter()
+    for tick, row in enumerate(prices):
+        for symbol, price in zip(symbols, row):
+            registry.update(symbol, price, 1e6, args.warmup + tick)
+    elapsed = time.perf_counter() - start
+
+    updates = args.ticks * args.symbols
+    print(f"{args.symbols} symbols x {args.ticks} ticks, rsi={args.rsi}, parity ok")
+    print(f"  {elapsed / updates * 1e6:.1f} us per bar, {updates / elapsed:,.0f} bars/s on one core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Report what the service spends its startup on: the slowest imports of ``main``
+(from ``python -X importtime``) and the time from launching uvicorn until /ready answers.
+
+Usage (from ai-backend/): python benchmarks/profile_startup.py [--top 20] [--port 8191] [--skip-server]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(top: int):
+    """Print the modules with the largest cumulative import time"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        try:
+            rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+        except ValueError:
+            continue  # header line
+    if completed.returncode != 0:
+        raise SystemExit(f"import main failed:\n{completed.stderr[-2000:]}")
+
+    total = next((cumulative for cumulative, _, module in rows if module.strip() == "main"), 0)
+    print(f"import main: {total / 1e3:8.1f} ms")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, self_time, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1e3:10.1f}ms {self_time / 1e3:8.1f}ms  {module}")
+
+
+def time_to_ready(port: int, timeout: float = 60.0):
+    """Launch uvicorn and poll /ready until it answers 200"""
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=BACKEND_DIR)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+                    if response.status == 200:
+                        print(f"ready after: {(time.perf_counter() - started) * 1e3:8.1f} ms")
+                        return
+            except OSError:
+                pass
+            time.sleep(0.02)
+        raise SystemExit(f"/ready did not answer within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8191)
+    parser.add_argument("--skip-server", action="store_true")
+    args = parser.parse_args()
+
+    import_profile(args.top)
+    if not args.skip_server:
+        time_to_ready(args.port)
+
+
+if __name__ == "__main__":
+    main()
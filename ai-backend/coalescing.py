@@ -0,0 +1,76 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _upper_symbol(args: tuple, kwargs: Dict[str, Any]) -> Tuple[tuple, Dict[str, Any]]:
+    return (args[0].strip().upper(),) + tuple(args[1:]), kwargs
+
+
+# Argument normalization per endpoint, for endpoints whose result does not echo
+# the raw arguments (e.g. anomaly results do not repeat the symbol's spelling)
+KEY_NORMALIZERS: Dict[str, Callable[[tuple, Dict[str, Any]], Tuple[tuple, Dict[str, Any]]]] = {
+    "anomalies": _upper_symbol,
+}
+
+
+def _key_default(value: Any) -> Any:
+    """Canonical form of non-JSON arguments; arrays are keyed by a digest of their contents"""
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+        return ["ndarray", data.dtype.str, list(data.shape), hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()]
+    return str(value)
+
+
+def request_key(endpoint: str, method: str, args: tuple, kwargs: Dict[str, Any],
+                versions: Sequence[Any] = ()) -> str:
+    """Stable key for a call: endpoint, canonical JSON of its arguments and the data versions it reads"""
+    normalize = KEY_NORMALIZERS.get(endpoint)
+    if normalize is not None and args:
+        args, kwargs = normalize(args, kwargs)
+    payload = json.dumps([method, args, kwargs, list(versions)], sort_keys=True, separators=(",", ":"),
+                         default=_key_default)
+    return f"{endpoint}:{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers with the same key.
+
+    The computation runs as its own task, so a caller that disconnects does not
+    cancel it for the others. Keys are dropped as soon as the task finishes;
+    this is not a cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "followers": self.followers}
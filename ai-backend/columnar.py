@@ -0,0 +1,93 @@
+import json
+import struct
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# Content type of the binary columnar body accepted next to JSON (e.g. by /predict)
+MEDIA_TYPE = "application/vnd.renx.columns"
+
+# Layout: MAGIC, uint32 little-endian header length, UTF-8 JSON header, zero padding to
+# an 8-byte boundary, then each column's values back to back in header order.
+# The header is {"rows": n, "columns": {"name": "numpy dtype", ...}, ...any metadata}.
+MAGIC = b"RXC1"
+_PREFIX = struct.Struct("<4sI")
+ALIGNMENT = 8
+
+# Column dtypes a body may declare (little-endian, fixed width)
+ALLOWED_DTYPES = {"<f8", "<f4", "<i8", "<i4"}
+
+
+class ColumnarFormatError(ValueError):
+    """The body is not a valid columnar payload"""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def encode_columns(columns: Dict[str, np.ndarray], **metadata: Any) -> bytes:
+    """Encode equal-length 1-D columns (and JSON-serializable metadata) as a columnar body"""
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    rows = len(next(iter(arrays.values()))) if arrays else 0
+    dtypes = {}
+    for name, values in arrays.items():
+        if values.ndim != 1 or len(values) != rows:
+            raise ValueError(f"Column '{name}' must be 1-D with {rows} rows")
+        dtype = values.dtype.newbyteorder("<") if values.dtype.byteorder == ">" else values.dtype
+        dtypes[name] = dtype.str
+        if dtypes[name] not in ALLOWED_DTYPES:
+            raise ValueError(f"Column '{name}' has unsupported dtype {values.dtype}")
+
+    header = json.dumps({**metadata, "rows": rows, "columns": dtypes}, separators=(",", ":")).encode("utf-8")
+    start = _aligned(_PREFIX.size + len(header))
+    parts = [_PREFIX.pack(MAGIC, len(header)), header, b"\0" * (start - _PREFIX.size - len(header))]
+    parts.extend(np.ascontiguousarray(values, dtype=dtypes[name]).tobytes() for name, values in arrays.items())
+    return b"".join(parts)
+
+
+def decode_columns(body: bytes) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Decode a columnar body into (header, columns) without copying the column data.
+
+    Columns are read-only views on ``body``.
+    """
+    if len(body) < _PREFIX.size:
+        raise ColumnarFormatError("Body too short for a columnar payload")
+    magic, header_length = _PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise ColumnarFormatError("Body does not start with the columnar magic bytes")
+    try:
+        header = json.loads(bytes(body[_PREFIX.size:_PREFIX.size + header_length]))
+        rows = int(header["rows"])
+        dtypes = dict(header["columns"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ColumnarFormatError(f"Invalid columnar header: {str(e)}")
+    if rows < 0:
+        raise ColumnarFormatError("Invalid columnar header: negative row count")
+
+    offset = _aligned(_PREFIX.size + header_length)
+    columns = {}
+    for name, dtype in dtypes.items():
+        if dtype not in ALLOWED_DTYPES:
+            raise ColumnarFormatError(f"Column '{name}' has unsupported dtype {dtype}")
+        dtype = np.dtype(dtype)
+        end = offset + rows * dtype.itemsize
+        if end > len(body):
+            raise ColumnarFormatError(f"Body ends inside column '{name}'")
+        columns[name] = np.frombuffer(body, dtype=dtype, count=rows, offset=offset)
+        offset = end
+    if offset != len(body):
+        raise ColumnarFormatError(f"{len(body) - offset} unexpected bytes after the last column")
+    return header, columns
+
+
+def stack_columns(columns: Dict[str, np.ndarray], names, dtype=np.float64) -> np.ndarray:
+    """Stack the named columns into one (rows, len(names)) array, in ``names`` order"""
+    missing = [name for name in names if name not in columns]
+    if missing:
+        raise ColumnarFormatError(f"Missing column(s): {', '.join(missing)}")
+    rows = len(columns[names[0]]) if names else 0
+    data = np.empty((rows, len(names)), dtype=dtype)
+    for i, name in enumerate(names):
+        data[:, i] = columns[name]
+    return data
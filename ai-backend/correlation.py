@@ -0,0 +1,490 @@
+import os
+import hashlib
+import logging
+import warnings
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Symbols per tile side; a tile's temporaries are a few (block, block) arrays,
+# so memory stays bounded however large the universe is
+BLOCK_SIZE = 1024
+
+# Output layouts of MLService.analyze_correlation
+DICT = "dict"      # {column: {row: value}}, as DataFrame.corr().to_dict()
+UPPER = "upper"    # symbols plus the row-major upper triangle (i < j)
+MATRIX = "matrix"  # symbols plus the dense matrix as nested lists
+OUTPUTS = (DICT, UPPER, MATRIX)
+
+# Rolling windows recompute their sums from the window this often, so add /
+# subtract rounding cannot accumulate
+RESYNC_INTERVAL = 1024
+# Up to this many bars at once are applied as in-place rank-1 updates; larger
+# batches as one matrix product
+RANK1_MAX_ROWS = 8
+
+
+def returns_from_prices(close: np.ndarray) -> np.ndarray:
+    """Simple returns of a (symbols, bars) price matrix; NaN wherever either bar is missing"""
+    close = np.asarray(close, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return close[:, 1:] / close[:, :-1] - 1
+
+
+def standardize(returns: np.ndarray, dtype=np.float64):
+    """Center and scale every row once by its own observed mean / std.
+
+    Returns the standardized rows with missing values zeroed, and the mask of
+    observed values. Correlation is invariant to per-row scaling, so pairwise
+    statistics computed from these stay exact but are far better conditioned,
+    which is what makes float32 usable.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    mask = ~np.isnan(returns)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(returns, axis=1, keepdims=True)
+        std = np.nanstd(returns, axis=1, keepdims=True)
+    std = np.where(np.isfinite(std) & (std > 0.0), std, 1.0)
+    mean = np.where(np.isfinite(mean), mean, 0.0)
+    standardized = np.where(mask, (returns - mean) / std, 0.0).astype(dtype, copy=False)
+    return standardized, mask
+
+
+def _pairwise_correlation(count, sum_x, sum_y, sum_xy, sum_xx, sum_yy):
+    """Correlation from sums over each pair's overlapping observations (x: row symbol, y: column symbol)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_xy - sum_x * sum_y / count
+        var_x = sum_xx - sum_x * sum_x / count
+        var_y = sum_yy - sum_y * sum_y / count
+        return cov / np.sqrt(var_x * var_y)
+
+
+def _fix_diagonal(matrix: np.ndarray) -> np.ndarray:
+    """Clip rounding outside [-1, 1] and put exact ones on the diagonal wherever a row has any variance"""
+    np.clip(matrix, -1.0, 1.0, out=matrix)
+    diagonal = np.diagonal(matrix).copy()
+    diagonal[np.isfinite(diagonal)] = 1.0
+    np.fill_diagonal(matrix, diagonal)
+    return matrix
+
+
+def _correlation_tile(z: np.ndarray, m: Optional[np.ndarray], z2: Optional[np.ndarray], rows: slice, cols: slice,
+                      min_periods: int = 1) -> np.ndarray:
+    """Correlations of standardized rows ``rows`` against ``cols``; ``m`` / ``z2`` are None when nothing is missing"""
+    zi, zj = z[rows], z[cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if m is None:
+            # Unit-variance rows: the correlation is the mean cross product
+            tile = zi @ zj.T
+            tile /= z.shape[1]
+            tile[(zi * zi).sum(axis=1) == 0.0] = np.nan
+            tile[:, (zj * zj).sum(axis=1) == 0.0] = np.nan
+            if z.shape[1] < min_periods:
+                tile[:] = np.nan
+        else:
+            mi, mj = m[rows], m[cols]
+            count = mi @ mj.T
+            tile = _pairwise_correlation(count, zi @ mj.T, mi @ zj.T, zi @ zj.T, z2[rows] @ mj.T, mi @ z2[cols].T)
+            tile[count < max(min_periods, 1)] = np.nan
+    return tile
+
+
+def correlation_matrix(returns: np.ndarray, dtype=np.float64, block_size: int = BLOCK_SIZE,
+                       min_periods: int = 1) -> np.ndarray:
+    """Pearson correlation of every pair of rows, like ``DataFrame(returns.T).corr()``.
+
+    Computed tile by tile over the upper triangle with matrix products (each
+    one multithreaded by BLAS) and mirrored. Rows without gaps take a single
+    product per tile; otherwise pairwise-complete statistics come from products
+    with the observation mask: for rows x, y and mask m, the overlap count is
+    m_x.m_y, the overlap sums x.m_y and m_x.y, and so on.
+    """
+    dtype = np.dtype(dtype)
+    z, mask = standardize(returns, dtype)
+    n_symbols = z.shape[0]
+    out = np.empty((n_symbols, n_symbols), dtype=dtype)
+    if n_symbols == 0:
+        return out
+
+    m = z2 = None
+    if not mask.all():
+        m = mask.astype(dtype)
+        z2 = z * z
+
+    for i0 in range(0, n_symbols, block_size):
+        i1 = min(i0 + block_size, n_symbols)
+        for j0 in range(i0, n_symbols, block_size):
+            j1 = min(j0 + block_size, n_symbols)
+            tile = _correlation_tile(z, m, z2, slice(i0, i1), slice(j0, j1), min_periods)
+            out[i0:i1, j0:j1] = tile
+            if j0 != i0:
+                out[j0:j1, i0:i1] = tile.T
+
+    return _fix_diagonal(out)
+
+
+class CorrelationIndex:
+    """Exact nearest-correlation search over a universe's standardized return rows.
+
+    Answers "the K symbols most correlated with X" with one pass over the rows
+    (O(N*T)) and "every pair above rho" tile by tile over the upper triangle,
+    keeping only the hits, so the N x N matrix is never held or serialized.
+    Correlations are the same pairwise-complete values ``correlation_matrix``
+    gives; pairs with fewer than ``min_periods`` overlapping returns are skipped.
+    """
+
+    def __init__(self, symbols: Sequence[str], returns: np.ndarray, dtype=np.float64,
+                 block_size: int = BLOCK_SIZE):
+        self.symbols = list(symbols)
+        self.block_size = block_size
+        self._positions = {symbol.upper(): i for i, symbol in enumerate(self.symbols)}
+        self._z, mask = standardize(returns, np.dtype(dtype))
+        self._m = self._z2 = None
+        if not mask.all():
+            self._m = mask.astype(self._z.dtype)
+            self._z2 = self._z * self._z
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def neighbors(self, symbol: str, k: int = 10, min_periods: int = 1,
+                  absolute: bool = False) -> List[Tuple[str, float]]:
+        """The ``k`` symbols most correlated with ``symbol`` (by |rho| if ``absolute``), strongest first"""
+        position = self._positions.get(symbol.upper())
+        if position is None:
+            raise KeyError(f"{symbol} is not in the index")
+        row = _correlation_tile(self._z, self._m, self._z2, slice(position, position + 1),
+                                slice(0, len(self)), min_periods)[0].astype(np.float64)
+        row[position] = np.nan
+        score = np.abs(row) if absolute else row
+        candidates = np.flatnonzero(~np.isnan(score))
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-score[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-score[candidates], kind="stable")]
+        return [(self.symbols[j], float(row[j])) for j in candidates]
+
+    def pairs_above(self, threshold: float, min_periods: int = 1, absolute: bool = False,
+                    limit: Optional[int] = None) -> Tuple[List[Tuple[str, str, float]], Optional[float]]:
+        """Every pair whose correlation is at least ``threshold`` (|rho| if ``absolute``), strongest first.
+
+        Also returns the mean correlation over all scored pairs, which the same
+        tiles give for free. ``limit`` keeps only the strongest pairs.
+        """
+        n = len(self)
+        hits_i, hits_j, hits_rho = [], [], []
+        total, scored = 0.0, 0
+        for i0 in range(0, n, self.block_size):
+            i1 = min(i0 + self.block_size, n)
+            for j0 in range(i0, n, self.block_size):
+                j1 = min(j0 + self.block_size, n)
+                tile = _correlation_tile(self._z, self._m, self._z2, slice(i0, i1), slice(j0, j1), min_periods)
+                if j0 == i0:
+                    # Diagonal tile: strictly upper part only
+                    tile[np.tril_indices(i1 - i0, m=j1 - j0)] = np.nan
+                np.clip(tile, -1.0, 1.0, out=tile)
+                valid = ~np.isnan(tile)
+                total += float(tile[valid].sum(dtype=np.float64))
+                scored += int(valid.sum())
+                with np.errstate(invalid="ignore"):
+                    rows, cols = np.nonzero((np.abs(tile) if absolute else tile) >= threshold)
+                hits_i.append(rows + i0)
+                hits_j.append(cols + j0)
+                hits_rho.append(tile[rows, cols].astype(np.float64))
+
+        i = np.concatenate(hits_i) if hits_i else np.empty(0, dtype=np.intp)
+        j = np.concatenate(hits_j) if hits_j else np.empty(0, dtype=np.intp)
+        rho = np.concatenate(hits_rho) if hits_rho else np.empty(0)
+        score = np.abs(rho) if absolute else rho
+        if limit is not None and limit < len(rho):
+            keep = np.argpartition(-score, limit - 1)[:limit]
+            i, j, rho, score = i[keep], j[keep], rho[keep], score[keep]
+        order = np.argsort(-score, kind="stable")
+        pairs = [(self.symbols[a], self.symbols[b], float(r)) for a, b, r in zip(i[order], j[order], rho[order])]
+        return pairs, (total / scored if scored else None)
+
+
+def _json_values(values: np.ndarray) -> List[Optional[float]]:
+    """Values as Python floats, with NaN (undefined pairs) as None"""
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).any():
+        values = values.astype(object)
+        values[np.isnan(values.astype(np.float64))] = None
+    return values.tolist()
+
+
+def format_correlation(symbols: List[str], matrix: np.ndarray, output: str = DICT,
+                       name: str = "correlation_matrix", diagonal: bool = False) -> Dict[str, Any]:
+    """Serialize a correlation (or covariance) matrix in one of ``OUTPUTS``.
+
+    The ``upper`` layout leaves the diagonal out unless ``diagonal`` (e.g. for variances).
+    """
+    if output == DICT:
+        rows = _json_values(matrix)
+        return {name: {column: {symbol: rows[i][j] for i, symbol in enumerate(symbols)}
+                       for j, column in enumerate(symbols)}}
+    if output == UPPER:
+        upper = np.triu_indices(len(symbols), k=0 if diagonal else 1)
+        return {"symbols": list(symbols), "upper_triangle": _json_values(matrix[upper])}
+    if output == MATRIX:
+        return {"symbols": list(symbols), name: _json_values(matrix)}
+    raise ValueError(f"Unknown correlation output '{output}', expected one of {', '.join(OUTPUTS)}")
+
+
+class RollingCorrelation:
+    """Correlation and covariance of a fixed universe over its last ``window`` returns, kept current bar by bar.
+
+    Holds the window's returns in a ring buffer and, for every pair, the
+    pairwise-complete sums (overlap count, sums, sums of squares, cross
+    products) as (N, N) matrices: 32 * N^2 bytes. Adding bars is a rank-k
+    update of those sums, evicting bars the matching downdate, so each bar costs
+    O(N^2) and reading the matrices is a handful of elementwise operations.
+    """
+
+    def __init__(self, symbols: Sequence[str], window: int):
+        if window < 2:
+            raise ValueError(f"Rolling correlation needs a window of at least 2 bars, got {window}")
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.window = window
+        n = len(self.symbols)
+        self.last_timestamp: Optional[int] = None
+        self.last_close = np.full(n, np.nan)
+
+        self._returns = np.full((window, n), np.nan)
+        self._head = 0  # ring slot the next return goes to
+        self._filled = 0
+        self._updates = 0
+        self._count = np.zeros((n, n))
+        self._sum_x = np.zeros((n, n))   # [i, j]: sum of i's returns where j is also observed
+        self._sum_xx = np.zeros((n, n))
+        self._sum_xy = np.zeros((n, n))
+        # Matrices read since the last update
+        self._read_cache: Dict[str, np.ndarray] = {}
+
+    def _accumulate(self, rows: np.ndarray, sign: float):
+        """Add (sign 1) or remove (sign -1) bars' contributions to the pair sums"""
+        self._read_cache.clear()
+        observed = ~np.isnan(rows)
+        x = np.where(observed, rows, 0.0)
+        m = observed.astype(np.float64)
+        if len(rows) <= RANK1_MAX_ROWS:
+            from scipy.linalg.blas import dger
+            for xt, mt in zip(x, m):
+                for total, left, right in ((self._count, mt, mt), (self._sum_x, xt, mt),
+                                           (self._sum_xx, xt * xt, mt), (self._sum_xy, xt, xt)):
+                    # BLAS rank-1 update in place: total += sign * outer(left, right). The transpose of a
+                    # C-ordered array is the Fortran-ordered array BLAS expects, hence the swapped vectors
+                    dger(sign, right, left, a=total.T, overwrite_a=True)
+            return
+        for total, product in ((self._count, m.T @ m), (self._sum_x, x.T @ m),
+                               (self._sum_xx, (x * x).T @ m), (self._sum_xy, x.T @ x)):
+            if sign > 0:
+                total += product
+            else:
+                total -= product
+
+    def _window_rows(self) -> np.ndarray:
+        """The window's returns, oldest first"""
+        return self._returns[(self._head - self._filled + np.arange(self._filled)) % self.window]
+
+    def _rebuild(self):
+        for total in (self._count, self._sum_x, self._sum_xx, self._sum_xy):
+            total.fill(0.0)
+        if self._filled:
+            self._accumulate(self._window_rows(), 1.0)
+        self._updates = 0
+
+    def push_returns(self, rows: np.ndarray):
+        """Append (k, N) returns, oldest first, evicting what falls out of the window"""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.symbols))
+        k = len(rows)
+        if k == 0:
+            return
+        if k >= self.window:
+            self._returns[:] = rows[-self.window:]
+            self._head, self._filled = 0, self.window
+            self._rebuild()
+            return
+
+        overflow = max(0, self._filled + k - self.window)
+        if overflow:
+            oldest = (self._head - self._filled + np.arange(overflow)) % self.window
+            self._accumulate(self._returns[oldest], -1.0)
+        slots = (self._head + np.arange(k)) % self.window
+        self._returns[slots] = rows
+        self._head = (self._head + k) % self.window
+        self._filled = min(self.window, self._filled + k)
+        self._accumulate(rows, 1.0)
+
+        self._updates += k
+        if self._updates >= RESYNC_INTERVAL:
+            self._rebuild()
+
+    def update(self, timestamp: np.ndarray, close: np.ndarray) -> int:
+        """Apply the bars of an aligned (N, bars) close matrix that are newer than the last applied bar.
+
+        A bar that only shows up after a newer bar was applied (e.g. one symbol's
+        data lagging) is not applied; callers top every symbol up before updating.
+        Returns the number of bars applied.
+        """
+        timestamp = np.asarray(timestamp, dtype=np.int64)
+        close = np.asarray(close, dtype=np.float64)
+        columns = np.arange(len(timestamp))
+        if self.last_timestamp is not None:
+            columns = columns[timestamp > self.last_timestamp]
+        else:
+            # Starting out: only one window of returns (plus the close before it) matters
+            columns = columns[-(self.window + 1):]
+            if len(columns) == 0:
+                return 0
+            self.last_close = close[:, columns[0]].copy()
+            self.last_timestamp = int(timestamp[columns[0]])
+            columns = columns[1:]
+        if len(columns) == 0:
+            return 0
+
+        closes = close[:, columns]
+        previous = np.concatenate([self.last_close[:, None], closes[:, :-1]], axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.push_returns((closes / previous - 1).T)
+        self.last_close = closes[:, -1].copy()
+        self.last_timestamp = int(timestamp[columns[-1]])
+        return len(columns)
+
+    def _variance_terms(self) -> np.ndarray:
+        """[i, j]: sum of squared deviations of i's returns over the returns it shares with j"""
+        terms = self._sum_x * self._sum_x
+        terms /= self._count
+        np.subtract(self._sum_xx, terms, out=terms)
+        return terms
+
+    def correlation(self) -> np.ndarray:
+        """Current correlation matrix (read-only; shared until the next update)"""
+        matrix = self._read_cache.get("correlation")
+        if matrix is not None:
+            return matrix
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = self._sum_x * self._sum_x.T
+            matrix /= self._count
+            np.subtract(self._sum_xy, matrix, out=matrix)
+            # Overlaps are symmetric, so j's terms over the pair are the transpose of i's
+            var = self._variance_terms()
+            var *= var.T
+            np.sqrt(var, out=var)
+            matrix /= var
+        matrix[self._count < 1] = np.nan
+        _fix_diagonal(matrix)
+        matrix.setflags(write=False)
+        self._read_cache["correlation"] = matrix
+        return matrix
+
+    def covariance(self) -> np.ndarray:
+        """Sample covariance (ddof 1) over each pair's overlapping returns, as ``DataFrame.cov()``"""
+        matrix = self._read_cache.get("covariance")
+        if matrix is not None:
+            return matrix
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = self._sum_x * self._sum_x.T
+            matrix /= self._count
+            np.subtract(self._sum_xy, matrix, out=matrix)
+            matrix /= self._count - 1
+        matrix[self._count < 2] = np.nan
+        matrix.setflags(write=False)
+        self._read_cache["covariance"] = matrix
+        return matrix
+
+    @property
+    def bars(self) -> int:
+        return self._filled
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            "symbols": np.array(self.symbols),
+            "window": np.array(self.window),
+            "returns": self._window_rows(),
+            "last_close": self.last_close,
+            "last_timestamp": np.array(-1 if self.last_timestamp is None else self.last_timestamp),
+        }
+
+    @classmethod
+    def from_state(cls, state) -> "RollingCorrelation":
+        """Restore from ``state()``; the sums are rebuilt from the saved window in one product"""
+        rolling = cls(state["symbols"].tolist(), int(state["window"]))
+        rolling.push_returns(state["returns"])
+        rolling.last_close = np.array(state["last_close"], dtype=np.float64)
+        last_timestamp = int(state["last_timestamp"])
+        rolling.last_timestamp = None if last_timestamp < 0 else last_timestamp
+        return rolling
+
+
+class RollingCorrelationRegistry:
+    """Rolling correlation state per (universe, window), persisted under ``CORRELATION_STATE_PATH``.
+
+    Universes are kept in an LRU of ``CORRELATION_MAX_UNIVERSES``; an evicted
+    universe is written to disk first and read back on its next use.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_universes: Optional[int] = None):
+        self.path = path or os.getenv("CORRELATION_STATE_PATH", "./data/correlation")
+        self.max_universes = max_universes if max_universes is not None else int(
+            os.getenv("CORRELATION_MAX_UNIVERSES", 4))
+        self._universes: "OrderedDict[Tuple[Tuple[str, ...], int], Tuple[RollingCorrelation, threading.Lock]]" = \
+            OrderedDict()
+        self._guard = threading.Lock()
+
+    def _file(self, symbols: Tuple[str, ...], window: int) -> str:
+        digest = hashlib.blake2b("\n".join(symbols).encode(), digest_size=12).hexdigest()
+        return os.path.join(self.path, f"{digest}-w{window}.npz")
+
+    def _save(self, rolling: RollingCorrelation):
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(tuple(rolling.symbols), rolling.window)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **rolling.state())
+        os.replace(tmp_path, path)
+
+    def _restore(self, symbols: Tuple[str, ...], window: int) -> RollingCorrelation:
+        path = self._file(symbols, window)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as state:
+                    rolling = RollingCorrelation.from_state(state)
+                if tuple(rolling.symbols) == symbols and rolling.window == window:
+                    return rolling
+                logger.warning(f"Ignoring rolling correlation state {path}: universe mismatch")
+            except Exception as e:
+                logger.warning(f"Ignoring rolling correlation state {path}: {str(e)}")
+        return RollingCorrelation(symbols, window)
+
+    def get(self, symbols: Sequence[str], window: int) -> Tuple[RollingCorrelation, threading.Lock]:
+        """The universe's rolling state and the lock to hold while updating or reading it"""
+        key = (tuple(symbol.upper() for symbol in symbols), window)
+        with self._guard:
+            entry = self._universes.get(key)
+            if entry is not None:
+                self._universes.move_to_end(key)
+                return entry
+            entry = (self._restore(*key), threading.Lock())
+            self._universes[key] = entry
+            evicted = []
+            while len(self._universes) > self.max_universes:
+                evicted.append(self._universes.popitem(last=False)[1])
+        for rolling, lock in evicted:
+            with lock:
+                self._save(rolling)
+        return entry
+
+    def snapshot(self) -> int:
+        """Write every loaded universe to disk; returns the number written"""
+        with self._guard:
+            entries = list(self._universes.values())
+        for rolling, lock in entries:
+            with lock:
+                self._save(rolling)
+        return len(entries)
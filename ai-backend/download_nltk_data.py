@@ -1,55 +1,27 @@
-import nltk
 import sys
-import os
+import importlib.util
 
-def download_nltk_data():
+def build_vader_lexicon():
     """
-    Download required NLTK data packages.
-    This function downloads the necessary NLTK data packages for sentiment analysis
-    and text processing.
+    Build the precompiled VADER lexicon the sentiment endpoints load.
+    VADER is the only NLTK resource the service uses; its lexicon is compiled
+    from the copy installed with NLTK data or with vaderSentiment, so no
+    network access is needed.
     """
-    print("Starting NLTK data download...")
-    
-    # List of required NLTK data packages
-    required_packages = [
-        'vader_lexicon',  # For sentiment analysis
-        'punkt',          # For tokenization
-        'averaged_perceptron_tagger',  # For part-of-speech tagging
-        'wordnet',        # For lemmatization
-        'stopwords'       # For stop word removal
-    ]
-    
-    # Download each package
-    for package in required_packages:
-        try:
-            print(f"Downloading {package}...")
-            nltk.download(package, quiet=True)
-            print(f"Successfully downloaded {package}")
-        except Exception as e:
-            print(f"Error downloading {package}: {str(e)}")
-            sys.exit(1)
-    
-    print("\nAll NLTK data packages have been downloaded successfully!")
-    print("You can now run the main application.")
+    print("Building VADER lexicon...")
+    try:
+        from vader_lexicon import build
+        path = build()
+    except Exception as e:
+        print(f"Error building VADER lexicon: {str(e)}")
+        sys.exit(1)
+    print(f"Wrote {path}")
 
 if __name__ == "__main__":
     # Check if NLTK is installed
-    try:
-        import nltk
-    except ImportError:
+    if importlib.util.find_spec("nltk") is None:
         print("Error: NLTK is not installed. Please install it using:")
         print("pip install nltk")
         sys.exit(1)
     
-    # Create NLTK data directory if it doesn't exist
-    nltk_data_dir = os.path.join(os.path.expanduser("~"), "nltk_data")
-    if not os.path.exists(nltk_data_dir):
-        os.makedirs(nltk_data_dir)
-    
-    # Download the required data
-    download_nltk_data()
-
-    # Download additional required NLTK data
-    nltk.download('vader_lexicon')
-    nltk.download('punkt')
-    nltk.download('averaged_perceptron_tagger') 
\ No newline at end of file
+    build_vader_lexicon()
@@ -0,0 +1,216 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, Optional, Sequence
+
+from coalescing import SingleFlight, request_key
+from result_cache import ResultCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Execution modes
+INLINE = "inline"  # Run directly on the event loop (only for trivially cheap work)
+IO = "io"          # Bounded thread pool (network / disk bound work)
+CPU = "cpu"        # Process pool (pandas / numpy heavy work)
+
+# Per-endpoint routing. This is the single place that decides where each
+# endpoint's MLService call runs; it can be overridden with AI_EXECUTOR_ROUTES,
+# e.g. AI_EXECUTOR_ROUTES="anomalies=io,correlation=cpu".
+ENDPOINT_ROUTES: Dict[str, str] = {
+    "predict": IO,
+    "sentiment": IO,
+    "signal": INLINE,
+    "generate-signals": INLINE,
+    "generate-signals/watchlist": IO,
+    "correlation": CPU,
+    # Rolling correlation state lives in the main process; its matrix products release the GIL
+    "correlation/rolling": IO,
+    "correlation/neighbors": CPU,
+    "correlation/pairs": CPU,
+    "anomalies": CPU,
+    "anomalies/scan": CPU,
+    "batch/predict": IO,
+    "batch/signals": IO,
+    "batch/sentiment": CPU,
+    "batch/anomalies": CPU,
+    # Streaming state lives in the main process and each update is O(1)
+    "stream/bars": INLINE,
+    "stream/indicators": INLINE,
+}
+
+# Endpoints whose result depends on a symbol's served model rather than its bars
+MODEL_DEPENDENCIES: Dict[str, str] = {
+    "predict": "price",
+}
+
+# Service instance owned by each process pool worker
+_worker_service = None
+
+
+def _init_worker():
+    """Create a dedicated MLService inside a process pool worker"""
+    global _worker_service
+    from ml_service import MLService
+    _worker_service = MLService()
+
+
+def _call_worker_service(method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """Invoke an MLService method on the worker-local instance"""
+    return getattr(_worker_service, method)(*args, **kwargs)
+
+
+def _parse_routes(value: str) -> Dict[str, str]:
+    """Parse an "endpoint=mode,endpoint=mode" override string"""
+    routes = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, mode = item.partition("=")
+        mode = mode.strip().lower()
+        if mode not in (INLINE, IO, CPU):
+            raise ValueError(f"Unknown execution mode '{mode}' for endpoint '{endpoint.strip()}'")
+        routes[endpoint.strip()] = mode
+    return routes
+
+
+class ExecutionLayer:
+    """Routes MLService calls to the event loop, a thread pool or a process pool"""
+
+    def __init__(self, service, io_workers: Optional[int] = None, cpu_workers: Optional[int] = None,
+                 routes: Optional[Dict[str, str]] = None):
+        self.service = service
+        self.io_workers = io_workers if io_workers is not None else int(os.getenv("AI_IO_WORKERS", 8))
+        self.cpu_workers = cpu_workers if cpu_workers is not None else int(
+            os.getenv("AI_CPU_WORKERS", os.cpu_count() or 1))
+
+        self.routes = dict(ENDPOINT_ROUTES)
+        self.routes.update(_parse_routes(os.getenv("AI_EXECUTOR_ROUTES", "")))
+        if routes:
+            self.routes.update(routes)
+
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+
+        # Identical concurrent calls share one computation unless AI_SINGLE_FLIGHT=0
+        self.coalesce = os.getenv("AI_SINGLE_FLIGHT", "1").lower() not in ("0", "false", "no")
+        self.single_flight = SingleFlight()
+        # Finished results of read-only endpoints, see result_cache.ENDPOINT_TTLS
+        self.result_cache = ResultCache()
+
+    def mode_for(self, endpoint: str) -> str:
+        """Return the execution mode for an endpoint"""
+        mode = self.routes.get(endpoint, IO)
+        # Without a process pool CPU work still must not block the loop
+        if mode == CPU and self.cpu_workers <= 0:
+            return IO
+        return mode
+
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=max(1, self.io_workers),
+                                               thread_name_prefix="ml-io")
+        return self._io_pool
+
+    def _get_cpu_pool(self) -> ProcessPoolExecutor:
+        if self._cpu_pool is None:
+            # Spawn avoids forking a parent that already runs loop and pool threads
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker)
+        return self._cpu_pool
+
+    async def run(self, endpoint: str, method: str, *args, **kwargs) -> Any:
+        """Run an MLService method according to the endpoint's routing"""
+        mode = self.mode_for(endpoint)
+
+        if mode == INLINE:
+            return getattr(self.service, method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if mode == IO:
+            func = partial(getattr(self.service, method), *args, **kwargs)
+            return await loop.run_in_executor(self._get_io_pool(), func)
+
+        try:
+            return await loop.run_in_executor(self._get_cpu_pool(), _call_worker_service,
+                                              method, args, kwargs)
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole pool; start a fresh one next time
+            logger.error(f"Process pool broke while running {method} for {endpoint}, restarting it")
+            self._cpu_pool = None
+            raise
+
+    def data_versions(self, symbols: Sequence[str], endpoint: Optional[str] = None) -> list:
+        """Versions of the data a call reads, so new data never joins an old computation or cached result.
+
+        These are the symbols' bar store versions, or for endpoints in
+        ``MODEL_DEPENDENCIES`` the version of the model each symbol is served from.
+        """
+        model_type = MODEL_DEPENDENCIES.get(endpoint)
+        if model_type is not None:
+            models = getattr(self.service, "models", None)
+            if models is None:
+                return []
+            return [[symbol.strip().upper(), models.latest_version(symbol.strip(), model_type)] for symbol in symbols]
+        bar_store = getattr(self.service, "bar_store", None)
+        if bar_store is None:
+            return []
+        return [[symbol.strip().upper(), bar_store.version(symbol.strip())] for symbol in symbols]
+
+    async def run_shared(self, endpoint: str, method: str, *args, symbols: Sequence[str] = (), **kwargs) -> Any:
+        """Like ``run``, but serve repeated calls from the result cache and let
+        concurrent calls with the same arguments and data versions share one result"""
+        cached = self.result_cache.enabled(endpoint)
+        if not self.coalesce and not cached:
+            return await self.run(endpoint, method, *args, **kwargs)
+
+        # Versions are read from meta.json / latest.json on disk (other processes append bars and
+        # publish models, so they cannot be kept in memory here); read them off the event loop
+        versions = []
+        if symbols:
+            versions = await asyncio.get_running_loop().run_in_executor(
+                self._get_io_pool(), self.data_versions, symbols, endpoint)
+        key = request_key(endpoint, method, args, kwargs, versions)
+        if cached:
+            result = self.result_cache.get(key)
+            if result is not None:
+                return result
+
+        async def compute():
+            result = await self.run(endpoint, method, *args, **kwargs)
+            if cached:
+                self.result_cache.put(endpoint, key, result)
+            return result
+
+        if not self.coalesce:
+            return await compute()
+        return await self.single_flight.do(key, compute)
+
+    async def warmup(self) -> int:
+        """Start the process pool workers ahead of the first CPU-bound request.
+
+        Each worker builds its MLService and runs ``MLService.warmup``; returns
+        the number of warmup calls made (0 without a process pool).
+        """
+        if self.cpu_workers <= 0 or not any(self.mode_for(endpoint) == CPU for endpoint in self.routes):
+            return 0
+        loop = asyncio.get_running_loop()
+        pool = self._get_cpu_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, _call_worker_service, "warmup", (), {})
+                               for _ in range(self.cpu_workers)))
+        return self.cpu_workers
+
+    def shutdown(self):
+        """Shut down the worker pools"""
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False)
+            self._io_pool = None
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
@@ -0,0 +1,433 @@
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# An expression is either an input column name or a tuple (op, *args) whose
+# args may themselves be expressions. Identical sub-expressions are evaluated once.
+Expr = Union[str, Tuple[Any, ...]]
+
+# Full indicator set produced by MLService._calculate_technical_indicators
+INDICATORS: Dict[str, Expr] = {
+    "sma_20": ("mean", "close", 20),
+    "sma_50": ("mean", "close", 50),
+    "rsi": ("rsi", "close", 14),
+    "macd": ("macd", "close", 12, 26),
+    "signal": ("ewm", ("macd", "close", 12, 26), 9),
+    "bb_middle": ("mean", "close", 20),
+    "bb_std": ("std", "close", 20),
+    "bb_upper": ("band", "close", 20, 2.0),
+    "bb_lower": ("band", "close", 20, -2.0),
+    "volume_sma": ("mean", "volume", 20),
+    "volume_ratio": ("ratio", "volume", ("mean", "volume", 20)),
+    "momentum": ("pct_change", "close", 10),
+    "volatility": ("std", "close", 20),
+}
+
+# Rolling sums restart their accumulation every BLOCK_SIZE bars, relative to the
+# block's first value, so sums of squares stay small enough not to cancel
+BLOCK_SIZE = 1024
+# float32 prefix sums lose precision much sooner, so restart them more often
+FLOAT32_BLOCK_SIZE = 64
+
+# Rolling primitives; every pending one is produced by a single fused pass
+_ROLLING_OPS = ("sum", "m2")
+
+# Sub-expressions each operator depends on (besides plain parameters)
+_DEPENDENCIES = {
+    "sum": lambda src, w: [src],
+    "m2": lambda src, w: [src],
+    "mean": lambda src, w: [("sum", src, w)],
+    "std": lambda src, w: [("m2", src, w)],
+    "band": lambda src, w, k: [("mean", src, w), ("std", src, w)],
+    "diff": lambda src: [src],
+    "gain": lambda src: [("diff", src)],
+    "loss": lambda src: [("diff", src)],
+    "rsi": lambda src, n: [("mean", ("gain", src), n), ("mean", ("loss", src), n)],
+    "wilder_rsi": lambda src, n: [("diff", src)],
+    "ewm": lambda src, span: [src],
+    "macd": lambda src, fast, slow: [("ewm", src, fast), ("ewm", src, slow)],
+    "ratio": lambda num, den: [num, den],
+    "pct_change": lambda src, periods: [src],
+}
+
+
+def _fused_rolling(sources: Dict[Expr, np.ndarray], nodes: List[Expr],
+                   block: int = BLOCK_SIZE) -> Dict[Expr, np.ndarray]:
+    """Compute rolling ("sum" | "m2", src, window) nodes for several sources with one cumulative sum.
+
+    ``sum`` is the trailing window sum and ``m2`` the window's sum of squared
+    deviations from its mean. Sources are 1D series or (symbols, bars) matrices;
+    every series becomes a row, cut into overlapping segments of
+    ``block + max_window - 1`` bars, one per output block and (where needed)
+    centered on the block's first value; value and squared rows of every source
+    are then accumulated together. Windows containing NaN, and the leading windows shorter
+    than ``window``, yield NaN.
+    """
+    names = list(dict.fromkeys(node[1] for node in nodes))
+    first = sources[names[0]]
+    dtype = first.dtype
+    n = first.shape[-1]
+    n_series = 1 if first.ndim == 1 else first.shape[0]
+    pad = max(node[2] for node in nodes) - 1
+    block = max(1, min(block, n))
+    n_blocks = max(1, -(-n // block))
+    width = block + pad
+
+    squared = [name for name in names if ("m2", name) in {(node[0], node[1]) for node in nodes}]
+    value_rows = {name: slice(i * n_series, (i + 1) * n_series) for i, name in enumerate(names)}
+    square_rows = {name: slice((len(names) + i) * n_series, (len(names) + i + 1) * n_series)
+                   for i, name in enumerate(squared)}
+    n_rows = len(names) * n_series
+
+    raw = np.zeros((n_rows, n_blocks * block + pad), dtype=dtype)
+    for name in names:
+        raw[value_rows[name], pad:pad + n] = sources[name].reshape(n_series, n)
+    # (row, block, width) view: segment b holds every bar the windows ending in block b need
+    windows = as_strided(raw, shape=(n_rows, n_blocks, width),
+                         strides=(raw.strides[0], block * raw.strides[1], raw.strides[1]), writeable=False)
+
+    # Only centre where it matters: for sums of squares, or series that can go negative.
+    # Non-negative series keep a zero reference so all-zero windows sum to exactly 0,
+    # which keeps pandas' 0/0 -> NaN behaviour for e.g. RSI on flat prices.
+    refs = windows[:, :, pad].copy()
+    for name in names:
+        if name not in squared:
+            rows = refs[value_rows[name]]
+            rows[~(sources[name].reshape(n_series, n) < 0).any(axis=1)] = 0.0
+    missing = ~np.isfinite(refs)
+    if missing.any():
+        # Segment starts on a gap: fall back to its first finite value
+        segments = windows[missing]
+        finite = np.isfinite(segments)
+        refs[missing] = np.where(finite.any(axis=1), segments[np.arange(len(segments)), finite.argmax(axis=1)], 0.0)
+
+    # Column 0 stays zero so every window sum is a difference of two prefix sums
+    stack = np.empty((n_rows + len(squared) * n_series, n_blocks, width + 1), dtype=dtype)
+    stack[:, :, 0] = 0.0
+    np.subtract(windows, refs[:, :, None], out=stack[:n_rows, :, 1:])
+    stack[:n_rows, 0, 1:pad + 1] = 0.0
+    for name in squared:
+        np.square(stack[value_rows[name]], out=stack[square_rows[name]])
+
+    # A single reduction is much cheaper than materializing the NaN mask up front
+    has_nan = bool(np.isnan(stack.sum()))
+    if has_nan:
+        nan_count = np.cumsum(np.isnan(stack), axis=2)
+        stack[np.isnan(stack)] = 0.0
+    np.cumsum(stack, axis=2, out=stack)
+
+    end = slice(pad + 1, pad + 1 + block)
+    results = {}
+    for node in nodes:
+        op, name, window = node
+        rows = value_rows[name]
+        start = slice(pad + 1 - window, pad + 1 - window + block)
+        centered = stack[rows, :, end] - stack[rows, :, start]
+        if op == "sum":
+            out = centered + window * refs[rows][:, :, None]
+        else:
+            squares = square_rows[name]
+            out = stack[squares, :, end] - stack[squares, :, start] - centered * centered / window
+        if has_nan:
+            out[(nan_count[rows, :, end] - nan_count[rows, :, start]) > 0] = np.nan
+        out = out.reshape(n_series, -1)[:, :n]
+        out[:, :window - 1] = np.nan
+        results[node] = out.reshape(first.shape)
+    return results
+
+
+def indicator_exprs(names: Iterable[str], rsi_method: str = "sma") -> Dict[str, Expr]:
+    """Expressions for named indicators; ``rsi_method="wilder"`` swaps in Wilder-smoothed RSI"""
+    if rsi_method not in ("sma", "wilder"):
+        raise ValueError(f"Unknown RSI method: {rsi_method}")
+    names = list(names)
+    unknown = [name for name in names if name not in INDICATORS]
+    if unknown:
+        raise ValueError(f"Unknown indicators: {unknown}")
+
+    exprs = {}
+    for name in names:
+        expr = INDICATORS[name]
+        if rsi_method == "wilder" and expr[0] == "rsi":
+            expr = ("wilder_rsi",) + expr[1:]
+        exprs[name] = expr
+    return exprs
+
+
+def _wilder_rsi(deltas: np.ndarray, periods: int) -> np.ndarray:
+    """RSI with Wilder's smoothing, seeded by the simple average of the first ``periods`` deltas.
+
+    ``deltas[0]`` is the undefined first difference; later NaN deltas are skipped.
+    """
+    if deltas.ndim == 2:
+        return np.stack([_wilder_rsi(row, periods) for row in deltas]).reshape(deltas.shape)
+
+    out = np.full(len(deltas), np.nan, dtype=deltas.dtype)
+    observed = np.flatnonzero(~np.isnan(deltas))
+    if len(observed) < periods:
+        return out
+
+    gains = np.maximum(deltas[observed], 0.0)
+    losses = np.maximum(-deltas[observed], 0.0)
+    decay = 1.0 - 1.0 / periods
+    avg_gain = np.empty(len(observed) - periods + 1, dtype=deltas.dtype)
+    avg_loss = np.empty_like(avg_gain)
+    avg_gain[0] = gains[:periods].mean()
+    avg_loss[0] = losses[:periods].mean()
+    if len(avg_gain) > 1:
+        from scipy.signal import lfilter
+        avg_gain[1:], _ = lfilter([1.0 / periods], [1.0, -decay], gains[periods:], zi=[decay * avg_gain[0]])
+        avg_loss[1:], _ = lfilter([1.0 / periods], [1.0, -decay], losses[periods:], zi=[decay * avg_loss[0]])
+
+    out[observed[periods - 1:]] = 100 - (100 / (1 + avg_gain / avg_loss))
+    if len(observed) < len(deltas):
+        # Skipped bars carry the last value forward
+        out = _forward_fill(out, start=observed[periods - 1])
+    return out
+
+
+def _forward_fill(values: np.ndarray, start: int = 0) -> np.ndarray:
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    filled[:start] = np.nan
+    return filled
+
+
+def _ewm_matrix(values: np.ndarray, span: int) -> np.ndarray:
+    """Row-wise ``_ewm`` of a (symbols, bars) matrix with one filter call for gap-free rows"""
+    from scipy.signal import lfilter
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    missing = np.isnan(values)
+    observed = ~missing
+    first = observed.argmax(axis=1)
+    # Rows whose only gap is a leading run (shorter histories) behave like the trimmed series
+    simple = observed.any(axis=1) & (missing.sum(axis=1) == first)
+
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    if simple.any():
+        rows = values[simple]
+        seeds = rows[np.arange(len(rows)), first[simple]]
+        # Back-fill the leading gap with the first observation so the filter starts there
+        rows = np.where(np.isnan(rows), seeds[:, None], rows)
+        filtered, _ = lfilter([alpha], [1.0, -decay], rows, axis=1, zi=(decay * seeds)[:, None])
+        filtered[np.isnan(values[simple])] = np.nan
+        filtered[np.arange(len(rows)), first[simple]] = seeds
+        out[simple] = filtered
+    for row in np.flatnonzero(~simple):
+        out[row] = _ewm(values[row], span)
+    return out
+
+
+def _ewm(values: np.ndarray, span: int) -> np.ndarray:
+    """Equivalent of ``Series.ewm(span=span, adjust=False).mean()``, row-wise for matrices"""
+    # scipy.signal takes most of a second to import, so only load it once a filter runs
+    from scipy.signal import lfilter
+    if values.ndim == 2:
+        return _ewm_matrix(values, span)
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    if len(values) > 1 and not np.isnan(values.sum()):
+        # y[t] = (1 - alpha) * y[t-1] + alpha * x[t], seeded with the first observation
+        out, _ = lfilter([alpha], [1.0, -decay], values, zi=[decay * values[0]])
+        out[0] = values[0]
+        return out
+
+    out = np.full(len(values), np.nan, dtype=values.dtype)
+    observed = np.flatnonzero(~np.isnan(values))
+    if len(observed) == 0:
+        return out
+
+    # Runs of consecutive observations; NaN gaps carry the last average forward
+    breaks = np.flatnonzero(np.diff(observed) > 1) + 1
+    weighted = None
+    previous_end = observed[0]
+    for run in np.split(observed, breaks):
+        start, end = run[0], run[-1] + 1
+        if weighted is None:
+            seed = values[start]
+        else:
+            out[previous_end:start] = weighted
+            # pandas decays the old weight once per skipped bar before mixing in the observation
+            old_wt = decay ** (start - previous_end + 1)
+            x = values[start]
+            seed = x if weighted == x else (old_wt * weighted + alpha * x) / (old_wt + alpha)
+
+        out[start] = seed
+        if end - start > 1:
+            out[start + 1:end], _ = lfilter([alpha], [1.0, -decay], values[start + 1:end], zi=[decay * seed])
+        weighted = out[end - 1]
+        previous_end = end
+    return out
+
+
+@lru_cache(maxsize=256)
+def _plan(exprs: Tuple[Expr, ...]) -> Tuple[Expr, ...]:
+    """Topologically ordered unique nodes of the dependency graph of ``exprs``"""
+    order: List[Expr] = []
+    seen = set()
+
+    def visit(expr: Expr):
+        if expr in seen:
+            return
+        seen.add(expr)
+        if isinstance(expr, tuple):
+            for dependency in _DEPENDENCIES[expr[0]](*expr[1:]):
+                visit(dependency)
+        order.append(expr)
+
+    for expr in exprs:
+        visit(expr)
+    return tuple(order)
+
+
+class IndicatorEngine:
+    """Computes technical indicators over NumPy columns with shared sub-expressions.
+
+    Requested indicators are resolved into a dependency graph of primitives
+    (rolling sums, rolling sums of squares, EWMs, ...) so that e.g. ``sma_20`` and
+    ``bb_middle`` share one rolling sum, and ``bb_std`` and ``volatility`` share one
+    rolling sum of squares; all rolling sums are then produced by one fused
+    cumulative-sum pass over every source. Results match pandas' rolling/ewm
+    output to floating point rounding.
+
+    Columns may also be (symbols, bars) matrices aligned on a common bar index,
+    with NaN for bars a symbol is missing; every indicator is then computed for
+    all symbols at once along axis 1. A leading NaN run gives the same values
+    as computing on the symbol's shorter history.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], dtype: Optional[Any] = None):
+        if dtype is not None:
+            # An explicit float32 computes in float32 end to end, halving memory traffic
+            self.dtype = np.dtype(dtype)
+            work_dtype = self.dtype
+        else:
+            # Otherwise accumulate in float64 and hand back the input dtype
+            self.dtype = np.result_type(*[np.asarray(c).dtype for c in columns.values()], np.float32)
+            work_dtype = np.float64
+        if work_dtype not in (np.float32, np.float64):
+            raise ValueError(f"Unsupported indicator dtype: {work_dtype}")
+
+        self.columns = {name: np.ascontiguousarray(values, dtype=work_dtype) for name, values in columns.items()}
+        shapes = {values.shape for values in self.columns.values()}
+        if len(shapes) > 1 or any(len(shape) not in (1, 2) for shape in shapes):
+            raise ValueError(f"Columns must share one (bars,) or (symbols, bars) shape, got {sorted(shapes)}")
+        self.block = FLOAT32_BLOCK_SIZE if work_dtype == np.float32 else BLOCK_SIZE
+        self._cache: Dict[Expr, np.ndarray] = {}
+
+    def plan(self, exprs: Iterable[Expr]) -> List[Expr]:
+        """Return the unique nodes needed for the given expressions in dependency order"""
+        return list(_plan(tuple(exprs)))
+
+    def _run(self, plan: List[Expr]):
+        pending = [node for node in plan
+                   if isinstance(node, tuple) and node[0] in _ROLLING_OPS and node not in self._cache]
+        if pending:
+            sources = list(dict.fromkeys(node[1] for node in pending))
+            self._run(self.plan(sources))
+            self._cache.update(_fused_rolling({src: self._cache[src] for src in sources}, pending, self.block))
+
+        for node in plan:
+            if node not in self._cache:
+                self._cache[node] = self._compute(node)
+
+    def evaluate(self, expr: Expr) -> np.ndarray:
+        """Evaluate a single expression, reusing any node computed before"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._run(self.plan([expr]))
+        return self._cache[expr]
+
+    def compute(self, indicators: Optional[Iterable[str]] = None, rsi_method: str = "sma"
+                ) -> Dict[str, np.ndarray]:
+        """Compute named indicators (default: the full set) in the input dtype"""
+        exprs = indicator_exprs(indicators if indicators is not None else INDICATORS, rsi_method)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._run(self.plan(exprs.values()))
+        return {name: self._cache[expr].astype(self.dtype, copy=False) for name, expr in exprs.items()}
+
+    def _compute(self, expr: Expr) -> np.ndarray:
+        if isinstance(expr, str):
+            if expr not in self.columns:
+                raise ValueError(f"Missing input column '{expr}'")
+            return self.columns[expr]
+
+        op, args = expr[0], expr[1:]
+        get = self._cache.__getitem__
+
+        if op in _ROLLING_OPS:
+            return _fused_rolling({args[0]: get(args[0])}, [expr], self.block)[expr]
+
+        if op == "mean":
+            src, window = args
+            return get(("sum", src, window)) / window
+
+        if op == "std":
+            src, window = args
+            if window < 2:
+                return np.full_like(get(("m2", src, window)), np.nan)
+            return np.sqrt(np.maximum(get(("m2", src, window)), 0.0) / (window - 1))
+
+        if op == "band":
+            src, window, k = args
+            return get(("mean", src, window)) + get(("std", src, window)) * k
+
+        if op == "diff":
+            values = get(args[0])
+            out = np.empty_like(values)
+            out[..., :1] = np.nan
+            out[..., 1:] = values[..., 1:] - values[..., :-1]
+            return out
+
+        if op in ("gain", "loss"):
+            delta = get(("diff", args[0]))
+            # fmax maps NaN deltas to 0 like pandas' ``delta.where(delta > 0, 0)``
+            out = np.fmax(delta if op == "gain" else -delta, 0.0)
+            values = get(args[0])
+            if np.isnan(values[..., 0]).any():
+                # ...except before a series' first bar, so padded rows match their own history
+                out[~np.logical_or.accumulate(~np.isnan(values), axis=-1)] = np.nan
+            return out
+
+        if op == "rsi":
+            src, periods = args
+            rs = get(("mean", ("gain", src), periods)) / get(("mean", ("loss", src), periods))
+            return 100 - (100 / (1 + rs))
+
+        if op == "wilder_rsi":
+            return _wilder_rsi(get(("diff", args[0])), args[1])
+
+        if op == "ewm":
+            return _ewm(get(args[0]), args[1])
+
+        if op == "macd":
+            src, fast, slow = args
+            return get(("ewm", src, fast)) - get(("ewm", src, slow))
+
+        if op == "ratio":
+            return get(args[0]) / get(args[1])
+
+        if op == "pct_change":
+            values = get(args[0])
+            periods = args[1]
+            out = np.full_like(values, np.nan)
+            if periods < values.shape[-1]:
+                out[..., periods:] = values[..., periods:] / values[..., :-periods] - 1
+            return out
+
+        raise ValueError(f"Unknown indicator operator: {op}")
+
+
+def compute_indicators(columns: Dict[str, np.ndarray], indicators: Optional[Iterable[str]] = None,
+                       rsi_method: str = "sma", dtype: Optional[Any] = None) -> Dict[str, np.ndarray]:
+    """Compute indicators for ``close``/``volume`` series or (symbols, bars) matrices in one pass"""
+    return IndicatorEngine(columns, dtype).compute(indicators, rsi_method)
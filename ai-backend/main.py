@@ -1,9 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Dict, Any, Optional
+import heapq
+import asyncio
 import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
 from ml_service import MLService
+from executor import ExecutionLayer
+from training import TrainingJobQueue
+from anomalies import GLOBAL, METHODS, severity_key
+from correlation import DICT, OUTPUTS as CORRELATION_OUTPUTS
+from responses import FastJSONResponse, dumps
+from columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, ColumnarFormatError, decode_columns, stack_columns
+from sequences import OHLCV_FIELDS
 import uvicorn
 import os
 
@@ -11,10 +24,81 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Initialize ML service and the execution layer that keeps it off the event loop
+ml_service = MLService()
+executor = ExecutionLayer(ml_service)
+# Model training runs in its own process pool, off the serving path
+training_queue = TrainingJobQueue()
+
+# Symbols per process pool task of an anomaly scan
+ANOMALY_SCAN_SHARD_SIZE = int(os.getenv("ANOMALY_SCAN_SHARD_SIZE", 256))
+
+# Seconds between snapshots of the streaming indicator and rolling correlation state
+# (0 disables periodic snapshots)
+STREAM_SNAPSHOT_INTERVAL = float(os.getenv("STREAM_SNAPSHOT_INTERVAL", 300))
+
+async def snapshot_streams_periodically():
+    while True:
+        await asyncio.sleep(STREAM_SNAPSHOT_INTERVAL)
+        try:
+            await asyncio.to_thread(ml_service.snapshot_indicators)
+        except Exception as e:
+            logger.error(f"Error snapshotting streaming indicators: {str(e)}")
+        try:
+            await asyncio.to_thread(ml_service.correlations.snapshot)
+        except Exception as e:
+            logger.error(f"Error snapshotting rolling correlations: {str(e)}")
+
+# Warm up lazily loaded dependencies and the process pool in the background after startup
+AI_WARMUP = os.getenv("AI_WARMUP", "1").lower() not in ("0", "false", "no")
+# Whether /ready waits for that warmup to finish (it never waits for a failed warmup)
+READY_AFTER_WARMUP = os.getenv("READY_AFTER_WARMUP", "0").lower() in ("1", "true", "yes")
+
+# Readiness as reported by /ready; warmup is off, running, done or failed
+startup_state: Dict[str, Any] = {"started": False, "warmup": "off"}
+
+async def warm_up():
+    startup_state["warmup"] = "running"
+    try:
+        timings = await asyncio.to_thread(ml_service.warmup)
+        workers = await executor.warmup()
+        startup_state["warmup"] = "done"
+        logger.info(f"Warmup finished: {', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items())}, "
+                    f"{workers} process pool workers started")
+    except Exception as e:
+        startup_state["warmup"] = "failed"
+        logger.error(f"Error during warmup: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshot_task = None
+    if STREAM_SNAPSHOT_INTERVAL > 0:
+        snapshot_task = asyncio.create_task(snapshot_streams_periodically())
+    warmup_task = asyncio.create_task(warm_up()) if AI_WARMUP else None
+    startup_state["started"] = True
+    yield
+    startup_state["started"] = False
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    try:
+        ml_service.snapshot_indicators()
+    except Exception as e:
+        logger.error(f"Error snapshotting streaming indicators: {str(e)}")
+    try:
+        ml_service.correlations.snapshot()
+    except Exception as e:
+        logger.error(f"Error snapshotting rolling correlations: {str(e)}")
+    training_queue.shutdown()
+    executor.shutdown()
+
 app = FastAPI(
     title="RenX AI Backend",
     description="AI-powered trading signals and market analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -26,9 +110,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ML service
-ml_service = MLService()
-
 # Pydantic models
 class PredictionRequest(BaseModel):
     symbol: str
@@ -43,19 +124,87 @@ class SignalRequest(BaseModel):
 
 class TrainingRequest(BaseModel):
     symbol: str
+    epochs: Optional[int] = None
+    lookback_days: Optional[int] = None
+
+class BatchPredictionRequest(BaseModel):
+    items: List[PredictionRequest]
+
+class BatchSignalRequest(BaseModel):
+    items: List[SignalRequest]
+
+class BatchSentimentRequest(BaseModel):
+    texts: List[str]
+    # MinHash similarity at which rewritten headlines share one score (0 disables)
+    dedupe_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+class BatchAnomalyRequest(BaseModel):
+    symbols: List[str]
+    method: str = GLOBAL
+    window: Optional[int] = None
+
+class WatchlistSignalRequest(BaseModel):
+    symbols: List[str]
+    lookback_days: int = 180
+    float32: bool = False
+
+class BarUpdate(BaseModel):
+    symbol: str
+    close: float
+    volume: float = 0.0
+    timestamp: Optional[datetime] = None
+
+class StreamUpdateRequest(BaseModel):
+    bars: List[BarUpdate]
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "AI Backend"}
 
-# Price prediction endpoint
-@app.post("/predict")
-async def predict_price(request: PredictionRequest):
+# Readiness probe: separate from liveness, so traffic is only routed to a started worker
+@app.get("/ready")
+async def readiness_check():
+    ready = startup_state["started"] and not (READY_AFTER_WARMUP and startup_state["warmup"] == "running")
+    return FastJSONResponse({"status": "ready" if ready else "starting", "warmup": startup_state["warmup"]},
+                            status_code=200 if ready else 503)
+
+# Result cache and request coalescing counters
+@app.get("/cache/stats")
+async def cache_stats():
+    # sentiment_cache covers /sentiment; /batch/sentiment runs in the pool workers, each with its own cache
+    return {"result_cache": executor.result_cache.stats(), "single_flight": executor.single_flight.stats(),
+            "sentiment_cache": ml_service.sentiment_cache.stats()}
+
+# Price prediction endpoint. Besides JSON, accepts a columnar body (columnar.MEDIA_TYPE)
+# with open/high/low/close/volume columns and the symbol in its header.
+@app.post("/predict", openapi_extra={"requestBody": {"content": {
+    "application/json": {"schema": PredictionRequest.model_json_schema()},
+    COLUMNAR_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+}, "required": True}})
+async def predict_price(http_request: Request):
+    body = await http_request.body()
+    if http_request.headers.get("content-type", "").split(";")[0].strip() == COLUMNAR_MEDIA_TYPE:
+        try:
+            header, columns = decode_columns(body)
+            symbol = header.get("symbol")
+            if not isinstance(symbol, str):
+                raise ColumnarFormatError("header needs a string 'symbol'")
+            historical_data = stack_columns(columns, OHLCV_FIELDS)
+        except ColumnarFormatError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid columnar body: {str(e)}")
+    else:
+        try:
+            request = PredictionRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body",) + tuple(error["loc"])}
+                                          for error in e.errors(include_url=False)])
+        symbol, historical_data = request.symbol, request.historical_data
     try:
-        logger.info(f"Received prediction request for {request.symbol}")
-        result = ml_service.predict_price(request.symbol, request.historical_data)
-        return result
+        logger.info(f"Received prediction request for {symbol}")
+        result = await executor.run_shared("predict", "predict_price", symbol, historical_data,
+                                           symbols=[symbol])
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -64,8 +213,8 @@ async def predict_price(request: PredictionRequest):
 @app.post("/sentiment")
 async def analyze_sentiment(request: SentimentRequest):
     try:
-        result = ml_service.analyze_sentiment(request.text)
-        return result
+        result = await executor.run_shared("sentiment", "analyze_sentiment", request.text)
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in sentiment analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -74,8 +223,8 @@ async def analyze_sentiment(request: SentimentRequest):
 @app.post("/signal")
 async def get_trading_signal(request: SignalRequest):
     try:
-        result = ml_service.get_trading_signal(request.symbol, request.features)
-        return result
+        result = await executor.run_shared("signal", "get_trading_signal", request.symbol, request.features)
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in signal generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -84,42 +233,237 @@ async def get_trading_signal(request: SignalRequest):
 @app.post("/train")
 async def train_models(request: TrainingRequest):
     try:
-        result = ml_service.train_models(request.symbol)
-        return result
+        options = {k: v for k, v in (("epochs", request.epochs), ("lookback_days", request.lookback_days))
+                   if v is not None}
+        job = await asyncio.to_thread(training_queue.submit, request.symbol, **options)
+        return job.to_dict()
     except Exception as e:
         logger.error(f"Error in model training: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Training job status and cancellation
+@app.get("/train/{job_id}")
+async def get_training_job(job_id: str):
+    job = await asyncio.to_thread(training_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown training job {job_id}")
+    return job.to_dict()
+
+@app.delete("/train/{job_id}")
+async def cancel_training_job(job_id: str):
+    job = await asyncio.to_thread(training_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown training job {job_id}")
+    return job.to_dict()
+
 # Generate signals endpoint
 @app.post("/generate-signals")
 async def generate_signals(request: SignalRequest):
     try:
-        result = ml_service.generate_signals(request.symbol, request.features)
-        return result
+        result = await executor.run_shared("generate-signals", "generate_signals", request.symbol, request.features)
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in signal generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Indicator signals for a whole watchlist, computed over one aligned price matrix
+@app.post("/generate-signals/watchlist")
+async def generate_watchlist_signals(request: WatchlistSignalRequest):
+    try:
+        results = await executor.run_shared("generate-signals/watchlist", "generate_signals_watchlist",
+                                            request.symbols, request.lookback_days, request.float32,
+                                            symbols=request.symbols)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error in watchlist signal generation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Correlation analysis endpoint
 @app.post("/correlation")
-async def analyze_correlation(symbols: List[str]):
+async def analyze_correlation(symbols: List[str], float32: bool = False, output: str = DICT,
+                              window: Optional[int] = None, statistic: str = "correlation"):
+    if output not in CORRELATION_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown correlation output '{output}'")
+    if statistic not in ("correlation", "covariance"):
+        raise HTTPException(status_code=400, detail=f"Unknown statistic '{statistic}'")
+    if window is not None and window < 2:
+        raise HTTPException(status_code=400, detail="window must be at least 2 bars")
+    if statistic == "covariance" and window is None:
+        raise HTTPException(status_code=400, detail="covariance requires a window")
     try:
-        result = ml_service.analyze_correlation(symbols)
-        return result
+        if window is not None:
+            # Rolling state lives in this process, so the call cannot go to the process pool
+            result = await executor.run_shared("correlation/rolling", "analyze_correlation", symbols, float32,
+                                               output, window=window, covariance=statistic == "covariance",
+                                               symbols=symbols)
+        else:
+            result = await executor.run_shared("correlation", "analyze_correlation", symbols, float32, output,
+                                               symbols=symbols)
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in correlation analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Most-correlated symbols / pairs of a universe, without the full matrix
+@app.post("/correlation/neighbors")
+async def correlation_neighbors(symbols: List[str], symbol: str, k: int = 10, min_periods: int = 20,
+                                absolute: bool = False, float32: bool = False):
+    if k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+    try:
+        result = await executor.run_shared("correlation/neighbors", "correlation_neighbors", symbols, symbol,
+                                           k, min_periods, absolute, float32, symbols=[symbol] + symbols)
+        return FastJSONResponse(result)
+    except Exception as e:
+        logger.error(f"Error finding correlated symbols: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/correlation/pairs")
+async def correlated_pairs(symbols: List[str], threshold: float = 0.8, limit: Optional[int] = None,
+                           min_periods: int = 20, absolute: bool = False, float32: bool = False):
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    try:
+        result = await executor.run_shared("correlation/pairs", "correlated_pairs", symbols, threshold, limit,
+                                           min_periods, absolute, float32, symbols=symbols)
+        return FastJSONResponse(result)
+    except Exception as e:
+        logger.error(f"Error finding correlated pairs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Universe-wide anomaly scan; declared before /anomalies/{symbol} so "scan" is not taken for a symbol
+@app.get("/anomalies/scan")
+async def scan_anomalies(method: str = GLOBAL, window: Optional[int] = None, top_k: int = 50,
+                         recent_bars: int = 1, lookback_days: int = 365, symbols: Optional[str] = None):
+    """Stream the top-K most severe recent anomalies across the bar store as NDJSON.
+
+    Shards run in parallel on the process pool. Whenever a shard finishes, each of
+    its results that enters the running top-K is sent as an ``anomaly`` line; a
+    final ``summary`` line carries the definitive ranking.
+    """
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown anomaly method '{method}'")
+    if top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be positive")
+    if symbols:
+        universe = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    else:
+        universe = await asyncio.to_thread(ml_service.bar_store.symbols)
+    shards = [universe[i:i + ANOMALY_SCAN_SHARD_SIZE] for i in range(0, len(universe), ANOMALY_SCAN_SHARD_SIZE)]
+
+    async def lines():
+        tasks = [asyncio.ensure_future(executor.run("anomalies/scan", "scan_anomalies", shard, method, window,
+                                                    recent_bars, top_k, lookback_days)) for shard in shards]
+        top: list = []  # min-heap of (severity, sequence, result)
+        sequence = 0
+        scanned = 0
+        errors: Dict[str, str] = {}
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    found = await task
+                except Exception as e:
+                    logger.error(f"Error in anomaly scan shard: {str(e)}")
+                    yield dumps({"type": "error", "error": str(e)}) + b"\n"
+                    continue
+                scanned += found["scanned"]
+                errors.update(found["errors"])
+                for result in found["results"]:
+                    entry = (severity_key(result), sequence, result)
+                    sequence += 1
+                    if len(top) < top_k:
+                        heapq.heappush(top, entry)
+                    elif entry[0] > top[0][0]:
+                        heapq.heapreplace(top, entry)
+                    else:
+                        continue
+                    yield dumps({"type": "anomaly", **result}) + b"\n"
+            ranked = [result for _, _, result in sorted(top, key=lambda entry: (-entry[0], entry[1]))]
+            yield dumps({"type": "summary", "symbols": len(universe), "scanned": scanned,
+                         "errors": errors, "results": ranked}) + b"\n"
+        finally:
+            # The client may disconnect mid-scan; drop shards that have not started
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # Anomaly detection endpoint
 @app.get("/anomalies/{symbol}")
-async def detect_anomalies(symbol: str):
+async def detect_anomalies(symbol: str, method: str = GLOBAL, window: Optional[int] = None):
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown anomaly method '{method}'")
     try:
-        result = ml_service.detect_anomalies(symbol)
-        return result
+        result = await executor.run_shared("anomalies", "detect_anomalies", symbol, method, window,
+                                           symbols=[symbol])
+        return FastJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in anomaly detection: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch endpoints: one call for many symbols / texts, with per-item results and errors
+@app.post("/batch/predict")
+async def batch_predict(request: BatchPredictionRequest):
+    try:
+        items = [item.model_dump() for item in request.items]
+        results = await executor.run("batch/predict", "predict_price_batch", items)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error in batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/batch/signals")
+async def batch_signals(request: BatchSignalRequest):
+    try:
+        items = [item.model_dump() for item in request.items]
+        results = await executor.run("batch/signals", "get_trading_signal_batch", items)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error in batch signal generation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/batch/sentiment")
+async def batch_sentiment(request: BatchSentimentRequest):
+    try:
+        results = await executor.run("batch/sentiment", "analyze_sentiment_batch", request.texts,
+                                      request.dedupe_threshold)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error in batch sentiment analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/batch/anomalies")
+async def batch_anomalies(request: BatchAnomalyRequest):
+    if request.method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown anomaly method '{request.method}'")
+    try:
+        results = await executor.run("batch/anomalies", "detect_anomalies_batch", request.symbols,
+                                     request.method, request.window)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error in batch anomaly detection: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Streaming indicator endpoints: O(1) updates per bar from a live feed
+@app.post("/stream/bars")
+async def stream_bars(request: StreamUpdateRequest):
+    try:
+        bars = [bar.model_dump() for bar in request.bars]
+        results = await executor.run("stream/bars", "update_streaming_indicators", bars)
+        return FastJSONResponse({"results": results})
+    except Exception as e:
+        logger.error(f"Error updating streaming indicators: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stream/indicators/{symbol}")
+async def stream_indicators(symbol: str):
+    try:
+        result = await executor.run("stream/indicators", "get_streaming_indicators", symbol)
+        return FastJSONResponse(result)
+    except Exception as e:
+        logger.error(f"Error reading streaming indicators: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     port = int(os.getenv("AI_BACKEND_PORT", 8181))
     host = os.getenv("AI_BACKEND_HOST", "0.0.0.0")
@@ -3,17 +3,27 @@ import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
+from datetime import datetime
+import time
 import logging
 import warnings
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
-import requests
-from typing import List, Dict, Any, Optional
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from bar_store import BarStore, NS_PER_DAY
+from indicators import compute_indicators
+from correlation import (DICT, CorrelationIndex, RollingCorrelationRegistry, correlation_matrix,
+                         format_correlation, returns_from_prices)
+from anomalies import (GLOBAL, StreamingAnomalyRegistry, detect_rolling, find_anomalies, rolling_zscore,
+                       top_anomalies, zscore)
+from streaming import StreamingIndicatorRegistry
+from sequences import DEFAULT_WINDOW, build_sequences, last_close, parse_ohlcv, sliding_windows
+from scalers import ScalerParams, ScalerRegistry
+from model_registry import ModelRegistry
+from sentiment_cache import (SENTIMENT_DEDUPE_THRESHOLD, SentimentCache, minhash_signatures,
+                             near_duplicate_groups)
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Suppress warnings
 warnings.filterwarnings('ignore', category=DeprecationWarning)
@@ -23,56 +33,115 @@ warnings.filterwarnings('ignore', category=UserWarning)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _load_sentiment_analyzer():
+    """VADER analyzer from the prebuilt lexicon (see vader_lexicon.py); never downloads"""
+    from vader_lexicon import load_analyzer
+    return load_analyzer()
+
+
 class MLService:
     def __init__(self):
-        # Initialize sentiment analyzer
-        self.sia = SentimentIntensityAnalyzer()
+        # Sentiment analyzer; NLTK is imported on first use, VADER also by warmup()
+        self._sia = None
+        self._lazy_lock = threading.Lock()
+        # Compound scores per normalized text, shared by /sentiment and /batch/sentiment
+        self.sentiment_cache = SentimentCache()
         
-        # Initialize scalers
-        self.price_scaler = MinMaxScaler()
-        self.signal_scaler = MinMaxScaler()
+        # Local OHLCV store shared by every historical-data consumer
+        self.bar_store = BarStore()
         
-        # Download required NLTK data
-        try:
-            nltk.data.find('vader_lexicon')
-        except LookupError:
-            nltk.download('vader_lexicon')
-
-    def analyze_sentiment(self, text: str) -> Dict[str, float]:
-        # Get sentiment scores using VADER
-        sentiment_scores = self.sia.polarity_scores(text)
+        # Incremental per-symbol indicators, restored from the last snapshot. Live bars pushed to
+        # /stream/bars and the stored daily bars behind the signal helpers keep separate state,
+        # so ticks never advance the daily indicators and a daily sync never resets the live ones
+        self.indicator_streams = StreamingIndicatorRegistry()
+        self.daily_indicators = StreamingIndicatorRegistry(
+            path=os.getenv("STREAM_DAILY_SNAPSHOT_PATH", "./data/streaming/daily_indicators.json"))
+        for name, registry in (("streaming", self.indicator_streams), ("daily", self.daily_indicators)):
+            try:
+                restored = registry.load()
+                if restored:
+                    logger.info(f"Restored {name} indicators for {restored} symbols")
+            except Exception as e:
+                logger.warning(f"Could not restore {name} indicators: {str(e)}")
+        
+        # Per-symbol rolling anomaly statistics scored on every live bar
+        self.anomaly_streams = StreamingAnomalyRegistry()
+        # Rolling correlation / covariance windows, updated as bars arrive
+        self.correlations = RollingCorrelationRegistry()
         
-        # Get sentiment using TextBlob as a second opinion
-        blob = TextBlob(text)
-        textblob_sentiment = blob.sentiment.polarity
+        # Fitted min/max per (symbol, feature set); scaling itself holds no shared state
+        self.scalers = ScalerRegistry()
         
-        # Combine both scores
-        sentiment_scores['textblob_score'] = textblob_sentiment
-        return sentiment_scores
+        # Versioned models under MODEL_PATH, loaded lazily into a byte-bounded LRU
+        self.models = ModelRegistry()
         
+        # LSTM input sequences: window length and dtype
+        self.sequence_window = int(os.getenv("PRICE_SEQUENCE_WINDOW", DEFAULT_WINDOW))
+        self.sequence_dtype = np.dtype(os.getenv("PRICE_SEQUENCE_DTYPE", "float64"))
+
+    @property
+    def sia(self):
+        """VADER analyzer, built on first use"""
+        if self._sia is None:
+            with self._lazy_lock:
+                if self._sia is None:
+                    self._sia = _load_sentiment_analyzer()
+        return self._sia
+
+    def snapshot_indicators(self) -> int:
+        """Snapshot the live and daily indicator state; returns the number of symbols written"""
+        return self.indicator_streams.snapshot() + self.daily_indicators.snapshot()
+
+    @property
+    def sentiment_scorer(self):
+        """Batch VADER scorer sharing the analyzer's lexicon"""
+        from vader_batch import load_scorer
+        return load_scorer()
+
+    def warmup(self) -> Dict[str, float]:
+        """Pay the one-off initialization the first requests would otherwise wait for.
+
+        Returns the seconds each step took; a failing step is logged and skipped.
+        """
+        steps = {
+            # VADER lexicon, then one scored batch so the scorer's tables and NumPy paths are hot
+            "sentiment": lambda: self.sia,
+            "sentiment_batch": lambda: self.sentiment_scorer.polarity_scores(["Warmup: shares did NOT rally!"]),
+        }
+        timings = {}
+        for name, step in steps.items():
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.warning(f"Warmup step {name} failed: {str(e)}")
+                continue
+            timings[name] = time.perf_counter() - started
+        return timings
+
     def get_trading_signals(self, symbol: str) -> Dict[str, Any]:
         try:
             # Get historical data
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period="1mo")
+            bars = self.bar_store.get_bars(symbol)
+            recent = bars.since(int(bars.timestamp[-1]) - 31 * NS_PER_DAY) if len(bars) else bars
             
-            if len(hist) < 2:
+            if len(recent) < 2:
                 return {"error": "Not enough historical data"}
                 
-            # Calculate basic technical indicators
-            hist['SMA_5'] = hist['Close'].rolling(window=5).mean()
-            hist['SMA_20'] = hist['Close'].rolling(window=20).mean()
+            # Basic technical indicators, updated only with bars not seen before
+            indicators = self.daily_indicators.sync(symbol, bars)
             
             # Generate trading signals
-            current_price = hist['Close'].iloc[-1]
-            sma_5 = hist['SMA_5'].iloc[-1]
-            sma_20 = hist['SMA_20'].iloc[-1]
+            current_price = float(bars.close[-1])
+            sma_5 = indicators['sma_5']
+            sma_20 = indicators['sma_20']
             
             # Simple trend analysis
             trend = "bullish" if sma_5 > sma_20 else "bearish"
             
             # Calculate price change
-            price_change = (current_price - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2] * 100
+            previous_close = float(bars.close[-2])
+            price_change = (current_price - previous_close) / previous_close * 100
             
             return {
                 "symbol": symbol,
@@ -91,19 +160,18 @@ class MLService:
     def predict_price_movement(self, symbol: str) -> Dict[str, Any]:
         try:
             # Get historical data
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period="3mo")
+            bars = self.bar_store.get_bars(symbol)
+            recent = bars.since(int(bars.timestamp[-1]) - 92 * NS_PER_DAY) if len(bars) else bars
             
-            if len(hist) < 30:
+            if len(recent) < 30:
                 return {"error": "Not enough historical data"}
                 
-            # Calculate momentum indicators
-            hist['ROC'] = hist['Close'].pct_change(periods=20)
-            hist['RSI'] = self._calculate_rsi(hist['Close'])
+            # Momentum indicators, updated only with bars not seen before
+            indicators = self.daily_indicators.sync(symbol, bars)
             
             # Get latest values
-            latest_roc = hist['ROC'].iloc[-1]
-            latest_rsi = hist['RSI'].iloc[-1]
+            latest_roc = indicators['roc_20']
+            latest_rsi = indicators['rsi']
             
             # Simple prediction logic based on RSI and ROC
             prediction = "up" if (latest_rsi < 30 and latest_roc > 0) else "down" if (latest_rsi > 70 and latest_roc < 0) else "neutral"
@@ -125,7 +193,7 @@ class MLService:
             logger.error(f"Error predicting price movement for {symbol}: {str(e)}")
             return {"error": str(e)}
             
-    def _calculate_rsi(self, prices: pd.Series, periods: int = 14) -> pd.Series:
+    def _calculate_rsi(self, prices: "pd.Series", periods: int = 14) -> "pd.Series":
         # Calculate RSI
         delta = prices.diff()
         gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
@@ -135,9 +203,13 @@ class MLService:
         rsi = 100 - (100 / (1 + rs))
         return rsi
 
-    def _build_price_model(self):
+    def _build_price_model(self, input_shape=None):
+        # TensorFlow is only imported once a model is actually needed
+        from tensorflow.keras.layers import Input, LSTM, Dropout, Dense
+        from tensorflow.keras.models import Model
+        
         # Using Functional API with Input layer
-        inputs = Input(shape=(60, 5))
+        inputs = Input(shape=tuple(input_shape or (self.sequence_window, 5)))
         x = LSTM(50, return_sequences=True)(inputs)
         x = Dropout(0.2)(x)
         x = LSTM(50, return_sequences=False)(x)
@@ -149,9 +221,12 @@ class MLService:
         model.compile(optimizer='adam', loss='mse')
         return model
 
-    def _build_signal_model(self):
+    def _build_signal_model(self, input_shape=None):
+        from tensorflow.keras.layers import Input, Dropout, Dense
+        from tensorflow.keras.models import Model
+        
         # Using Functional API with Input layer
-        inputs = Input(shape=(5,))
+        inputs = Input(shape=tuple(input_shape or (5,)))
         x = Dense(64, activation='relu')(inputs)
         x = Dropout(0.2)(x)
         x = Dense(32, activation='relu')(x)
@@ -166,52 +241,41 @@ class MLService:
         )
         return model
 
-    def _prepare_price_data(self, historical_data):
+    def _model_builder(self, model_type: str):
+        """Builder that recreates a registry model's architecture from its manifest"""
+        builders = {'price': self._build_price_model, 'signal': self._build_signal_model}
+        if model_type not in builders:
+            raise ValueError(f"Unknown model type: {model_type}")
+        return lambda manifest: builders[model_type](manifest['input_shape'])
+
+    def save_model(self, symbol: str, model_type: str, model, scaler: Optional[ScalerParams] = None,
+                   feature_set: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Persist a trained model as a new registry version"""
+        self._model_builder(model_type)
+        return self.models.save(symbol, model_type, model.get_weights(), model.input_shape[1:],
+                                scaler=scaler, feature_set=feature_set, metadata=metadata)
+
+    def _load_model(self, symbol: str, model_type: str):
+        """Latest registry version for a symbol, or None; weights stay on disk until first use"""
+        return self.models.load(symbol, model_type, builder=self._model_builder(model_type))
+
+    def _prepare_price_data(self, historical_data, window: Optional[int] = None, dtype=None,
+                            symbol: Optional[str] = None):
         try:
+            window = window or self.sequence_window
             # Check if we have enough data
-            if len(historical_data) < 60:
-                raise ValueError(f"Not enough historical data. Need at least 60 days, got {len(historical_data)}")
-
-            # Debug: log the first few items
-            logger.info(f"First 3 items of historical_data: {historical_data[:3]}")
-
-            # Convert historical data to numpy array, handling both dict and tuple formats
-            data = []
-            for d in historical_data:
-                if isinstance(d, dict):
-                    # Handle dictionary format
-                    data.append([
-                        float(d['open']),
-                        float(d['high']),
-                        float(d['low']),
-                        float(d['close']),
-                        float(d['volume'])
-                    ])
-                elif isinstance(d, tuple):
-                    # Handle tuple format (Open, High, Low, Close, Volume)
-                    data.append([
-                        float(d[0]),  # Open
-                        float(d[1]),  # High
-                        float(d[2]),  # Low
-                        float(d[3]),  # Close
-                        float(d[4])   # Volume
-                    ])
-                else:
-                    logger.warning(f"Skipping unsupported data format: {d}")
-            
-            data = np.array(data)
-            logger.info(f"Prepared data shape: {data.shape}")
-            
-            # Scale the data
-            scaled_data = self.price_scaler.fit_transform(data)
-            
-            # Create sequences for LSTM
-            X = []
-            for i in range(60, len(scaled_data)):
-                X.append(scaled_data[i-60:i])
-            
-            X = np.array(X)
-            logger.info(f"Final X shape: {X.shape}")
+            if len(historical_data) < window:
+                raise ValueError(f"Not enough historical data. Need at least {window} days, got {len(historical_data)}")
+
+            # Symbols keep incrementally updated scaling; anonymous payloads are scaled on their own range
+            if symbol is not None:
+                fit_scaler = lambda data: self.scalers.update(symbol, "ohlcv", data)
+            else:
+                fit_scaler = ScalerParams.fit
+            
+            # Parse straight into one array, scale it in place and window it as a strided view
+            X = build_sequences(historical_data, fit_scaler, window, dtype or self.sequence_dtype)
+            logger.debug(f"Final X shape: {X.shape}")
             return X
         except Exception as e:
             logger.error(f"Error in _prepare_price_data: {str(e)}")
@@ -229,8 +293,13 @@ class MLService:
                     "timestamp": datetime.now().isoformat()
                 }
             
+            # Use the symbol's trained price model when the registry has one
+            prediction = self._predict_with_model(symbol, historical_data)
+            if prediction is not None:
+                return prediction
+            
             # Use last price as prediction
-            last_price = float(historical_data[-1]['close'])
+            last_price = last_close(historical_data)
             
             return {
                 "predicted_price": last_price,
@@ -241,22 +310,53 @@ class MLService:
             logger.error(f"Error in predict_price: {str(e)}")
             raise
 
+    def _predict_with_model(self, symbol: str, historical_data) -> Optional[Dict[str, Any]]:
+        loaded = self._load_model(symbol, 'price')
+        if loaded is None:
+            return None
+        window = loaded.input_shape[0]
+        if len(historical_data) < window:
+            return None
+        
+        try:
+            # Scale with the parameters the model was trained with, and predict from the newest window
+            data = parse_ohlcv(historical_data[-window:], np.float32)
+            scaler = loaded.scaler or ScalerParams.fit(data)
+            X = sliding_windows(scaler.transform(data, out=data), window, include_last=True)
+            predictions = loaded.predict(X)
+            # Invert the close column's scaling (OHLCV order)
+            predicted_price = (float(predictions.reshape(-1)[-1]) - scaler.offset[3]) / scaler.scale[3]
+        except Exception as e:
+            logger.error(f"Error predicting with {symbol} price model v{loaded.version}: {str(e)}")
+            return None
+        
+        return {
+            "predicted_price": float(predicted_price),
+            "confidence": self._calculate_confidence(predictions),
+            "model_version": loaded.version,
+            "timestamp": datetime.now().isoformat()
+        }
+
     def analyze_sentiment(self, text):
         try:
-            # Get VADER sentiment scores
-            scores = self.sia.polarity_scores(text)
+            # Get the VADER compound score, reusing the one of an identical (normalized) text
+            key = self.sentiment_cache.key(text)
+            compound = self.sentiment_cache.get(key)
+            if compound is None:
+                compound = self.sia.polarity_scores(text)['compound']
+                self.sentiment_cache.put(key, compound)
             
             # Determine sentiment
-            if scores['compound'] >= 0.05:
+            if compound >= 0.05:
                 sentiment = 'positive'
-            elif scores['compound'] <= -0.05:
+            elif compound <= -0.05:
                 sentiment = 'negative'
             else:
                 sentiment = 'neutral'
             
             return {
                 'sentiment': sentiment,
-                'confidence': abs(scores['compound']),
+                'confidence': abs(compound),
                 'timestamp': datetime.now().isoformat()
             }
         except Exception as e:
@@ -264,42 +364,17 @@ class MLService:
             raise
 
     def _calculate_technical_indicators(self, data):
+        import pandas as pd
         try:
-            # Calculate technical indicators
-            df = pd.DataFrame()
-            
-            # Simple Moving Averages
-            df['sma_20'] = data['close'].rolling(window=20).mean()
-            df['sma_50'] = data['close'].rolling(window=50).mean()
-            
-            # Relative Strength Index (RSI)
-            delta = data['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            
-            # MACD
-            exp1 = data['close'].ewm(span=12, adjust=False).mean()
-            exp2 = data['close'].ewm(span=26, adjust=False).mean()
-            df['macd'] = exp1 - exp2
-            df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-            
-            # Bollinger Bands
-            df['bb_middle'] = data['close'].rolling(window=20).mean()
-            df['bb_std'] = data['close'].rolling(window=20).std()
-            df['bb_upper'] = df['bb_middle'] + (df['bb_std'] * 2)
-            df['bb_lower'] = df['bb_middle'] - (df['bb_std'] * 2)
-            
-            # Volume indicators
-            df['volume_sma'] = data['volume'].rolling(window=20).mean()
-            df['volume_ratio'] = data['volume'] / df['volume_sma']
-            
-            # Price momentum
-            df['momentum'] = data['close'].pct_change(periods=10)
-            
-            # Volatility
-            df['volatility'] = data['close'].rolling(window=20).std()
+            # Calculate every indicator in one pass over contiguous NumPy columns;
+            # shared primitives (e.g. the 20-bar rolling sums) are computed once
+            columns = {
+                'close': np.asarray(data['close'], dtype=np.float64),
+                'volume': np.asarray(data['volume'], dtype=np.float64)
+            }
+            indicators = compute_indicators(columns)
+            
+            df = pd.DataFrame(indicators, index=getattr(data, 'index', None))
             
             # Fill NaN values with 0
             df = df.fillna(0)
@@ -341,9 +416,53 @@ class MLService:
             logger.error(f"Error in trading signal: {str(e)}")
             raise
 
-    def train_models(self, symbol):
-        # No training needed for rule-based approach
-            return True
+    def train_models(self, symbol: str, epochs: Optional[int] = None, lookback_days: Optional[int] = None,
+                     progress_callback=None, should_stop=None) -> Dict[str, Any]:
+        """Train the symbol's LSTM price model on stored bars and save it as a new registry version.
+
+        ``progress_callback(fraction, details)`` is called after every epoch and
+        ``should_stop()`` is polled after every batch; a stopped run is not saved.
+        """
+        from tensorflow.keras.callbacks import Callback
+        
+        epochs = epochs or int(os.getenv("TRAIN_EPOCHS", 20))
+        window = self.sequence_window
+        bars = self.bar_store.get_bars(symbol, lookback_days=lookback_days or int(os.getenv("TRAIN_LOOKBACK_DAYS", 730)))
+        if len(bars) <= window + 1:
+            raise ValueError(f"Not enough historical data to train {symbol}: {len(bars)} bars")
+        
+        # Scale on this symbol's own range; the params are stored with the model
+        data = np.column_stack([np.asarray(getattr(bars, name), dtype=np.float32)
+                                for name in ('open', 'high', 'low', 'close', 'volume')])
+        scaler = ScalerParams.fit(data)
+        scaler.transform(data, out=data)
+        X = sliding_windows(data, window)
+        y = data[window:, 3]
+        
+        class Progress(Callback):
+            def on_train_batch_end(self, batch, logs=None):
+                if should_stop is not None and should_stop():
+                    self.model.stop_training = True
+            
+            def on_epoch_end(self, epoch, logs=None):
+                if progress_callback is not None:
+                    progress_callback((epoch + 1) / epochs, {"epoch": epoch + 1, "epochs": epochs,
+                                                             **{k: float(v) for k, v in (logs or {}).items()}})
+        
+        model = self._build_price_model((window, 5))
+        history = model.fit(X, y, epochs=epochs, batch_size=32, validation_split=0.1, shuffle=False,
+                            verbose=0, callbacks=[Progress()])
+        completed = len(history.history.get('loss', []))
+        loss = float(history.history['loss'][-1]) if completed else None
+        
+        if should_stop is not None and should_stop():
+            logger.info(f"Training for {symbol} cancelled after {completed} epochs")
+            return {"symbol": symbol, "cancelled": True, "epochs_completed": completed, "loss": loss}
+        
+        version = self.save_model(symbol, 'price', model, scaler=scaler, feature_set='ohlcv',
+                                  metadata={"epochs": completed, "loss": loss, "samples": int(len(X))})
+        return {"symbol": symbol, "cancelled": False, "model_type": "price", "version": version,
+                "epochs_completed": completed, "loss": loss}
 
     def _fetch_news(self, symbol: str) -> List[Dict[str, Any]]:
         """Fetch news articles for a symbol"""
@@ -353,37 +472,26 @@ class MLService:
 
     def _fetch_historical_data(self, symbol: str) -> Dict[str, Any]:
         """Fetch historical data for a symbol"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
+        bars = self.bar_store.get_bars(symbol, lookback_days=365)
+        close = np.asarray(bars.close)
         
-        data = yf.download(symbol, start=start_date, end=end_date)
+        returns = np.full(len(close), np.nan)
+        returns[1:] = close[1:] / close[:-1] - 1
         return {
-            'close': data['Close'].values,
-            'volume': data['Volume'].values,
-            'returns': data['Close'].pct_change().values
+            'timestamp': np.asarray(bars.timestamp),
+            'close': close,
+            'volume': np.asarray(bars.volume),
+            'returns': returns
         }
 
-    def _calculate_zscore(self, data: List[float]) -> List[float]:
+    def _calculate_zscore(self, data) -> np.ndarray:
         """Calculate z-scores for anomaly detection"""
-        mean = np.mean(data)
-        std = np.std(data)
-        return [(x - mean) / std for x in data]
-
-    def _find_anomalies(self, price_zscore: List[float], volume_zscore: List[float]) -> List[Dict[str, Any]]:
-        """Find anomalies in price and volume data"""
-        anomalies = []
-        threshold = 2.0  # Standard deviations
-        
-        for i in range(len(price_zscore)):
-            if abs(price_zscore[i]) > threshold or abs(volume_zscore[i]) > threshold:
-                anomalies.append({
-                    'timestamp': (datetime.now() - timedelta(days=len(price_zscore)-i)).isoformat(),
-                    'price_zscore': price_zscore[i],
-                    'volume_zscore': volume_zscore[i],
-                    'severity': 'high' if abs(price_zscore[i]) > 3.0 or abs(volume_zscore[i]) > 3.0 else 'medium'
-                })
-        
-        return anomalies
+        return zscore(data)
+
+    def _find_anomalies(self, price_zscore: np.ndarray, volume_zscore: np.ndarray,
+                        timestamp: np.ndarray) -> List[Dict[str, Any]]:
+        """Find anomalies in price and volume data, stamped with their bars' timestamps"""
+        return find_anomalies(timestamp, np.asarray(price_zscore), np.asarray(volume_zscore))
 
     def _calculate_confidence(self, predictions: np.ndarray) -> float:
         """Calculate confidence score for predictions"""
@@ -445,38 +553,115 @@ class MLService:
             logger.error(f"Error in signal generation: {str(e)}")
             raise
 
-    def analyze_correlation(self, symbols: List[str]) -> Dict[str, Any]:
-        """Analyze correlation between multiple symbols"""
+    def analyze_correlation(self, symbols: List[str], float32: bool = False, output: str = DICT,
+                            lookback_days: int = 365, window: Optional[int] = None,
+                            covariance: bool = False) -> Dict[str, Any]:
+        """Analyze correlation between multiple symbols.
+
+        Returns are aligned on timestamps and correlated pairwise-complete, as
+        ``DataFrame.corr()`` would, by the blocked engine in ``correlation.py``.
+        ``output`` picks the layout; ``upper`` sends only the upper triangle.
+        With ``window``, the matrix (or the covariance matrix) covers the last
+        ``window`` returns and is updated incrementally from the bars that arrived
+        since the previous call rather than recomputed.
+        """
         try:
             # Fetch historical data
-            data = {}
-            for symbol in symbols:
-                data[symbol] = self._fetch_historical_data(symbol)
-            
-            # Calculate correlation matrix
-            returns = pd.DataFrame({symbol: data[symbol]['returns'] for symbol in symbols})
-            correlation_matrix = returns.corr()
-            
-            return {
-                "correlation_matrix": correlation_matrix.to_dict(),
-                "timestamp": datetime.now().isoformat()
-            }
+            matrix = self.bar_store.load_matrix(symbols, lookback_days=lookback_days, columns=('close',))
+            
+            if window:
+                rolling, lock = self.correlations.get(matrix.symbols, window)
+                with lock:
+                    rolling.update(matrix.timestamp, matrix['close'])
+                    if covariance:
+                        result = format_correlation(matrix.symbols, rolling.covariance(), output,
+                                                    name="covariance_matrix", diagonal=True)
+                    else:
+                        result = format_correlation(matrix.symbols, rolling.correlation(), output)
+                    result["window"] = window
+                    result["bars"] = rolling.bars
+            else:
+                # Calculate correlation matrix
+                returns = returns_from_prices(matrix['close'])
+                correlation = correlation_matrix(returns, np.float32 if float32 else np.float64)
+                
+                result = format_correlation(matrix.symbols, correlation, output)
+            if matrix.errors:
+                result["errors"] = matrix.errors
+            result["timestamp"] = datetime.now().isoformat()
+            return result
         except Exception as e:
             logger.error(f"Error in correlation analysis: {str(e)}")
             raise
 
-    def detect_anomalies(self, symbol: str) -> Dict[str, Any]:
-        """Detect anomalies in price and volume data"""
+    def _correlation_index(self, symbols: List[str], lookback_days: int, float32: bool):
+        matrix = self.bar_store.load_matrix(symbols, lookback_days=lookback_days, columns=('close',))
+        index = CorrelationIndex(matrix.symbols, returns_from_prices(matrix['close']),
+                                 np.float32 if float32 else np.float64)
+        return index, matrix.errors
+
+    def correlation_neighbors(self, symbols: List[str], symbol: str, k: int = 10, min_periods: int = 20,
+                              absolute: bool = False, float32: bool = False,
+                              lookback_days: int = 365) -> Dict[str, Any]:
+        """The ``k`` symbols of a universe most correlated with ``symbol``, without building the full matrix"""
+        try:
+            if symbol.upper() not in (s.upper() for s in symbols):
+                symbols = [symbol] + list(symbols)
+            index, errors = self._correlation_index(symbols, lookback_days, float32)
+            neighbors = index.neighbors(symbol, k, min_periods, absolute)
+            result = {
+                "symbol": symbol.upper(),
+                "neighbors": [{"symbol": other, "correlation": rho} for other, rho in neighbors],
+            }
+            if errors:
+                result["errors"] = errors
+            result["timestamp"] = datetime.now().isoformat()
+            return result
+        except Exception as e:
+            logger.error(f"Error finding correlated symbols for {symbol}: {str(e)}")
+            raise
+
+    def correlated_pairs(self, symbols: List[str], threshold: float = 0.8, limit: Optional[int] = None,
+                         min_periods: int = 20, absolute: bool = False, float32: bool = False,
+                         lookback_days: int = 365) -> Dict[str, Any]:
+        """Every pair of a universe correlated at ``threshold`` or above, plus the universe's mean pair correlation"""
+        try:
+            index, errors = self._correlation_index(symbols, lookback_days, float32)
+            pairs, average = index.pairs_above(threshold, min_periods, absolute, limit)
+            result = {
+                "threshold": threshold,
+                "pairs": [{"symbols": [a, b], "correlation": rho} for a, b, rho in pairs],
+                "average_correlation": average,
+            }
+            if errors:
+                result["errors"] = errors
+            result["timestamp"] = datetime.now().isoformat()
+            return result
+        except Exception as e:
+            logger.error(f"Error finding correlated pairs: {str(e)}")
+            raise
+
+    def detect_anomalies(self, symbol: str, method: str = GLOBAL, window: Optional[int] = None) -> Dict[str, Any]:
+        """Detect anomalies in price and volume data.
+
+        ``global`` scores every bar against the whole lookback's mean/std; ``ewma``
+        and ``mad`` score each bar against the ``window`` bars before it, exactly as
+        the live detectors behind ``/stream/bars`` would have.
+        """
         try:
             # Fetch historical data
             data = self._fetch_historical_data(symbol)
             
-            # Calculate z-scores
-            price_zscore = self._calculate_zscore(data['close'])
-            volume_zscore = self._calculate_zscore(data['volume'])
-            
-            # Detect anomalies
-            anomalies = self._find_anomalies(price_zscore, volume_zscore)
+            if method == GLOBAL:
+                # Calculate z-scores
+                price_zscore = self._calculate_zscore(data['close'])
+                volume_zscore = self._calculate_zscore(data['volume'])
+                
+                # Detect anomalies
+                anomalies = self._find_anomalies(price_zscore, volume_zscore, data['timestamp'])
+            else:
+                anomalies = detect_rolling(data['timestamp'], data['close'], data['volume'], method,
+                                           window or self.anomaly_streams.window, self.anomaly_streams.threshold)
             
             return {
                 "anomalies": anomalies,
@@ -484,4 +669,235 @@ class MLService:
             }
         except Exception as e:
             logger.error(f"Error in anomaly detection: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def scan_anomalies(self, symbols: List[str], method: str = GLOBAL, window: Optional[int] = None,
+                       recent_bars: int = 1, top_k: int = 50, lookback_days: int = 365) -> Dict[str, Any]:
+        """Rank one shard of the universe by its most severe recent anomaly.
+
+        Reads only what the bar store already holds (no provider calls) and
+        scores all symbols of the shard as one aligned matrix.
+        """
+        matrix = self.bar_store.load_matrix(symbols, lookback_days=lookback_days, top_up=False)
+        window = window or self.anomaly_streams.window
+        # Only the recent bars are ranked, so only they need rolling scores
+        price_zscore = rolling_zscore(matrix['close'], method, window, tail=recent_bars)
+        volume_zscore = rolling_zscore(matrix['volume'], method, window, tail=recent_bars)
+        results = top_anomalies(matrix.symbols, matrix.timestamp, price_zscore, volume_zscore,
+                                recent_bars, top_k, self.anomaly_streams.threshold)
+        scanned = int((~np.isnan(matrix['close'])).any(axis=1).sum())
+        return {"results": results, "scanned": scanned, "errors": matrix.errors}
+
+    def predict_price_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Predict prices for many symbols; each item is {'symbol', 'historical_data'}.
+
+        Every item goes through ``predict_price``, so a symbol's registered
+        price model is used exactly as on /predict.
+        """
+        results = []
+        for item in requests:
+            symbol = item.get('symbol')
+            try:
+                result = self.predict_price(symbol, item['historical_data'])
+                results.append({"symbol": symbol, "result": result, "error": None})
+            except Exception as e:
+                results.append({"symbol": symbol, "result": None, "error": str(e)})
+        return results
+
+    def get_trading_signal_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rule-based signals for many symbols; each item is {'symbol', 'features'}"""
+        timestamp = datetime.now().isoformat()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        
+        # Collect the last two features of every well-formed item
+        rows, current, previous = [], [], []
+        for i, item in enumerate(requests):
+            symbol = item.get('symbol')
+            try:
+                features = item['features']
+                if len(features) < 2:
+                    results[i] = {"symbol": symbol, "error": None,
+                                  "result": {'signal': 'HOLD', 'confidence': 0.5, 'timestamp': timestamp}}
+                    continue
+                current.append(float(features[-1]))
+                previous.append(float(features[-2]))
+                rows.append(i)
+            except Exception as e:
+                results[i] = {"symbol": symbol, "result": None, "error": str(e)}
+        
+        if rows:
+            current = np.asarray(current)
+            previous = np.asarray(previous)
+            buy = current > previous * 1.02  # 2% increase
+            sell = ~buy & (current < previous * 0.98)  # 2% decrease
+            signals = np.where(buy, 'BUY', np.where(sell, 'SELL', 'HOLD'))
+            confidences = np.where(buy | sell, 0.6, 0.5)
+            
+            for i, signal, confidence in zip(rows, signals.tolist(), confidences.tolist()):
+                results[i] = {"symbol": requests[i].get('symbol'), "error": None,
+                              "result": {'signal': signal, 'confidence': confidence, 'timestamp': timestamp}}
+        return results
+
+    def analyze_sentiment_batch(self, texts: List[str],
+                                dedupe_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Score many texts with VADER in one call.
+
+        Texts found in the sentiment cache are not rescored, and each distinct
+        normalized text is scored once. With a ``dedupe_threshold`` in (0, 1]
+        (default SENTIMENT_DEDUPE_THRESHOLD) near-duplicates, i.e. texts whose
+        MinHash similarity reaches it, reuse the score of the first of them.
+        Scoring uses the vectorized scorer (vader_batch.py), whose scores are
+        identical to ``polarity_scores``; it falls back to scoring text by
+        text, reporting failures per text, if the batch cannot be scored as a whole.
+        """
+        threshold = SENTIMENT_DEDUPE_THRESHOLD if dedupe_threshold is None else dedupe_threshold
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError("dedupe_threshold must be between 0 and 1")
+        timestamp = datetime.now().isoformat()
+        cache = self.sentiment_cache
+        keys = [cache.key(text) for text in texts]
+        cached = cache.get_many(keys)
+        
+        # First text of every distinct uncached key, and the text whose score it reuses
+        owners: Dict[bytes, int] = {}
+        for i, (key, score) in enumerate(zip(keys, cached)):
+            if score is None:
+                owners.setdefault(key, i)
+        pending = list(owners.values())
+        source = dict(zip(pending, pending))
+        if threshold > 0.0 and len(pending) > 1:
+            groups = near_duplicate_groups(minhash_signatures([texts[i] for i in pending]), threshold)
+            source = {i: pending[group] for i, group in zip(pending, groups.tolist())}
+            cache.record_near_duplicates(sum(i != group for i, group in source.items()))
+        scored = sorted(set(source.values()))
+        
+        scores: Dict[int, float] = {}
+        failures: Dict[int, str] = {}
+        try:
+            values = self.sentiment_scorer.polarity_scores([texts[i] for i in scored])['compound']
+            scores = dict(zip(scored, values.tolist()))
+        except Exception as e:
+            logger.warning(f"Batch sentiment scoring failed, scoring texts one by one: {str(e)}")
+            for i in scored:
+                try:
+                    scores[i] = self.sia.polarity_scores(texts[i])['compound']
+                except Exception as e:
+                    failures[i] = str(e)
+        cache.put_many({keys[i]: score for i, score in scores.items()})
+        
+        compound = np.full(len(texts), np.nan)
+        errors: List[Optional[str]] = [None] * len(texts)
+        for i, (key, score) in enumerate(zip(keys, cached)):
+            if score is None:
+                origin = source[owners[key]]
+                score = scores.get(origin)
+                errors[i] = failures.get(origin)
+            if score is not None:
+                compound[i] = score
+        
+        labels = np.where(compound >= 0.05, 'positive', np.where(compound <= -0.05, 'negative', 'neutral'))
+        confidences = np.abs(compound)
+        
+        results = []
+        for i, text in enumerate(texts):
+            if errors[i] is not None:
+                results.append({"text": text, "result": None, "error": errors[i]})
+            else:
+                results.append({"text": text, "error": None, "result": {
+                    'sentiment': str(labels[i]),
+                    'confidence': float(confidences[i]),
+                    'timestamp': timestamp
+                }})
+        return results
+
+    def detect_anomalies_batch(self, symbols: List[str], method: str = GLOBAL,
+                               window: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Detect anomalies for many symbols, reporting failures per symbol"""
+        # Fetch every stale symbol concurrently up front; failures resurface per symbol below
+        self.bar_store.top_up_many(symbols)
+        results = []
+        for symbol in symbols:
+            try:
+                results.append({"symbol": symbol, "result": self.detect_anomalies(symbol, method, window),
+                                "error": None})
+            except Exception as e:
+                results.append({"symbol": symbol, "result": None, "error": str(e)})
+        return results
+
+    def update_streaming_indicators(self, bars: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply live bars to the per-symbol streaming indicators and anomaly detectors, reporting failures per bar.
+
+        ``anomaly`` scores the bar against the symbol's recent bars before it is
+        folded in; it is None for a bar that is not newer than the last one.
+        """
+        results = []
+        for bar in bars:
+            symbol = bar.get("symbol")
+            try:
+                timestamp = bar.get("timestamp")
+                if timestamp is not None:
+                    import pandas as pd
+                    timestamp = pd.Timestamp(timestamp).value
+                volume = bar.get("volume") or 0.0
+                values = self.indicator_streams.update(symbol, bar["close"], volume, timestamp)
+                anomaly = self.anomaly_streams.update(symbol, bar["close"], volume, timestamp)
+                results.append({"symbol": symbol, "result": self._finite_or_none(values), "anomaly": anomaly,
+                                "error": None})
+            except Exception as e:
+                results.append({"symbol": symbol, "result": None, "error": str(e)})
+        return results
+
+    def get_streaming_indicators(self, symbol: str) -> Dict[str, Any]:
+        """Return the current streaming indicator values for a symbol"""
+        values = self.indicator_streams.get(symbol)
+        if values is None:
+            return {"error": f"No streaming state for {symbol}"}
+        return {"symbol": symbol, "indicators": self._finite_or_none(values)}
+
+    def _finite_or_none(self, values: Dict[str, float]) -> Dict[str, Optional[float]]:
+        # Indicators are NaN until their window fills, which JSON cannot carry
+        return {name: value if np.isfinite(value) else None for name, value in values.items()}
+
+    def generate_signals_watchlist(self, symbols: List[str], lookback_days: int = 180,
+                                   float32: bool = False) -> List[Dict[str, Any]]:
+        """Generate indicator-based signals for a whole watchlist in one vectorized pass"""
+        matrix = self.bar_store.load_matrix(symbols, lookback_days=lookback_days)
+        close = matrix['close']
+        if close.shape[1] == 0:
+            return [{"symbol": symbol, "result": None,
+                     "error": matrix.errors.get(symbol, "Not enough historical data")} for symbol in symbols]
+        indicators = compute_indicators({'close': close, 'volume': matrix['volume']},
+                                        dtype=np.float32 if float32 else None)
+        
+        # Latest bar of every symbol, wherever its history ends
+        observed = ~np.isnan(close)
+        counts = observed.sum(axis=1)
+        last = close.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+        rows = np.arange(len(symbols))
+        latest = {name: values[rows, last].astype(np.float64) for name, values in indicators.items()}
+        
+        # Same rules as _generate_signal, applied to every symbol at once
+        rsi = latest['rsi']
+        histogram = latest['macd'] - latest['signal']
+        signals = np.where((rsi > 70) & (histogram < 0), "SELL",
+                           np.where((rsi < 30) & (histogram > 0), "BUY", "HOLD"))
+        
+        timestamp = datetime.now().isoformat()
+        results = []
+        for i, symbol in enumerate(symbols):
+            if symbol in matrix.errors:
+                results.append({"symbol": symbol, "result": None, "error": matrix.errors[symbol]})
+                continue
+            if counts[i] < 2:
+                results.append({"symbol": symbol, "result": None, "error": "Not enough historical data"})
+                continue
+            values = self._finite_or_none({name: float(column[i]) for name, column in latest.items()})
+            values['histogram'] = float(histogram[i]) if np.isfinite(histogram[i]) else None
+            results.append({"symbol": symbol, "error": None, "result": {
+                "signal": str(signals[i]),
+                "confidence": self._calculate_signal_confidence(float(rsi[i]), {'histogram': histogram[i]}),
+                "price": float(close[i, last[i]]),
+                "indicators": values,
+                "timestamp": timestamp
+            }})
+        return results
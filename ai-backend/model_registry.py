@@ -0,0 +1,258 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scalers import ScalerParams
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+
+
+class LoadedModel:
+    """A model version whose weights are memory-mapped from the registry.
+
+    The framework model is only built, from ``weights``, the first time it is needed.
+    """
+
+    def __init__(self, symbol: str, model_type: str, version: int, manifest: Dict[str, Any],
+                 weights: List[np.ndarray], builder: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.symbol = symbol
+        self.model_type = model_type
+        self.version = version
+        self.manifest = manifest
+        self.weights = weights
+        self.scaler = _scaler_from_manifest(manifest.get("scaler"))
+        self._builder = builder
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self) -> Tuple[int, ...]:
+        return tuple(self.manifest["input_shape"])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.manifest["bytes"])
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self._builder is None:
+                        raise ValueError(f"No builder for {self.model_type} models")
+                    model = self._builder(self.manifest)
+                    model.set_weights(self.weights)
+                    self._model = model
+        return self._model
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(X, verbose=0))
+
+
+def _scaler_from_manifest(scaler: Optional[Dict[str, Any]]) -> Optional[ScalerParams]:
+    if not scaler:
+        return None
+    return ScalerParams(scaler["data_min"], scaler["data_max"], tuple(scaler["feature_range"]))
+
+
+def _scaler_to_manifest(scaler: Optional[ScalerParams], feature_set: Optional[str]) -> Optional[Dict[str, Any]]:
+    if scaler is None:
+        return None
+    return {
+        "feature_set": feature_set,
+        "data_min": scaler.data_min.tolist(),
+        "data_max": scaler.data_max.tolist(),
+        "feature_range": list(scaler.feature_range),
+    }
+
+
+class ModelRegistry:
+    """Versioned model artifacts per symbol and model type under ``MODEL_PATH``.
+
+    Layout: ``<root>/<SYMBOL>/<model_type>/v<N>/`` holds ``manifest.json`` (input
+    shape, scaler params, weight index) and one ``.npy`` file per weight tensor;
+    ``latest.json`` next to the versions points at the version to serve. A version
+    directory is fully written before it is renamed into place. Loaded versions
+    are kept in an LRU bounded by their weight bytes (``MODEL_CACHE_BYTES``).
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.getenv("MODEL_PATH", "./models")
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("MODEL_CACHE_BYTES", 256 * 1024 * 1024))
+
+        self._loaded: "OrderedDict[Tuple[str, str, int], LoadedModel]" = OrderedDict()
+        self._loaded_bytes = 0
+        self._cache_lock = threading.Lock()
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._write_locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _model_dir(self, symbol: str, model_type: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_.^=" else "_" for c in symbol.upper())
+        return os.path.join(self.root, safe, model_type)
+
+    @contextmanager
+    def _write_lock(self, symbol: str, model_type: str):
+        """Serialize version allocation across threads and, where supported, processes"""
+        directory = self._model_dir(symbol, model_type)
+        os.makedirs(directory, exist_ok=True)
+        with self._write_locks_guard:
+            lock = self._write_locks.setdefault(directory, threading.Lock())
+        with lock:
+            with open(os.path.join(directory, ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield directory
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def versions(self, symbol: str, model_type: str) -> List[int]:
+        directory = self._model_dir(symbol, model_type)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[1:]) for name in os.listdir(directory)
+                      if name.startswith("v") and name[1:].isdigit())
+
+    def latest_version(self, symbol: str, model_type: str) -> Optional[int]:
+        try:
+            with open(os.path.join(self._model_dir(symbol, model_type), "latest.json")) as f:
+                return int(json.load(f)["version"])
+        except FileNotFoundError:
+            versions = self.versions(symbol, model_type)
+            return versions[-1] if versions else None
+
+    def manifest(self, symbol: str, model_type: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Read a version's manifest (default: the latest) without touching its weights"""
+        version = version if version is not None else self.latest_version(symbol, model_type)
+        if version is None:
+            return None
+        path = os.path.join(self._model_dir(symbol, model_type), f"v{version}", "manifest.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, symbol: str, model_type: str, weights: Sequence[np.ndarray], input_shape: Sequence[int],
+             scaler: Optional[ScalerParams] = None, feature_set: Optional[str] = None,
+             metadata: Optional[Dict[str, Any]] = None, make_latest: bool = True) -> int:
+        """Write a new version and (by default) point ``latest`` at it; returns the version number"""
+        with self._write_lock(symbol, model_type) as directory:
+            versions = self.versions(symbol, model_type)
+            version = versions[-1] + 1 if versions else 1
+            tmp_dir = os.path.join(directory, f".v{version}.tmp-{os.getpid()}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            try:
+                index = []
+                for i, weight in enumerate(weights):
+                    weight = np.ascontiguousarray(weight)
+                    name = f"w{i:03d}.npy"
+                    np.save(os.path.join(tmp_dir, name), weight)
+                    index.append({"file": name, "shape": list(weight.shape), "dtype": weight.dtype.str})
+
+                manifest = {
+                    "format": MANIFEST_FORMAT,
+                    "symbol": symbol.upper(),
+                    "model_type": model_type,
+                    "version": version,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "input_shape": [int(d) for d in input_shape],
+                    "scaler": _scaler_to_manifest(scaler, feature_set),
+                    "weights": index,
+                    "bytes": int(sum(np.asarray(w).nbytes for w in weights)),
+                    "metadata": metadata or {},
+                }
+                with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_dir, os.path.join(directory, f"v{version}"))
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            if make_latest:
+                self._set_latest(directory, version)
+        logger.info(f"Model registry: saved {model_type} v{version} for {symbol}")
+        return version
+
+    def _set_latest(self, directory: str, version: int):
+        tmp_path = os.path.join(directory, "latest.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version}, f)
+        os.replace(tmp_path, os.path.join(directory, "latest.json"))
+
+    def promote(self, symbol: str, model_type: str, version: int):
+        """Serve an existing version (e.g. roll back)"""
+        if version not in self.versions(symbol, model_type):
+            raise ValueError(f"No {model_type} v{version} for {symbol}")
+        with self._write_lock(symbol, model_type) as directory:
+            self._set_latest(directory, version)
+
+    def load(self, symbol: str, model_type: str, version: Optional[int] = None,
+             builder: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Optional[LoadedModel]:
+        """Return a version (default: the latest), memory-mapping its weights on first use"""
+        version = version if version is not None else self.latest_version(symbol, model_type)
+        if version is None:
+            return None
+        key = (symbol.upper(), model_type, version)
+        with self._cache_lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                self._loaded.move_to_end(key)
+                self.hits += 1
+                return loaded
+            self.misses += 1
+
+        manifest = self.manifest(symbol, model_type, version)
+        if manifest is None:
+            return None
+        directory = os.path.join(self._model_dir(symbol, model_type), f"v{version}")
+        weights = [np.load(os.path.join(directory, entry["file"]), mmap_mode="r") for entry in manifest["weights"]]
+        loaded = LoadedModel(symbol.upper(), model_type, version, manifest, weights, builder)
+
+        with self._cache_lock:
+            existing = self._loaded.get(key)
+            if existing is not None:
+                return existing
+            self._loaded[key] = loaded
+            self._loaded_bytes += loaded.nbytes
+            # Always keep the model just loaded, even if it alone exceeds the budget
+            while self._loaded_bytes > self.max_bytes and len(self._loaded) > 1:
+                _, evicted = self._loaded.popitem(last=False)
+                self._loaded_bytes -= evicted.nbytes
+                self.evictions += 1
+        return loaded
+
+    def stats(self) -> Dict[str, int]:
+        with self._cache_lock:
+            return {
+                "loaded": len(self._loaded),
+                "bytes": self._loaded_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,67 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+if orjson is not None:
+    # NumPy arrays and scalars are written natively; dict keys need not be strings
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Encode what the serializer has no native support for"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        # e.g. object or non-contiguous arrays
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _replace_nan(value: Any) -> Any:
+    """Recursively turn float NaN / inf into None for the standard library encoder"""
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _replace_nan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_nan(item) for item in value]
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a response payload to JSON bytes.
+
+    NumPy arrays and scalars, datetimes and non-string dict keys are handled
+    directly, and NaN / inf become null, so service results need no
+    ``jsonable_encoder`` pass first.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    content = json.loads(json.dumps(content, default=_default))
+    return json.dumps(_replace_nan(content), separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by ``dumps``.
+
+    Returning one from an endpoint skips FastAPI's recursive
+    ``jsonable_encoder``; as the app's default response class it also renders
+    every other endpoint's (already encoded) result.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from responses import dumps
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a result stays servable per endpoint; endpoints not listed are not cached.
+# Keys already include the bar-store / model versions a result was computed from,
+# so the TTL only bounds how long a stale-but-unchanged store or the wall-clock
+# timestamp in a result is reused. Override with RESULT_CACHE_TTLS,
+# e.g. RESULT_CACHE_TTLS="anomalies=30,predict=0" (0 disables an endpoint).
+ENDPOINT_TTLS: Dict[str, float] = {
+    "predict": 30.0,
+    "signal": 30.0,
+    "generate-signals": 30.0,
+    "generate-signals/watchlist": 60.0,
+    "correlation": 300.0,
+    "correlation/rolling": 300.0,
+    "correlation/neighbors": 300.0,
+    "correlation/pairs": 300.0,
+    "anomalies": 60.0,
+}
+
+
+def _parse_ttls(value: str) -> Dict[str, float]:
+    """Parse an "endpoint=seconds,endpoint=seconds" override string"""
+    ttls = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, seconds = item.partition("=")
+        try:
+            ttls[endpoint.strip()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Invalid TTL '{seconds.strip()}' for endpoint '{endpoint.strip()}'")
+    return ttls
+
+
+def result_size(result: Any) -> int:
+    """Approximate memory cost of a result: the length of its JSON encoding"""
+    return len(dumps(result))
+
+
+class ResultCache:
+    """LRU cache of endpoint results with per-endpoint TTLs and a byte budget.
+
+    Entries are keyed by ``coalescing.request_key``, i.e. the canonical arguments
+    plus the data versions they were computed from, so a bar-store append or a
+    newly promoted model makes old entries unreachable without explicit
+    invalidation; those are then aged out by TTL or evicted by LRU.
+    Cached results are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, ttls: Optional[Dict[str, float]] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("RESULT_CACHE_BYTES", 64 * 1024 * 1024))
+        self.ttls = dict(ENDPOINT_TTLS)
+        self.ttls.update(_parse_ttls(os.getenv("RESULT_CACHE_TTLS", "")))
+        if ttls:
+            self.ttls.update(ttls)
+
+        # key -> (expires_at, size, result)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def enabled(self, endpoint: str) -> bool:
+        return self.max_bytes > 0 and self.ttls.get(endpoint, 0.0) > 0.0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, size, result = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, endpoint: str, key: str, result: Any):
+        ttl = self.ttls.get(endpoint, 0.0)
+        if ttl <= 0.0:
+            return
+        try:
+            size = result_size(result)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Result cache: not caching {endpoint} result: {str(e)}")
+            return
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (time.monotonic() + ttl, size, result)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ScalerParams:
+    """Fitted min-max scaling for one feature set, equivalent to a fitted ``MinMaxScaler``.
+
+    Instances are immutable: updating with new data returns a new instance, so
+    a params object can be shared between threads and applied concurrently.
+    """
+
+    __slots__ = ("data_min", "data_max", "feature_range", "scale", "offset")
+
+    def __init__(self, data_min: np.ndarray, data_max: np.ndarray, feature_range: Tuple[float, float] = (0.0, 1.0)):
+        self.data_min = np.array(data_min, dtype=np.float64)
+        self.data_max = np.array(data_max, dtype=np.float64)
+        self.feature_range = feature_range
+
+        # Same arithmetic as MinMaxScaler.fit: constant features get a unit range
+        data_range = self.data_max - self.data_min
+        data_range[data_range == 0.0] = 1.0
+        self.scale = (feature_range[1] - feature_range[0]) / data_range
+        self.offset = feature_range[0] - self.data_min * self.scale
+        for array in (self.data_min, self.data_max, self.scale, self.offset):
+            array.setflags(write=False)
+
+    @classmethod
+    def fit(cls, data: np.ndarray, feature_range: Tuple[float, float] = (0.0, 1.0)) -> "ScalerParams":
+        """Fit on a (rows, features) array, ignoring NaN like ``MinMaxScaler``"""
+        data = np.asarray(data)
+        if data.ndim != 2 or len(data) == 0:
+            raise ValueError(f"Expected a non-empty (rows, features) array, got shape {data.shape}")
+        return cls(np.nanmin(data, axis=0), np.nanmax(data, axis=0), feature_range)
+
+    def update(self, data: np.ndarray) -> "ScalerParams":
+        """Return params widened to also cover ``data``; ``self`` is unchanged"""
+        data = np.asarray(data)
+        if len(data) == 0:
+            return self
+        if data.shape[1:] != self.data_min.shape:
+            raise ValueError(f"Expected {self.data_min.shape[0]} features, got {data.shape[1:]}")
+        data_min = np.fmin(self.data_min, np.nanmin(data, axis=0))
+        data_max = np.fmax(self.data_max, np.nanmax(data, axis=0))
+        if np.array_equal(data_min, self.data_min) and np.array_equal(data_max, self.data_max):
+            return self
+        return ScalerParams(data_min, data_max, self.feature_range)
+
+    def transform(self, data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scale ``data``; pass ``out=data`` to scale a float array in place"""
+        dtype = out.dtype if out is not None else np.result_type(np.asarray(data).dtype, np.float32)
+        result = np.multiply(data, self.scale.astype(dtype, copy=False), out=out)
+        return np.add(result, self.offset.astype(dtype, copy=False), out=result)
+
+    def inverse_transform(self, data: np.ndarray) -> np.ndarray:
+        return (np.asarray(data) - self.offset) / self.scale
+
+    @property
+    def nbytes(self) -> int:
+        return self.data_min.nbytes + self.data_max.nbytes + self.scale.nbytes + self.offset.nbytes
+
+
+class ScalerRegistry:
+    """LRU cache of fitted min-max params per (symbol, feature set).
+
+    Params only ever widen as new bars arrive, so a symbol's scaling is stable
+    across requests instead of being refitted on every payload. The lock only
+    guards the index; scaling itself happens on immutable params outside it.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, feature_range: Tuple[float, float] = (0.0, 1.0)):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SCALER_CACHE_SIZE", 4096))
+        self.feature_range = feature_range
+        self._params: "OrderedDict[Tuple[str, str], ScalerParams]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(symbol: str, feature_set: str) -> Tuple[str, str]:
+        return symbol.upper(), feature_set
+
+    def get(self, symbol: str, feature_set: str) -> Optional[ScalerParams]:
+        key = self._key(symbol, feature_set)
+        with self._lock:
+            params = self._params.get(key)
+            if params is not None:
+                self._params.move_to_end(key)
+            return params
+
+    def update(self, symbol: str, feature_set: str, data: np.ndarray) -> ScalerParams:
+        """Fold new rows into the symbol's params and return the params to scale them with"""
+        key = self._key(symbol, feature_set)
+        with self._lock:
+            current = self._params.get(key)
+        # Fit outside the lock; a concurrent update is merged below rather than lost
+        fitted = current.update(data) if current is not None else ScalerParams.fit(data, self.feature_range)
+
+        with self._lock:
+            latest = self._params.get(key)
+            if latest is not None and latest is not current:
+                fitted = ScalerParams(np.fmin(latest.data_min, fitted.data_min),
+                                      np.fmax(latest.data_max, fitted.data_max), self.feature_range)
+            self._params[key] = fitted
+            self._params.move_to_end(key)
+            while len(self._params) > self.max_entries:
+                self._params.popitem(last=False)
+        return fitted
+
+    def fit_transform(self, symbol: str, feature_set: str, data: np.ndarray,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.update(symbol, feature_set, data).transform(data, out=out)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._params), "max_entries": self.max_entries,
+                    "bytes": sum(params.nbytes for params in self._params.values())}
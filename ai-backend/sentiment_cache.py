@@ -0,0 +1,188 @@
+import os
+import re
+import hashlib
+import unicodedata
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Sentiment scores kept per normalized text (LRU); 0 disables the cache
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+
+# How texts are normalized before hashing them into cache keys:
+#   "whitespace" - (default) Unicode NFC and whitespace folded; VADER splits on whitespace,
+#                  so cached scores are identical to uncached ones
+#   "full"       - case and punctuation folded as well, so more syndicated copies of a
+#                  headline share one entry; this changes scores: VADER reads caps and
+#                  "!"/"?", so "GOOD NEWS!!!" would reuse the score cached for "good news"
+WHITESPACE = "whitespace"
+FULL = "full"
+SENTIMENT_CACHE_FOLD = os.getenv("SENTIMENT_CACHE_FOLD", WHITESPACE)
+
+# Default MinHash similarity above which /batch/sentiment scores a group of rewritten
+# headlines once; 0 disables near-duplicate detection
+SENTIMENT_DEDUPE_THRESHOLD = float(os.getenv("SENTIMENT_DEDUPE_THRESHOLD", "0"))
+
+# MinHash signature length, split into LSH bands of MINHASH_PERMUTATIONS / MINHASH_BANDS rows
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+# Texts are shingled into overlapping 4-byte windows of their folded UTF-8 encoding
+SHINGLE = 4
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+# Multiply-shift hash functions (a * x + b) >> 32 over 64-bit words; fixed so signatures are reproducible
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(0, 2 ** 64 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64, endpoint=True) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 64 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64, endpoint=True)
+del _rng
+
+
+def normalize_text(text: str, fold: str = WHITESPACE) -> str:
+    """NFC-normalize and collapse whitespace; with ``fold="full"`` also casefold and drop punctuation"""
+    text = unicodedata.normalize("NFC", text)
+    if fold == FULL:
+        text = _PUNCTUATION.sub(" ", text.casefold())
+    elif fold != WHITESPACE:
+        raise ValueError(f"Unknown fold '{fold}', expected '{FULL}' or '{WHITESPACE}'")
+    return " ".join(text.split())
+
+
+def text_key(text: str, fold: str = WHITESPACE) -> bytes:
+    """128-bit digest of the normalized text"""
+    return hashlib.blake2b(normalize_text(text, fold).encode("utf-8"), digest_size=16).digest()
+
+
+class SentimentCache:
+    """LRU cache of compound sentiment scores keyed by a hash of the normalized text.
+
+    Keys and values are fixed size (a 16-byte digest and a float), so
+    ``max_entries`` bounds its memory.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, fold: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else SENTIMENT_CACHE_SIZE
+        self.fold = fold or SENTIMENT_CACHE_FOLD
+        normalize_text("", self.fold)  # reject an unknown fold up front
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicates = 0
+
+    def key(self, text: str) -> bytes:
+        return text_key(text, self.fold)
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[float]]:
+        """Cached score per key, None where missing"""
+        if self.max_entries <= 0:
+            return [None] * len(keys)
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+            found = sum(score is not None for score in scores)
+            self.hits += found
+            self.misses += len(keys) - found
+        return scores
+
+    def get(self, key: bytes) -> Optional[float]:
+        return self.get_many([key])[0]
+
+    def put_many(self, scores: Dict[bytes, float]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, score in scores.items():
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def put(self, key: bytes, score: float):
+        self.put_many({key: score})
+
+    def record_near_duplicates(self, count: int):
+        with self._lock:
+            self.near_duplicates += count
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._scores), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "near_duplicates": self.near_duplicates}
+
+
+def minhash_signatures(texts: Sequence[str]) -> np.ndarray:
+    """(len(texts), MINHASH_PERMUTATIONS) MinHash signatures of the texts' 4-byte shingles.
+
+    Texts are fully folded first (case, whitespace, punctuation); matching
+    signature entries estimate the Jaccard similarity of two shingle sets.
+    """
+    n = len(texts)
+    signatures = np.empty((n, MINHASH_PERMUTATIONS), dtype=np.uint64)
+    if n == 0:
+        return signatures
+    encoded = [normalize_text(text, FULL).encode("utf-8").ljust(SHINGLE, b"\0") for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    # Every window that lies inside one text, packed big-endian into a 32-bit word
+    counts = lengths - SHINGLE + 1
+    first = np.zeros(n, dtype=np.int64)
+    np.cumsum(counts[:-1], out=first[1:])
+    text_starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=text_starts[1:])
+    positions = np.arange(counts.sum()) + np.repeat(text_starts - first, counts)
+    shingles = np.zeros(len(positions), dtype=np.uint64)
+    for offset in range(SHINGLE):
+        shingles = (shingles << np.uint64(8)) | data[positions + offset]
+
+    # A few hash functions at a time keeps the (hashes, shingles) block small
+    for lo in range(0, MINHASH_PERMUTATIONS, 8):
+        hi = lo + 8
+        hashed = _HASH_A[lo:hi, None] * shingles
+        hashed += _HASH_B[lo:hi, None]
+        hashed >>= np.uint64(32)
+        signatures[:, lo:hi] = np.minimum.reduceat(hashed, first, axis=1).T
+    return signatures
+
+
+def near_duplicate_groups(signatures: np.ndarray, threshold: float) -> np.ndarray:
+    """Index of the representative each text reuses (itself for representatives).
+
+    Texts are taken in order; LSH banding finds earlier representatives that
+    share a band, and a text joins the most similar of them whose estimated
+    Jaccard similarity is at least ``threshold``, else it becomes one.
+    """
+    n, permutations = signatures.shape
+    representative = np.arange(n)
+    if n < 2:
+        return representative
+    rows = permutations // MINHASH_BANDS
+    # One 64-bit key per band; a collision only adds a candidate that fails the similarity check
+    band_ids = [(signatures[:, band * rows:(band + 1) * rows] * _HASH_A[:rows]).sum(axis=1).tolist()
+                for band in range(MINHASH_BANDS)]
+    buckets: List[Dict[int, List[int]]] = [{} for _ in range(MINHASH_BANDS)]
+    for i in range(n):
+        candidates = set()
+        for band in range(MINHASH_BANDS):
+            candidates.update(buckets[band].get(band_ids[band][i], ()))
+        if candidates:
+            candidates = sorted(candidates)
+            similarity = (signatures[candidates] == signatures[i]).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= threshold:
+                representative[i] = candidates[best]
+                continue
+        for band in range(MINHASH_BANDS):
+            buckets[band].setdefault(band_ids[band][i], []).append(i)
+    return representative
@@ -0,0 +1,92 @@
+import logging
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Callable, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+DEFAULT_WINDOW = 60
+
+_get_fields = itemgetter(*OHLCV_FIELDS)
+_get_positions = itemgetter(0, 1, 2, 3, 4)
+
+
+def parse_ohlcv(rows: Sequence[Any], dtype=np.float64) -> np.ndarray:
+    """Parse OHLCV rows into one preallocated (rows, 5) array.
+
+    Rows are dicts keyed by ``open``..``volume`` or tuples in that order; any
+    other row is skipped with a warning. Numeric strings are accepted. An
+    already parsed (rows, 5) array (e.g. a decoded columnar body) is copied.
+    """
+    if isinstance(rows, np.ndarray):
+        if rows.ndim != 2 or rows.shape[1] != len(OHLCV_FIELDS):
+            raise ValueError(f"Expected a (rows, {len(OHLCV_FIELDS)}) OHLCV array, got shape {rows.shape}")
+        return np.array(rows, dtype=dtype)
+    n = len(rows)
+    if n and all(type(row) is dict for row in rows):
+        values = chain.from_iterable(map(_get_fields, rows))
+    elif n and all(type(row) is tuple for row in rows):
+        values = chain.from_iterable(map(_get_positions, rows))
+    else:
+        return _parse_mixed(rows, dtype)
+    # fromiter fills the array in place; no per-row lists or float() calls
+    return np.fromiter(values, dtype=dtype, count=n * len(OHLCV_FIELDS)).reshape(n, len(OHLCV_FIELDS))
+
+
+def _parse_mixed(rows: Sequence[Any], dtype) -> np.ndarray:
+    data = np.empty((len(rows), len(OHLCV_FIELDS)), dtype=dtype)
+    count = 0
+    for row in rows:
+        if isinstance(row, dict):
+            data[count] = _get_fields(row)
+        elif isinstance(row, tuple):
+            data[count] = row[:5]
+        else:
+            logger.warning(f"Skipping unsupported data format: {row}")
+            continue
+        count += 1
+    return data[:count]
+
+
+def last_close(rows: Sequence[Any]) -> float:
+    """Close of the newest row of an OHLCV payload (dict rows, tuple rows or a (rows, 5) array)"""
+    row = rows[-1]
+    if isinstance(row, dict):
+        return float(row['close'])
+    return float(row[OHLCV_FIELDS.index("close")])
+
+
+def sliding_windows(data: np.ndarray, window: int = DEFAULT_WINDOW, include_last: bool = False) -> np.ndarray:
+    """Return the (N, window, features) sequences of ``data`` as a read-only strided view.
+
+    Window ``i`` covers ``data[i:i + window]``. Like the original sequence loop,
+    the window ending on the newest row is left out unless ``include_last``.
+    """
+    if window < 1:
+        raise ValueError(f"Window length must be positive, got {window}")
+    if len(data) < window:
+        return np.empty((0, window) + data.shape[1:], dtype=data.dtype)
+
+    # sliding_window_view appends the window axis last; move it next to the sample axis
+    windows = np.moveaxis(sliding_window_view(data, window, axis=0), -1, 1)
+    return windows if include_last else windows[:-1]
+
+
+def build_sequences(rows: Sequence[Any], fit_scaler: Callable[[np.ndarray], Any], window: int = DEFAULT_WINDOW,
+                    dtype=np.float64, include_last: bool = False) -> np.ndarray:
+    """Parse, min-max scale in place and window an OHLCV payload without copying the windows.
+
+    ``fit_scaler`` receives the parsed (rows, 5) array and returns the params
+    to scale it with, e.g. ``scalers.ScalerParams.fit`` or a registry lookup.
+    """
+    data = parse_ohlcv(rows, dtype)
+    if len(data):
+        fit_scaler(data).transform(data, out=data)
+    return sliding_windows(data, window, include_last)
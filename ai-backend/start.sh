@@ -16,8 +16,8 @@ source venv/bin/activate
 echo "📥 Installing Python dependencies..."
 pip install -r requirements.txt
 
-# Download NLTK data if needed
-echo "📚 Setting up NLTK data..."
+# Build the precompiled VADER lexicon
+echo "📚 Building VADER lexicon..."
 python download_nltk_data.py
 
 # Set environment variables
@@ -0,0 +1,530 @@
+import os
+import json
+import math
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from indicators import Expr, INDICATORS, indicator_exprs, _plan
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NAN = float("nan")
+
+# Indicators kept live per symbol: the batch set plus what the signal endpoints read
+EXTRA_INDICATORS: Dict[str, Expr] = {
+    "sma_5": ("mean", "close", 5),
+    "roc_20": ("pct_change", "close", 20),
+}
+
+# Rolling windows re-sum their buffer this often to stop add/remove rounding from drifting
+RESYNC_INTERVAL = 1024
+
+SNAPSHOT_FORMAT = 2
+
+
+def _div(a: float, b: float) -> float:
+    """Division with NumPy semantics (x/0 -> +-inf, 0/0 -> NaN)"""
+    if b == 0.0:
+        if a != a or a == 0.0:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _rsi(rs: float) -> float:
+    return 100 - (100 / (1 + rs))
+
+
+class _Node:
+    """One expression of the indicator graph, updated once per bar"""
+
+    __slots__ = ("expr", "value")
+
+    def __init__(self, expr: Expr):
+        self.expr = expr
+        self.value = NAN
+
+    def update(self, nodes: Dict[Expr, "_Node"], bar: Dict[str, float]):
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+    def load(self, state: Dict[str, Any]):
+        self.value = state["value"]
+
+
+class _Column(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        self.value = float(bar[self.expr])
+
+
+class _RollingStats(_Node):
+    """Trailing window sum with Welford-style sliding mean and sum of squared deviations.
+
+    Shared by the ``sum`` and ``m2`` nodes of the same (source, window). Windows
+    holding a NaN report NaN until it leaves; windows of all zeros are exactly 0.
+    """
+
+    __slots__ = ("source", "window", "buffer", "mean", "m2", "nans", "nonzero", "dirty", "updates")
+
+    def __init__(self, expr: Expr):
+        super().__init__(expr)
+        _, self.source, self.window = expr
+        self.buffer = deque(maxlen=self.window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.nans = 0
+        self.nonzero = 0
+        self.dirty = False
+        self.updates = 0
+
+    def _resync(self):
+        values = list(self.buffer)
+        self.mean = math.fsum(values) / len(values) if values else 0.0
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in values)
+        self.dirty = False
+
+    def update(self, nodes, bar):
+        x = nodes[self.source].value
+        buffer = self.buffer
+        full = len(buffer) == self.window
+        old = buffer[0] if full else 0.0
+        buffer.append(x)
+
+        if x != x:
+            self.nans += 1
+        elif x != 0.0:
+            self.nonzero += 1
+        if full:
+            if old != old:
+                self.nans -= 1
+            elif old != 0.0:
+                self.nonzero -= 1
+
+        self.updates += 1
+        if self.nans:
+            # NaNs poison the running moments; rebuild them once the window is clean
+            self.dirty = True
+        elif self.dirty or old != old or self.updates % RESYNC_INTERVAL == 0:
+            self._resync()
+        elif full:
+            mean = self.mean + (x - old) / self.window
+            self.m2 += (x - old) * (x - mean + old - self.mean)
+            self.mean = mean
+        else:
+            n = len(buffer)
+            delta = x - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (x - self.mean)
+
+        if self.nonzero == 0 and not self.nans:
+            self.mean = self.m2 = 0.0
+
+        if len(buffer) < self.window or self.nans:
+            self.value = NAN
+        else:
+            self.value = self.mean * self.window
+
+    @property
+    def sum_of_squares(self) -> float:
+        return NAN if self.value != self.value else max(self.m2, 0.0)
+
+    def state(self):
+        return {"value": self.value, "buffer": list(self.buffer), "mean": self.mean, "m2": self.m2,
+                "dirty": self.dirty, "updates": self.updates}
+
+    def load(self, state):
+        self.value = state["value"]
+        self.buffer = deque(state["buffer"], maxlen=self.window)
+        self.mean = state["mean"]
+        self.m2 = state["m2"]
+        self.dirty = state["dirty"]
+        self.updates = state["updates"]
+        self.nans = sum(1 for v in self.buffer if v != v)
+        self.nonzero = sum(1 for v in self.buffer if v == v and v != 0.0)
+
+
+class _SquaredDeviations(_Node):
+    __slots__ = ("stats",)
+
+    def __init__(self, expr, stats: _RollingStats):
+        super().__init__(expr)
+        self.stats = stats
+
+    def update(self, nodes, bar):
+        self.value = self.stats.sum_of_squares
+
+
+class _Mean(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        _, src, window = self.expr
+        self.value = nodes[("sum", src, window)].value / window
+
+
+class _Std(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        _, src, window = self.expr
+        m2 = nodes[("m2", src, window)].value
+        self.value = math.sqrt(m2 / (window - 1)) if window > 1 and m2 == m2 else NAN
+
+
+class _Band(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        _, src, window, k = self.expr
+        self.value = nodes[("mean", src, window)].value + nodes[("std", src, window)].value * k
+
+
+class _Diff(_Node):
+    __slots__ = ("previous", "observed")
+
+    def __init__(self, expr):
+        super().__init__(expr)
+        self.previous = NAN
+        self.observed = False
+
+    def update(self, nodes, bar):
+        x = nodes[self.expr[1]].value
+        self.value = x - self.previous
+        self.previous = x
+        self.observed = self.observed or x == x
+
+    def state(self):
+        return {"value": self.value, "previous": self.previous, "observed": self.observed}
+
+    def load(self, state):
+        self.value = state["value"]
+        self.previous = state["previous"]
+        self.observed = state["observed"]
+
+
+class _Gain(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        # NaN deltas count as 0 like pandas' ``delta.where(delta > 0, 0)``, once the series has started
+        diff = nodes[("diff", self.expr[1])]
+        delta = diff.value
+        self.value = (delta if delta > 0.0 else 0.0) if diff.observed else NAN
+
+
+class _Loss(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        diff = nodes[("diff", self.expr[1])]
+        delta = diff.value
+        self.value = (-delta if delta < 0.0 else 0.0) if diff.observed else NAN
+
+
+class _RSI(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        _, src, periods = self.expr
+        gain = nodes[("mean", ("gain", src), periods)].value
+        loss = nodes[("mean", ("loss", src), periods)].value
+        self.value = _rsi(_div(gain, loss))
+
+
+class _WilderRSI(_Node):
+    """RSI with Wilder's smoothing, seeded by the simple average of the first ``periods`` deltas"""
+
+    __slots__ = ("observed", "avg_gain", "avg_loss")
+
+    def __init__(self, expr):
+        super().__init__(expr)
+        self.observed = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, nodes, bar):
+        _, src, periods = self.expr
+        delta = nodes[("diff", src)].value
+        if delta != delta:
+            return
+        gain = delta if delta > 0.0 else 0.0
+        loss = -delta if delta < 0.0 else 0.0
+
+        self.observed += 1
+        if self.observed <= periods:
+            # Accumulate the seed; it becomes an average on the periods-th delta
+            self.avg_gain += gain
+            self.avg_loss += loss
+            if self.observed < periods:
+                return
+            self.avg_gain /= periods
+            self.avg_loss /= periods
+        else:
+            self.avg_gain += (gain - self.avg_gain) / periods
+            self.avg_loss += (loss - self.avg_loss) / periods
+        self.value = _rsi(_div(self.avg_gain, self.avg_loss))
+
+    def state(self):
+        return {"value": self.value, "observed": self.observed,
+                "avg_gain": self.avg_gain, "avg_loss": self.avg_loss}
+
+    def load(self, state):
+        self.value = state["value"]
+        self.observed = state["observed"]
+        self.avg_gain = state["avg_gain"]
+        self.avg_loss = state["avg_loss"]
+
+
+class _EWM(_Node):
+    """``Series.ewm(span=span, adjust=False).mean()``, following pandas' NaN handling"""
+
+    __slots__ = ("old_weight",)
+
+    def __init__(self, expr):
+        super().__init__(expr)
+        self.old_weight = 1.0
+
+    def update(self, nodes, bar):
+        x = nodes[self.expr[1]].value
+        alpha = 2.0 / (self.expr[2] + 1.0)
+        weighted = self.value
+        if weighted != weighted:
+            self.value = x
+            return
+        # Missing bars still decay the previous average
+        self.old_weight *= 1.0 - alpha
+        if x == x:
+            if weighted != x:
+                self.value = (self.old_weight * weighted + alpha * x) / (self.old_weight + alpha)
+            self.old_weight = 1.0
+
+    def state(self):
+        return {"value": self.value, "old_weight": self.old_weight}
+
+    def load(self, state):
+        self.value = state["value"]
+        self.old_weight = state["old_weight"]
+
+
+class _MACD(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        _, src, fast, slow = self.expr
+        self.value = nodes[("ewm", src, fast)].value - nodes[("ewm", src, slow)].value
+
+
+class _Ratio(_Node):
+    __slots__ = ()
+
+    def update(self, nodes, bar):
+        self.value = _div(nodes[self.expr[1]].value, nodes[self.expr[2]].value)
+
+
+class _PctChange(_Node):
+    __slots__ = ("history",)
+
+    def __init__(self, expr):
+        super().__init__(expr)
+        self.history = deque(maxlen=expr[2] + 1)
+
+    def update(self, nodes, bar):
+        self.history.append(nodes[self.expr[1]].value)
+        if len(self.history) == self.history.maxlen:
+            self.value = _div(self.history[-1], self.history[0]) - 1
+        else:
+            self.value = NAN
+
+    def state(self):
+        return {"value": self.value, "history": list(self.history)}
+
+    def load(self, state):
+        self.value = state["value"]
+        self.history = deque(state["history"], maxlen=self.expr[2] + 1)
+
+
+_NODE_TYPES = {
+    "sum": _RollingStats,
+    "mean": _Mean,
+    "std": _Std,
+    "band": _Band,
+    "diff": _Diff,
+    "gain": _Gain,
+    "loss": _Loss,
+    "rsi": _RSI,
+    "wilder_rsi": _WilderRSI,
+    "ewm": _EWM,
+    "macd": _MACD,
+    "ratio": _Ratio,
+    "pct_change": _PctChange,
+}
+
+
+class StreamingIndicators:
+    """Incremental indicators for one symbol: each bar updates every node in O(1).
+
+    Uses the same expressions and dependency graph as ``indicators.IndicatorEngine``,
+    so shared sub-expressions (e.g. the 20-bar close window behind ``sma_20``,
+    ``bb_*`` and ``volatility``) are updated once per bar, and the values after
+    the last bar match the batch engine's last row.
+    """
+
+    def __init__(self, indicators: Dict[str, Expr]):
+        self.indicators = dict(indicators)
+        self.last_timestamp: Optional[int] = None
+        self.bars = 0
+
+        self._nodes: Dict[Expr, _Node] = {}
+        for expr in _plan(tuple(self.indicators.values())):
+            if isinstance(expr, str):
+                node = _Column(expr)
+            elif expr[0] == "m2":
+                node = _SquaredDeviations(expr, self._nodes[("sum",) + expr[1:]])
+            else:
+                node = _NODE_TYPES[expr[0]](expr)
+            self._nodes[expr] = node
+        self._order = list(self._nodes.values())
+
+    def update(self, close: float, volume: float = 0.0, timestamp: Optional[int] = None) -> Dict[str, float]:
+        """Feed one bar and return the current indicator values"""
+        bar = {"close": close, "volume": volume}
+        nodes = self._nodes
+        for node in self._order:
+            node.update(nodes, bar)
+        self.bars += 1
+        if timestamp is not None:
+            self.last_timestamp = int(timestamp)
+        return self.values()
+
+    def values(self) -> Dict[str, float]:
+        return {name: self._nodes[expr].value for name, expr in self.indicators.items()}
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "last_timestamp": self.last_timestamp,
+            "bars": self.bars,
+            "nodes": [node.state() for node in self._order],
+        }
+
+    def load(self, state: Dict[str, Any]):
+        if len(state["nodes"]) != len(self._order):
+            raise ValueError("Snapshot does not match the indicator set")
+        for node, node_state in zip(self._order, state["nodes"]):
+            node.load(node_state)
+        self.last_timestamp = state["last_timestamp"]
+        self.bars = state["bars"]
+
+
+class StreamingIndicatorRegistry:
+    """Per-symbol streaming indicator state with disk snapshots"""
+
+    def __init__(self, path: Optional[str] = None, rsi_method: Optional[str] = None,
+                 indicators: Optional[Dict[str, Expr]] = None):
+        self.path = path or os.getenv("STREAM_SNAPSHOT_PATH", "./data/streaming/indicators.json")
+        self.rsi_method = rsi_method or os.getenv("STREAM_RSI_METHOD", "sma").lower()
+        if indicators is None:
+            indicators = {**indicator_exprs(INDICATORS, self.rsi_method), **EXTRA_INDICATORS}
+        self.indicators = indicators
+
+        self._symbols: Dict[str, StreamingIndicators] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _entry(self, symbol: str):
+        key = symbol.upper()
+        with self._guard:
+            if key not in self._symbols:
+                self._symbols[key] = StreamingIndicators(self.indicators)
+                self._locks[key] = threading.Lock()
+            return self._symbols[key], self._locks[key]
+
+    def update(self, symbol: str, close: float, volume: float = 0.0,
+               timestamp: Optional[int] = None) -> Dict[str, float]:
+        """Apply one bar; bars not newer than the last applied one are ignored"""
+        stream, lock = self._entry(symbol)
+        with lock:
+            if timestamp is not None and stream.last_timestamp is not None and timestamp <= stream.last_timestamp:
+                return stream.values()
+            return stream.update(close, volume, timestamp)
+
+    def sync(self, symbol: str, bars) -> Dict[str, float]:
+        """Apply the bars of a ``bar_store.Bars`` that are newer than the symbol's state"""
+        stream, lock = self._entry(symbol)
+        with lock:
+            if stream.last_timestamp is not None:
+                bars = bars.since(stream.last_timestamp)
+            if len(bars) == 0:
+                return stream.values()
+            timestamps = np.asarray(bars.timestamp)
+            closes = np.asarray(bars.close, dtype=np.float64).tolist()
+            volumes = np.asarray(bars.volume, dtype=np.float64).tolist()
+            for close, volume in zip(closes, volumes):
+                stream.update(close, volume)
+            stream.last_timestamp = int(timestamps[-1])
+            return stream.values()
+
+    def get(self, symbol: str) -> Optional[Dict[str, float]]:
+        with self._guard:
+            stream = self._symbols.get(symbol.upper())
+        return stream.values() if stream is not None else None
+
+    def symbols(self) -> List[str]:
+        with self._guard:
+            return list(self._symbols)
+
+    def _signature(self) -> str:
+        return repr(sorted(self.indicators.items(), key=lambda item: item[0]))
+
+    def snapshot(self, path: Optional[str] = None) -> int:
+        """Atomically write every symbol's state to disk; returns the number of symbols"""
+        path = path or self.path
+        with self._guard:
+            entries = list(self._symbols.items())
+        states = {}
+        for key, stream in entries:
+            with self._locks[key]:
+                states[key] = stream.state()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"format": SNAPSHOT_FORMAT, "indicators": self._signature(), "symbols": states}, f)
+        os.replace(tmp_path, path)
+        return len(states)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Restore symbol states from a snapshot; returns the number of symbols loaded"""
+        path = path or self.path
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            snapshot = json.load(f)
+        if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("indicators") != self._signature():
+            logger.warning(f"Ignoring streaming indicator snapshot {path}: format or indicator set changed")
+            return 0
+
+        loaded = 0
+        for key, state in snapshot["symbols"].items():
+            stream = StreamingIndicators(self.indicators)
+            try:
+                stream.load(state)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping streaming state for {key}: {str(e)}")
+                continue
+            with self._guard:
+                self._symbols[key] = stream
+                self._locks.setdefault(key, threading.Lock())
+            loaded += 1
+        return loaded
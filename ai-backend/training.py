@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Service instance owned by each training worker
+_worker_service = None
+
+
+def _init_training_worker(threads_per_job: int):
+    """Create a training MLService and cap its math libraries to the job's CPU share"""
+    global _worker_service
+    for name in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads_per_job)
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+    from ml_service import MLService
+    _worker_service = MLService()
+
+
+def _run_training_job(job_id: str, symbol: str, options: Dict[str, Any], shared) -> Dict[str, Any]:
+    """Train in a worker process, publishing progress and polling for cancellation through ``shared``.
+
+    The worker only writes ``shared[job_id]`` and the queue only writes the
+    ``(job_id, "cancel")`` flag, so neither can overwrite the other's update.
+    """
+    started_at = time.time()
+    shared[job_id] = {"progress": 0.0, "started_at": started_at, "details": {}}
+
+    def report(progress: float, details: Optional[Dict[str, Any]] = None):
+        shared[job_id] = {"progress": float(progress), "started_at": started_at, "details": details or {}}
+
+    def should_stop() -> bool:
+        return bool(shared.get((job_id, "cancel")))
+
+    if should_stop():
+        return {"symbol": symbol, "cancelled": True}
+    return _worker_service.train_models(symbol, progress_callback=report, should_stop=should_stop, **options)
+
+
+class TrainingJob:
+    """Book-keeping for one queued training run"""
+
+    def __init__(self, job_id: str, symbol: str, options: Dict[str, Any]):
+        self.id = job_id
+        self.symbol = symbol
+        self.options = options
+        self.status = QUEUED
+        self.progress = 0.0
+        self.details: Dict[str, Any] = {}
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.status != RUNNING or self.started_at is None or self.progress <= 0.0:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed * (1.0 - self.progress) / self.progress
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "symbol": self.symbol,
+            "status": self.status,
+            "progress": self.progress,
+            "eta_seconds": self.eta_seconds(),
+            "details": self.details,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class TrainingJobQueue:
+    """Runs training jobs in a dedicated process pool and tracks their progress.
+
+    Jobs for different symbols run in parallel, up to ``TRAIN_CPU_BUDGET`` cores
+    split into workers of ``TRAIN_THREADS_PER_JOB`` threads each; a second
+    request for a symbol that is already queued or training returns that job.
+    """
+
+    def __init__(self, cpu_budget: Optional[int] = None, threads_per_job: Optional[int] = None,
+                 history: Optional[int] = None):
+        self.cpu_budget = cpu_budget if cpu_budget is not None else int(
+            os.getenv("TRAIN_CPU_BUDGET", max(1, (os.cpu_count() or 2) // 2)))
+        self.threads_per_job = threads_per_job if threads_per_job is not None else int(
+            os.getenv("TRAIN_THREADS_PER_JOB", 1))
+        self.max_workers = max(1, self.cpu_budget // max(1, self.threads_per_job))
+        # Finished jobs kept for status queries
+        self.history = history if history is not None else int(os.getenv("TRAIN_JOB_HISTORY", 1000))
+
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._shared = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            if self._manager is None:
+                # Progress and cancel flags cross the process boundary through a managed dict
+                self._manager = ctx.Manager()
+                self._shared = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx,
+                                             initializer=_init_training_worker,
+                                             initargs=(self.threads_per_job,))
+        return self._pool
+
+    def submit(self, symbol: str, **options) -> TrainingJob:
+        """Queue a training job, or return the active job for the same symbol"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.symbol == symbol.upper() and job.status in (QUEUED, RUNNING):
+                    return job
+
+            job = TrainingJob(uuid.uuid4().hex, symbol.upper(), options)
+            pool = self._get_pool()
+            self._jobs[job.id] = job
+            try:
+                job.future = pool.submit(_run_training_job, job.id, job.symbol, options, self._shared)
+            except BrokenProcessPool:
+                self._pool = None
+                job.future = self._get_pool().submit(_run_training_job, job.id, job.symbol, options, self._shared)
+            self._trim()
+        job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+        logger.info(f"Queued training job {job.id} for {job.symbol}")
+        return job
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _sync(self, job: TrainingJob):
+        """Pull the worker's latest progress into the job record"""
+        if job.status in FINISHED_STATES or self._shared is None:
+            return
+        try:
+            state = self._shared.get(job.id)
+        except Exception:
+            return
+        if not state:
+            return
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                return
+            job.status = RUNNING
+            job.started_at = state.get("started_at", job.started_at)
+            job.progress = state.get("progress", job.progress)
+            job.details = state.get("details", job.details)
+
+    def _finish(self, job: TrainingJob, future: Future):
+        self._sync(job)
+        with self._lock:
+            job.finished_at = time.time()
+            try:
+                result = future.result()
+            except CancelledError:
+                job.status = CANCELLED
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                logger.error(f"Training job {job.id} for {job.symbol} failed: {str(e)}")
+                if isinstance(e, BrokenProcessPool):
+                    self._pool = None
+            else:
+                job.result = result
+                job.status = CANCELLED if result.get("cancelled") else COMPLETED
+                if job.status == COMPLETED:
+                    job.progress = 1.0
+        if self._shared is not None:
+            try:
+                self._shared.pop(job.id, None)
+                self._shared.pop((job.id, "cancel"), None)
+            except Exception:
+                pass
+        logger.info(f"Training job {job.id} for {job.symbol} {job.status}")
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            self._sync(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        """Cancel a queued job outright, or ask a running one to stop after its current batch"""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        if job.future is not None and job.future.cancel():
+            return job
+        try:
+            self._shared[(job.id, "cancel")] = True
+        except Exception as e:
+            logger.error(f"Could not signal cancellation to training job {job.id}: {str(e)}")
+        return job
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._shared = None
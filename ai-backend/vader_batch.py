@@ -0,0 +1,350 @@
+import os
+import string
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import vader_lexicon
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Distinct raw tokens kept in the interned vocabulary before it is cleared and rebuilt
+VOCAB_MAX = int(os.getenv("VADER_VOCAB_MAX", "500000"))
+
+_PUNCTUATION = frozenset(string.punctuation)
+
+# Word id 0 is a sentinel with every feature off; neighbours outside a text map to it
+_SENTINEL = 0
+_MISSING = -1
+
+# Per-word features looked up by id when scoring
+_FEATURES = {
+    "valence": np.float64,      # lexicon valence of the lowercased word (0.0 if absent)
+    "in_lexicon": np.bool_,
+    "booster": np.float64,      # BOOSTER_DICT scalar of the lowercased word (0.0 if absent)
+    "is_booster": np.bool_,
+    "upper": np.bool_,          # str.isupper()
+    "negated": np.bool_,        # VaderConstants.negated([word])
+    "least": np.bool_,          # "least" and not in the lexicon (_least_check)
+    "at_very": np.bool_,        # "at" or "very" (_least_check)
+    "kind": np.bool_,
+    "of": np.bool_,
+    "but": np.bool_,
+    "never": np.bool_,          # exact "never" (_never_check compares case-sensitively)
+    "so_this": np.bool_,        # exact "so" or "this"
+}
+
+# Word offsets compared against SPECIAL_CASE_IDIOMS by _idioms_check, in its order
+_IDIOM_OFFSETS = ((-1, 0), (-2, -1, 0), (-2, -1), (-3, -2, -1), (-3, -2))
+
+
+def _strip_punctuation(token: str, punc_list: Sequence[str]) -> str:
+    """The word ``SentiText`` keeps for a whitespace token.
+
+    VADER strips one PUNC_LIST entry from the start or end of a token when
+    the rest is a punctuation-free word of two or more characters; that only
+    depends on the token itself, so it is computed once per vocabulary entry.
+    """
+    lead = 0
+    while lead < len(token) and token[lead] in _PUNCTUATION:
+        lead += 1
+    if lead and token[:lead] in punc_list:
+        rest = token[lead:]
+        if len(rest) > 1 and not any(c in _PUNCTUATION for c in rest):
+            return rest
+    trail = 0
+    while trail < len(token) and token[-1 - trail] in _PUNCTUATION:
+        trail += 1
+    if trail and token[-trail:] in punc_list:
+        rest = token[:-trail]
+        if len(rest) > 1 and not any(c in _PUNCTUATION for c in rest):
+            return rest
+    return token
+
+
+class _Vocabulary:
+    """Interned token -> word id table with one row of features per word"""
+
+    def __init__(self, lexicon: Dict[str, float], constants):
+        self.lexicon = lexicon
+        self.constants = constants
+        self.punc_list = frozenset(constants.PUNC_LIST)
+        self.tokens: Dict[str, int] = {}
+        self.words: Dict[str, int] = {}
+        self.size = 0
+        self.features = {name: np.zeros(1024, dtype=dtype) for name, dtype in _FEATURES.items()}
+        self._add_word("")  # _SENTINEL; "" is never a token
+
+    def _add_word(self, word: str) -> int:
+        word_id = self.size
+        if word_id == len(self.features["valence"]):
+            for name, values in self.features.items():
+                grown = np.zeros(2 * len(values), dtype=values.dtype)
+                grown[:word_id] = values
+                self.features[name] = grown
+        if word:
+            lower = word.lower()
+            booster = self.constants.BOOSTER_DICT
+            row = self.features
+            row["valence"][word_id] = self.lexicon.get(lower, 0.0)
+            row["in_lexicon"][word_id] = lower in self.lexicon
+            row["booster"][word_id] = booster.get(lower, 0.0)
+            row["is_booster"][word_id] = lower in booster
+            row["upper"][word_id] = word.isupper()
+            row["negated"][word_id] = self.constants.negated([word])
+            row["least"][word_id] = lower == "least" and lower not in self.lexicon
+            row["at_very"][word_id] = lower in ("at", "very")
+            row["kind"][word_id] = lower == "kind"
+            row["of"][word_id] = lower == "of"
+            row["but"][word_id] = lower == "but"
+            row["never"][word_id] = word == "never"
+            row["so_this"][word_id] = word in ("so", "this")
+        self.words[word] = word_id
+        self.size += 1
+        return word_id
+
+    def add_tokens(self, tokens) -> None:
+        """Intern tokens that are not in the table yet; tokens VADER drops (one character) map to _MISSING"""
+        for token in tokens:
+            if len(token) < 2:
+                self.tokens[token] = _MISSING
+                continue
+            word = _strip_punctuation(token, self.punc_list)
+            word_id = self.words.get(word)
+            self.tokens[token] = self._add_word(word) if word_id is None else word_id
+
+    def phrase_ids(self, phrases: Dict[str, float], length: int) -> List[Tuple[Tuple[int, ...], float]]:
+        """Word ids of the ``length``-word phrases; phrases with a word never seen cannot match"""
+        table = []
+        for phrase, value in phrases.items():
+            words = phrase.split(" ")
+            if len(words) != length:
+                continue
+            ids = tuple(self.words.get(word, _MISSING) for word in words)
+            if _MISSING not in ids:
+                table.append((ids, value))
+        return table
+
+
+class BatchSentimentScorer:
+    """VADER ``polarity_scores`` for many texts at once.
+
+    Texts are split into whitespace tokens, mapped to word ids through one
+    interned vocabulary, and VADER's booster, caps, negation, idiom, "least"
+    and "but" rules are applied to flat id arrays. Float operations happen in
+    the same order as ``SentimentIntensityAnalyzer.polarity_scores`` (quirks
+    included), so the scores are identical to the per-text path.
+    """
+
+    def __init__(self, analyzer):
+        self.lexicon = analyzer.lexicon
+        self.constants = analyzer.constants
+        self._vocabulary = _Vocabulary(self.lexicon, self.constants)
+        self._lock = threading.Lock()
+
+    def _intern(self, tokens: List[str]) -> Tuple[np.ndarray, _Vocabulary]:
+        with self._lock:
+            vocabulary = self._vocabulary
+            new = set(tokens).difference(vocabulary.tokens)
+            if len(vocabulary.tokens) + len(new) > VOCAB_MAX:
+                logger.info(f"VADER vocabulary reached {len(vocabulary.tokens)} tokens, rebuilding it")
+                vocabulary = self._vocabulary = _Vocabulary(self.lexicon, self.constants)
+                new = set(tokens)
+            vocabulary.add_tokens(new)
+            ids = np.fromiter(map(vocabulary.tokens.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        return ids, vocabulary
+
+    def polarity_scores(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """neg / neu / pos / compound arrays, one entry per text"""
+        c = self.constants
+        n = len(texts)
+        raw_lengths = np.empty(n, dtype=np.int64)
+        tokens: List[str] = []
+        for k, text in enumerate(texts):
+            split = text.split()
+            raw_lengths[k] = len(split)
+            tokens.extend(split)
+
+        ids, vocabulary = self._intern(tokens)
+        f = vocabulary.features
+        keep = ids != _MISSING
+        ids = ids[keep]
+        text_of = np.repeat(np.arange(n), raw_lengths)[keep]
+        lengths = np.bincount(text_of, minlength=n)
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        local = np.arange(len(ids)) - starts[text_of]
+        length = lengths[text_of]
+
+        def shifted(offset: int) -> np.ndarray:
+            """Word id ``offset`` positions away in the same text, or _SENTINEL"""
+            valid = (local + offset >= 0) & (local + offset < length)
+            out = np.full(len(ids), _SENTINEL, dtype=np.int64)
+            out[valid] = ids[np.flatnonzero(valid) + offset]
+            return out
+
+        neighbours = {offset: shifted(offset) for offset in (-3, -2, -1, 1, 2)}
+        neighbours[0] = ids
+        w1, w2, w3 = neighbours[-1], neighbours[-2], neighbours[-3]
+
+        # allcap_differential: some but not all words are ALL CAPS
+        caps = np.bincount(text_of, weights=f["upper"][ids], minlength=n).astype(np.int64)
+        cap_diff = ((lengths - caps) > 0) & ((lengths - caps) < lengths)
+        cap = cap_diff[text_of]
+
+        # sentiment_valence, evaluated at every position as if it were the word's first occurrence
+        valence = f["valence"][ids]
+        valence = np.where(f["upper"][ids] & cap,
+                           np.where(valence > 0, valence + c.C_INCR, valence - c.C_INCR), valence)
+        for start_i, previous in enumerate((w1, w2, w3)):
+            applies = (local > start_i) & ~f["in_lexicon"][previous]
+            # scalar_inc_dec
+            scalar = f["booster"][previous]
+            booster = f["is_booster"][previous]
+            scalar = np.where(booster & (valence < 0), scalar * -1, scalar)
+            scalar = np.where(booster & f["upper"][previous] & cap,
+                              np.where(valence > 0, scalar + c.C_INCR, scalar - c.C_INCR), scalar)
+            if start_i == 1:
+                scalar = np.where(scalar != 0, scalar * 0.95, scalar)
+            elif start_i == 2:
+                scalar = np.where(scalar != 0, scalar * 0.9, scalar)
+            updated = valence + scalar
+            # _never_check
+            if start_i == 0:
+                updated = np.where(f["negated"][w1], updated * c.N_SCALAR, updated)
+            elif start_i == 1:
+                never_so = f["never"][w2] & f["so_this"][w1]
+                updated = np.where(never_so, updated * 1.5,
+                                   np.where(f["negated"][w2], updated * c.N_SCALAR, updated))
+            else:
+                never_so = (f["never"][w3] & f["so_this"][w2]) | f["so_this"][w1]
+                updated = np.where(never_so, updated * 1.25,
+                                   np.where(f["negated"][w3], updated * c.N_SCALAR, updated))
+                updated = self._idioms_check(updated, neighbours, vocabulary)
+            valence = np.where(applies, updated, valence)
+
+        # _least_check
+        least = f["least"][w1]
+        valence = np.where((local > 1) & least,
+                           np.where(f["at_very"][w2], valence, valence * c.N_SCALAR),
+                           np.where((local > 0) & least, valence * c.N_SCALAR, valence))
+        valence = np.where(f["in_lexicon"][ids], valence, 0.0)
+        # Boosters and the "kind" of "kind of" score zero themselves
+        skip = f["is_booster"][ids] | (f["kind"][ids] & f["of"][neighbours[1]])
+        valence = np.where(skip, 0.0, valence)
+
+        # Repeated words reuse the score computed at their first occurrence in the text
+        _, first, inverse = np.unique(text_of * vocabulary.size + ids, return_index=True, return_inverse=True)
+        sentiments = valence[first[inverse.ravel()]]
+
+        # _but_check: halve the words before the first "but", boost those after it
+        but = np.full(n, np.iinfo(np.int64).max)
+        is_but = f["but"][ids]
+        np.minimum.at(but, text_of[is_but], local[is_but])
+        but = but[text_of]
+        has_but = but != np.iinfo(np.int64).max
+        sentiments = np.where(has_but & (local < but), sentiments * 0.5,
+                              np.where(has_but & (local > but), sentiments * 1.5, sentiments))
+
+        return self._score_valence(texts, sentiments, starts, lengths)
+
+    def _idioms_check(self, valence: np.ndarray, neighbours: Dict[int, np.ndarray],
+                      vocabulary: _Vocabulary) -> np.ndarray:
+        c = self.constants
+        tables = {length: vocabulary.phrase_ids(c.SPECIAL_CASE_IDIOMS, length) for length in (2, 3)}
+
+        def match(offsets, table):
+            value = np.zeros(len(valence))
+            hit = np.zeros(len(valence), dtype=bool)
+            for phrase, phrase_value in table:
+                found = np.ones(len(valence), dtype=bool)
+                for offset, word_id in zip(offsets, phrase):
+                    found &= neighbours[offset] == word_id
+                value = np.where(found, phrase_value, value)
+                hit |= found
+            return value, hit
+
+        # The first of the preceding sequences that is an idiom wins...
+        matched = np.zeros(len(valence), dtype=bool)
+        for offsets in _IDIOM_OFFSETS:
+            value, hit = match(offsets, tables[len(offsets)])
+            valence = np.where(hit & ~matched, value, valence)
+            matched |= hit
+        # ...then the word with the one or two after it overrides
+        for offsets in ((0, 1), (0, 1, 2)):
+            value, hit = match(offsets, tables[len(offsets)])
+            valence = np.where(hit, value, valence)
+
+        boosters = vocabulary.phrase_ids(c.BOOSTER_DICT, 2)
+        _, threetwo = match((-3, -2), boosters)
+        _, twoone = match((-2, -1), boosters)
+        return np.where(threetwo | twoone, valence + c.B_DECR, valence)
+
+    def _score_valence(self, texts: Sequence[str], sentiments: np.ndarray, starts: np.ndarray,
+                       lengths: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(texts)
+        # The total goes through the builtin sum() like VADER's, so it rounds the same way
+        flat = sentiments.tolist()
+        sum_s = np.array([sum(flat[start:start + count]) for start, count in zip(starts.tolist(), lengths.tolist())],
+                         dtype=np.float64)
+
+        # _sift_sentiment_scores accumulates word by word; walk the texts one word position at a time
+        positive = np.where(sentiments > 0, sentiments + 1, 0.0)
+        negative = np.where(sentiments < 0, sentiments - 1, 0.0)
+        order = np.argsort(-lengths, kind="stable")
+        sorted_starts = starts[order]
+        descending = -lengths[order]
+        pos_sum = np.zeros(n)
+        neg_sum = np.zeros(n)
+        for position in range(int(lengths.max()) if n else 0):
+            active = int(np.searchsorted(descending, -position, side="left"))
+            rows = sorted_starts[:active] + position
+            pos_sum[:active] += positive[rows]
+            neg_sum[:active] += negative[rows]
+        pos_sum[order] = pos_sum.copy()
+        neg_sum[order] = neg_sum.copy()
+        neu_count = np.bincount(np.repeat(np.arange(n), lengths), weights=sentiments == 0, minlength=n)
+
+        # _punctuation_emphasis
+        exclamations = np.minimum([text.count("!") for text in texts], 4)
+        questions = np.array([text.count("?") for text in texts], dtype=np.int64)
+        amplifier = exclamations * 0.292 + np.where(questions > 1, np.where(questions <= 3, questions * 0.18, 0.96), 0)
+
+        sum_s = np.where(sum_s > 0, sum_s + amplifier, np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = sum_s / np.sqrt(sum_s * sum_s + 15)
+        pos_larger = pos_sum > np.fabs(neg_sum)
+        neg_larger = pos_sum < np.fabs(neg_sum)
+        pos_sum = np.where(pos_larger, pos_sum + amplifier, pos_sum)
+        neg_sum = np.where(neg_larger, neg_sum - amplifier, neg_sum)
+        total = pos_sum + np.fabs(neg_sum) + neu_count
+        empty = lengths == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = {
+                "neg": np.fabs(neg_sum / total),
+                "neu": np.fabs(neu_count / total),
+                "pos": np.fabs(pos_sum / total),
+                "compound": compound,
+            }
+        # Python's round() (not np.round) for the same decimal rounding as polarity_scores
+        return {name: np.array([0.0 if is_empty else round(value, 4 if name == "compound" else 3)
+                                for value, is_empty in zip(values.tolist(), empty.tolist())])
+                for name, values in scores.items()}
+
+
+# One scorer per process, sharing the analyzer's lexicon
+_scorer: Optional[BatchSentimentScorer] = None
+_scorer_lock = threading.Lock()
+
+
+def load_scorer() -> BatchSentimentScorer:
+    """The process-wide batch scorer over ``vader_lexicon.load_analyzer()``"""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                _scorer = BatchSentimentScorer(vader_lexicon.load_analyzer())
+    return _scorer
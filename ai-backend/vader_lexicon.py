@@ -0,0 +1,124 @@
+import os
+import pickle
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prebuilt VADER lexicon and rule tables, written at image build time by download_nltk_data.py
+VADER_LEXICON_PATH = os.getenv("VADER_LEXICON_PATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vader_lexicon.pkl"))
+
+# Bumped whenever the pickled layout changes; older artifacts are rebuilt
+FORMAT_VERSION = 1
+
+NLTK_LEXICON = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+# One analyzer per process; read-only after construction, so forked children share its pages
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def _lexicon_text() -> str:
+    """Raw VADER lexicon: NLTK's data package if installed, else the copy bundled with vaderSentiment"""
+    import nltk
+    try:
+        return nltk.data.load(NLTK_LEXICON)
+    except LookupError:
+        pass
+    try:
+        import vaderSentiment
+    except ImportError:
+        raise LookupError("No VADER lexicon: install vaderSentiment or run nltk.download('vader_lexicon')")
+    with open(os.path.join(os.path.dirname(vaderSentiment.__file__), "vader_lexicon.txt"), encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_lexicon(text: str) -> Dict[str, float]:
+    """token -> mean valence, as ``SentimentIntensityAnalyzer.make_lex_dict``"""
+    lexicon = {}
+    for line in text.strip().split("\n"):
+        word, measure = line.strip().split("\t")[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
+
+
+def compile_lexicon() -> Dict[str, Any]:
+    """Parse the lexicon and build the booster / negation / idiom tables once"""
+    import nltk
+    from nltk.sentiment.vader import VaderConstants
+    return {
+        "format": FORMAT_VERSION,
+        "nltk_version": nltk.__version__,
+        "lexicon": parse_lexicon(_lexicon_text()),
+        "constants": VaderConstants(),
+    }
+
+
+def build(path: Optional[str] = None, payload: Optional[Dict[str, Any]] = None) -> str:
+    """Write the compiled lexicon to ``path`` (default VADER_LEXICON_PATH); returns the path"""
+    path = path or VADER_LEXICON_PATH
+    payload = payload or compile_lexicon()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    """The prebuilt artifact, or None if it is missing or from another format / NLTK version"""
+    import nltk
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable VADER lexicon {path}: {str(e)}")
+        return None
+    if payload.get("format") != FORMAT_VERSION or payload.get("nltk_version") != nltk.__version__:
+        logger.warning(f"Ignoring VADER lexicon {path}: built for another format or NLTK version")
+        return None
+    return payload
+
+
+def load_analyzer(path: Optional[str] = None):
+    """The process-wide VADER ``SentimentIntensityAnalyzer``, built from the prebuilt lexicon.
+
+    Falls back to compiling the lexicon from the installed sources (and
+    writing the artifact for next time) when it is missing or stale. Never
+    downloads.
+    """
+    global _analyzer
+    if _analyzer is not None:
+        return _analyzer
+    with _analyzer_lock:
+        if _analyzer is not None:
+            return _analyzer
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+        path = path or VADER_LEXICON_PATH
+        payload = _read(path)
+        if payload is None:
+            logger.warning(f"No prebuilt VADER lexicon at {path}, compiling it from the installed lexicon")
+            payload = compile_lexicon()
+            try:
+                build(path, payload)
+            except OSError as e:
+                logger.warning(f"Could not write VADER lexicon {path}: {str(e)}")
+
+        # Skip __init__, which would re-read and re-parse the lexicon file
+        analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+        analyzer.lexicon = payload["lexicon"]
+        analyzer.constants = payload["constants"]
+        _analyzer = analyzer
+        return _analyzer
+
+
+if __name__ == "__main__":
+    print(f"Wrote {build()}")